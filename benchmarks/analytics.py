@@ -0,0 +1,76 @@
+"""
+Benchmark of the vote history rollups.
+
+    python -m benchmarks.analytics --restaurants 200 --weeks 520 --items 5
+
+Seeds restaurants x 7 weekly menus x items and one archived summary per
+menu and week, then times each rollup with the past weeks uncached and
+cached. The rollups use NumPy when it is installed and plain lists
+otherwise; `--lists` forces the latter.
+"""
+import argparse
+import datetime
+import time
+
+from benchmarks import common
+
+
+def seed(restaurants, weeks, items):
+    from exercise.quickstart.models import (  # pylint: disable=import-outside-toplevel
+        MenuItem, RefMenu, Restaurant, Menu, WeeklyVoteSummary, current_week)
+
+    menu_items = MenuItem.objects.bulk_create(
+        [MenuItem(name=f'Item {index}', price=10, currency='EUR')
+         for index in range(items * 7)])
+    Restaurant.objects.bulk_create(
+        [Restaurant(restaurantName=f'Restaurant {index}', address='Akropolis',
+                    city='Klaipėda') for index in range(restaurants)])
+    menus = Menu.objects.bulk_create(
+        [Menu(name=f'Menu {day}', day=day, restaurant_id=restaurant_id)
+         for restaurant_id in Restaurant.objects.values_list('id', flat=True)
+         for day in range(1, 8)])
+    RefMenu.objects.bulk_create(
+        [RefMenu(menuID=menu, menuItemID=menu_items[(menu.day - 1) * items + index])
+         for menu in menus for index in range(items)])
+    start = current_week() - datetime.timedelta(weeks=weeks - 1)
+    for week in range(weeks):
+        WeeklyVoteSummary.objects.bulk_create(
+            [WeeklyVoteSummary(week=start + datetime.timedelta(weeks=week),
+                               menu=menu, count=(menu.id * 31 + week * 17) % 50)
+             for menu in menus], batch_size=5000)
+    return len(menus) * weeks
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--restaurants', type=int, default=200)
+    parser.add_argument('--weeks', type=int, default=520)
+    parser.add_argument('--items', type=int, default=5)
+    parser.add_argument('--lists', action='store_true')
+    args = parser.parse_args()
+
+    common.setup()
+    from exercise.quickstart import analytics  # pylint: disable=import-outside-toplevel
+
+    if args.lists:
+        analytics.np = None
+    rows = seed(args.restaurants, args.weeks, args.items)
+    print(f'{rows} weekly menu tallies, {"NumPy" if analytics.np else "lists"}')
+    for name, rollup in (
+            ('restaurants', analytics.restaurant_rollup),
+            ('weekdays', analytics.weekday_rollup),
+            ('items (13 weeks)', analytics.item_trends),
+            ('items (all weeks)', lambda: analytics.item_trends(weeks=args.weeks))):
+        timings = []
+        # Cold: past weeks aggregated; warm: only the current week read.
+        analytics.get_backend().clear()
+        for _ in range(2):
+            start = time.perf_counter()
+            rollup()
+            timings.append((time.perf_counter() - start) * 1000)
+        print(f'{name:18} {timings[0]:9.1f}ms cold {timings[1]:9.1f}ms warm')
+
+
+if __name__ == '__main__':
+    main()
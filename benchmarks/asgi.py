@@ -0,0 +1,118 @@
+"""
+Drives the ASGI application in process with concurrent clients and
+compares the sync DRF actions with the async views.
+
+    python -m benchmarks.asgi --clients 50 --requests 20 [--mode sync|async]
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks import common
+
+
+async def call(app, method, path, headers, body=b''):
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': method,
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': b'',
+        'headers': [(b'host', b'testserver'),
+                    (b'content-length', str(len(body)).encode()), *headers],
+        'server': ('testserver', 80),
+        'client': ('127.0.0.1', 0),
+    }
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    response = {}
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        await asyncio.Event().wait()
+        return None
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            response['status'] = message['status']
+
+    await app(scope, receive, send)
+    return response.get('status')
+
+
+def seed():
+    from django.contrib.auth import get_user_model  # pylint: disable=import-outside-toplevel
+    from rest_framework.authtoken.models import Token  # pylint: disable=import-outside-toplevel
+    from benchmarks.votes import seed as seed_votes  # pylint: disable=import-outside-toplevel
+
+    user, restaurant_ids = seed_votes(5)
+    token = Token.objects.create(user=get_user_model().objects.get(pk=user.pk))
+    return token.key, restaurant_ids
+
+
+async def run(app, token, restaurant_ids, clients, requests_per_client):
+    auth = (b'authorization', f'Token {token}'.encode())
+    accept = (b'accept', b'application/json; version=v2.0')
+    content_type = (b'content-type', b'application/json')
+
+    async def client(index):
+        errors = 0
+        for request_index in range(requests_per_client):
+            restaurant_id = restaurant_ids[(index + request_index) % len(restaurant_ids)]
+            kind = request_index % 3
+            if kind == 0:
+                body = json.dumps({'data': [
+                    {'menuName': f'Menu {day}', 'day': day, 'votes': 1}
+                    for day in (1, 2, 3)]}).encode()
+                status = await call(
+                    app, 'POST', f'/restaurants/{restaurant_id}/vote/',
+                    [auth, accept, content_type], body)
+            elif kind == 1:
+                status = await call(
+                    app, 'GET', f'/restaurants/{restaurant_id}/menus/current/',
+                    [auth, accept])
+            else:
+                status = await call(
+                    app, 'GET', '/restaurants/votes/current/', [auth, accept])
+            errors += status != 200
+        return errors
+
+    start = time.perf_counter()
+    errors = await asyncio.gather(*(client(index) for index in range(clients)))
+    return time.perf_counter() - start, sum(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--clients', type=int, default=50)
+    parser.add_argument('--requests', type=int, default=20)
+    parser.add_argument('--mode', choices=['sync', 'async', 'both'], default='both')
+    args = parser.parse_args()
+
+    if args.mode == 'both':
+        for mode in ('sync', 'async'):
+            subprocess.run(
+                [sys.executable, '-m', 'benchmarks.asgi', '--mode', mode,
+                 '--clients', str(args.clients), '--requests', str(args.requests)],
+                check=True)
+        return
+
+    os.environ['EXERCISE_ASYNC_VIEWS'] = '1' if args.mode == 'async' else '0'
+    common.setup()
+    from django.core.asgi import get_asgi_application  # pylint: disable=import-outside-toplevel
+
+    token, restaurant_ids = seed()
+    elapsed, errors = asyncio.run(run(
+        get_asgi_application(), token, restaurant_ids, args.clients, args.requests))
+    common.report(f'asgi {args.mode}', args.clients * args.requests, elapsed, errors)
+
+
+if __name__ == '__main__':
+    main()
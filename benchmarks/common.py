@@ -0,0 +1,86 @@
+"""
+Helpers shared by the benchmark scripts.
+
+Benchmarks run against a throwaway database of the EXERCISE_DB_PROFILE
+profile, so they never touch `db.sqlite3`. Run them from the repository
+root, e.g. `python -m benchmarks.votes --clients 8`.
+"""
+import atexit
+import os
+import tempfile
+import threading
+import time
+
+import django
+
+
+def setup(db_name=None):
+    """
+    Configures Django for the database profile in EXERCISE_DB_PROFILE.
+    SQLite profiles get a temporary file; other databases get a test
+    database that is dropped on exit.
+    """
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'exercise.settings')
+    from django.conf import settings  # pylint: disable=import-outside-toplevel
+    from django.core.management import call_command  # pylint: disable=import-outside-toplevel
+
+    settings.DEBUG = False
+    settings.ALLOWED_HOSTS = ['testserver']
+    database = settings.DATABASES['default']
+    if database['ENGINE'] == 'django.db.backends.sqlite3':
+        database['NAME'] = db_name or os.path.join(
+            tempfile.mkdtemp(), 'bench.sqlite3')
+        django.setup()
+        call_command('migrate', verbosity=0)
+        return
+
+    django.setup()
+    from django.db import connection  # pylint: disable=import-outside-toplevel
+
+    old_name = database['NAME']
+    connection.creation.create_test_db(
+        verbosity=0, autoclobber=True, serialize=False)
+    atexit.register(connection.creation.destroy_test_db, old_name, verbosity=0)
+
+
+def authenticated_client(user):
+    from rest_framework.test import APIClient  # pylint: disable=import-outside-toplevel
+
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+def run_clients(clients, requests_per_client, worker):
+    """
+    Runs `worker(client_index, request_index)` from `clients` threads and
+    returns `(elapsed seconds, error count)`.
+    """
+    from django.db import connection  # pylint: disable=import-outside-toplevel
+
+    errors = []
+    barrier = threading.Barrier(clients + 1)
+
+    def loop(client_index):
+        barrier.wait()
+        try:
+            for request_index in range(requests_per_client):
+                if not worker(client_index, request_index):
+                    errors.append(1)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=loop, args=(index,))
+               for index in range(clients)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, len(errors)
+
+
+def report(name, total, elapsed, errors):
+    print(f'{name}: {total} requests in {elapsed:.2f}s, '
+          f'{total / elapsed:.1f} req/s, {errors} errors')
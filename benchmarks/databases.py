@@ -0,0 +1,45 @@
+"""
+Compares vote-write throughput under concurrency across the database
+profiles of `exercise.settings`.
+
+    python -m benchmarks.databases --clients 8 --requests 200 \
+        [--profiles sqlite sqlite-wal postgresql]
+
+Each profile runs `benchmarks.votes` in its own process. Profiles whose
+database cannot be reached, e.g. PostgreSQL without a server or
+psycopg2, are reported as failed.
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--profiles', nargs='+',
+                        default=['sqlite', 'sqlite-wal', 'postgresql'])
+    args = parser.parse_args()
+
+    for profile in args.profiles:
+        for increment in (False, True):
+            command = [sys.executable, '-m', 'benchmarks.votes',
+                       '--clients', str(args.clients),
+                       '--requests', str(args.requests)]
+            if increment:
+                command.append('--increment')
+            result = subprocess.run(
+                command, capture_output=True, text=True, check=False,
+                env={**os.environ, 'EXERCISE_DB_PROFILE': profile})
+            mode = 'increment' if increment else 'overwrite'
+            if result.returncode:
+                error = (result.stderr.strip().splitlines() or ['unknown error'])[-1]
+                print(f'{profile} {mode}: failed ({error})')
+                break
+            print(f'{profile} {mode}: {result.stdout.strip()}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""
+Compares `restaurants/votes/current` with the cached
+`restaurants/leaderboard` endpoint on the same seeded votes.
+
+    python -m benchmarks.leaderboard --restaurants 200 --requests 200
+"""
+import argparse
+import time
+
+from benchmarks import common
+
+
+def seed(restaurants, items_per_menu):
+    from django.contrib.auth import get_user_model  # pylint: disable=import-outside-toplevel
+    from exercise.quickstart.models import (  # pylint: disable=import-outside-toplevel
+        MenuItem, RefMenu, Restaurant, Menu, Vote)
+
+    user = get_user_model().objects.create_user(
+        email='bench@example.com', username='bench', password='bench')
+    items = MenuItem.objects.bulk_create(
+        [MenuItem(name=f'Item {index}', price=10, currency='EUR')
+         for index in range(items_per_menu)])
+    Restaurant.objects.bulk_create(
+        [Restaurant(restaurantName=f'Restaurant {index}', address='Akropolis',
+                    city='Klaipėda') for index in range(restaurants)])
+    menus = Menu.objects.bulk_create(
+        [Menu(name=f'Menu {day}', day=day, restaurant_id=restaurant_id)
+         for restaurant_id in Restaurant.objects.values_list('id', flat=True)
+         for day in range(1, 8)])
+    RefMenu.objects.bulk_create(
+        [RefMenu(menuID=menu, menuItemID=item) for menu in menus for item in items])
+    Vote.objects.bulk_create(
+        [Vote(count=index % 50, day=menu.day, menu=menu)
+         for index, menu in enumerate(menus)])
+    return user
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--restaurants', type=int, default=200)
+    parser.add_argument('--items', type=int, default=5)
+    parser.add_argument('--requests', type=int, default=200)
+    args = parser.parse_args()
+
+    common.setup()
+    client = common.authenticated_client(seed(args.restaurants, args.items))
+
+    for name, url in (('votes/current', '/restaurants/votes/current/'),
+                      ('leaderboard', '/restaurants/leaderboard/')):
+        start = time.perf_counter()
+        errors = 0
+        for _ in range(args.requests):
+            if client.get(url).status_code != 200:
+                errors += 1
+        common.report(name, args.requests, time.perf_counter() - start, errors)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Micro-benchmark of the DRF menu and vote serializers against the
+precompiled read serializers on the same seeded rows.
+
+    python -m benchmarks.serializers --restaurants 100 --items 5 --repeat 20
+
+`fetch+serialize` includes the queries, `serialize` times only the
+conversion of already loaded objects or rows.
+"""
+import argparse
+import time
+
+from benchmarks import common
+from benchmarks.leaderboard import seed
+
+
+def timed(function, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--restaurants', type=int, default=100)
+    parser.add_argument('--items', type=int, default=5)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    common.setup()
+    from rest_framework.renderers import JSONRenderer  # pylint: disable=import-outside-toplevel
+    from rest_framework.test import APIRequestFactory  # pylint: disable=import-outside-toplevel
+    from exercise.quickstart.loaders import load_menus, load_votes  # pylint: disable=import-outside-toplevel
+    from exercise.quickstart.models import Menu, Vote  # pylint: disable=import-outside-toplevel
+    from exercise.quickstart.readserializers import (  # pylint: disable=import-outside-toplevel
+        menu_reader, serialize_menus, serialize_votes, vote_reader)
+    from exercise.quickstart.serializers import (  # pylint: disable=import-outside-toplevel
+        MenuSerializer, VoteSerializer)
+
+    seed(args.restaurants, args.items)
+    request = APIRequestFactory().get('/restaurants/votes/current/')
+    renderer = JSONRenderer()
+    menus = Menu.objects.all()
+    votes = Vote.objects.filter(day=1)
+
+    def drf_menus():
+        return MenuSerializer(load_menus(menus), many=True).data
+
+    def drf_votes():
+        return VoteSerializer(
+            load_votes(votes), many=True, context={'request': request}).data
+
+    assert renderer.render(drf_menus()) == renderer.render(serialize_menus(menus))
+    assert renderer.render(drf_votes()) == renderer.render(
+        serialize_votes(votes, request))
+
+    menu_objects = list(load_menus(menus))
+    vote_objects = list(load_votes(votes))
+    reader = menu_reader()
+    menu_rows = list(menus.values_list(*reader.columns))
+    item_rows = list(reader.item_rows(reader.menu_ids(menu_rows)))
+    votes_reader = vote_reader(request)
+    vote_rows = list(votes.values_list(*votes_reader.columns))
+    vote_item_rows = list(votes_reader.menus.item_rows(
+        votes_reader.menus.menu_ids(vote_rows, len(votes_reader.vote.columns))))
+
+    cases = (
+        ('menus fetch+serialize', drf_menus, lambda: serialize_menus(menus)),
+        ('menus serialize',
+         lambda: MenuSerializer(menu_objects, many=True).data,
+         lambda: reader.build(menu_rows, item_rows)),
+        ('votes fetch+serialize', drf_votes,
+         lambda: serialize_votes(votes, request)),
+        ('votes serialize',
+         lambda: VoteSerializer(
+             vote_objects, many=True, context={'request': request}).data,
+         lambda: votes_reader.build(vote_rows, vote_item_rows)),
+    )
+    print(f'{menus.count()} menus, {votes.count()} votes, {args.items} items per menu')
+    for name, drf, compiled in cases:
+        drf_ms = timed(drf, args.repeat)
+        compiled_ms = timed(compiled, args.repeat)
+        print(f'{name:22} DRF {drf_ms:8.2f}ms  compiled {compiled_ms:8.2f}ms  '
+              f'{drf_ms / compiled_ms:5.1f}x')
+
+
+if __name__ == '__main__':
+    main()
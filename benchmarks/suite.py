@@ -0,0 +1,265 @@
+"""
+Load test of the voting API endpoints on seeded data.
+
+    python -m benchmarks.suite --restaurants 50 --items 10 --employees 20 \
+        --clients 8 --requests 50 [--endpoints vote-v1 menus ...] \
+        [--output results.json] [--compare baseline.json]
+
+Seeds restaurants x 7 weekly menus x items and token-authenticated
+employee accounts, then drives each endpoint with `--clients` concurrent
+test clients, `--requests` requests per client. Reports p50/p95/p99
+latency, throughput and queries per request for each endpoint. With
+`--output` the results are saved as JSON; `--compare` prints the change
+against a previously saved run.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import subprocess
+import threading
+import time
+
+from benchmarks import common
+
+PASSWORD = 'bench-password'
+
+
+def seed(restaurants, items, employees):
+    from django.contrib.auth import get_user_model  # pylint: disable=import-outside-toplevel
+    from django.contrib.auth.hashers import make_password  # pylint: disable=import-outside-toplevel
+    from rest_framework.authtoken.models import Token  # pylint: disable=import-outside-toplevel
+    from exercise.quickstart.models import (  # pylint: disable=import-outside-toplevel
+        MenuItem, RefMenu, Restaurant, Menu)
+
+    password = make_password(PASSWORD)
+    users = get_user_model().objects.bulk_create(
+        [get_user_model()(email=f'employee{index}@example.com',
+                          username=f'employee{index}', password=password)
+         for index in range(employees)])
+    tokens = Token.objects.bulk_create(
+        [Token(key=Token.generate_key(), user=user) for user in users])
+    menu_items = MenuItem.objects.bulk_create(
+        [MenuItem(name=f'Item {index}', price=10, currency='EUR')
+         for index in range(items)])
+    Restaurant.objects.bulk_create(
+        [Restaurant(restaurantName=f'Restaurant {index}', address='Akropolis',
+                    city='Klaipėda') for index in range(restaurants)])
+    restaurant_ids = list(Restaurant.objects.values_list('id', flat=True))
+    menus = Menu.objects.bulk_create(
+        [Menu(name=f'Menu {day}', day=day, restaurant_id=restaurant_id)
+         for restaurant_id in restaurant_ids for day in range(1, 8)])
+    RefMenu.objects.bulk_create(
+        [RefMenu(menuID=menu, menuItemID=item)
+         for menu in menus for item in menu_items])
+    return users, [token.key for token in tokens], restaurant_ids
+
+
+def scenarios(restaurant_ids, users, items):
+    """
+    Returns `{name: request(client, client_index, n)}` callables issuing
+    the `n`th request of each endpoint, ordered so that login, which
+    replaces tokens, runs last.
+    """
+    from rest_framework.test import APIClient  # pylint: disable=import-outside-toplevel
+
+    def restaurant(n):
+        return restaurant_ids[n % len(restaurant_ids)]
+
+    def vote_v1(client, client_index, n):  # pylint: disable=unused-argument
+        day = n % 7 + 1
+        return client.post(
+            f'/restaurants/{restaurant(n)}/vote/',
+            {'menuName': f'Menu {day}', 'day': day, 'votes': 1, 'increment': True},
+            format='json', HTTP_ACCEPT='application/json; version=v1.0')
+
+    def vote_v2(client, client_index, n):  # pylint: disable=unused-argument
+        entries = [{'menuName': f'Menu {day}', 'day': day, 'votes': 3 - index,
+                    'increment': True}
+                   for index, day in enumerate((n % 7 + 1, (n + 1) % 7 + 1,
+                                                (n + 2) % 7 + 1))]
+        return client.post(
+            f'/restaurants/{restaurant(n)}/vote/', {'data': entries},
+            format='json', HTTP_ACCEPT='application/json; version=v2.0')
+
+    def menu(client, client_index, n):  # pylint: disable=unused-argument
+        day = n % 7 + 1
+        return client.post(
+            f'/restaurants/{restaurant(n)}/menu/',
+            {'menuName': f'Menu {day}', 'day': day,
+             'menuItems': [{'name': f'Item {index}', 'price': '10.00',
+                            'currency': 'EUR'} for index in range(items)]},
+            format='json')
+
+    def menus(client, client_index, n):  # pylint: disable=unused-argument
+        return client.get(f'/restaurants/{restaurant(n)}/menus/')
+
+    def menus_current(client, client_index, n):  # pylint: disable=unused-argument
+        return client.get(f'/restaurants/{restaurant(n)}/menus/current/')
+
+    def votes_current(client, client_index, n):  # pylint: disable=unused-argument
+        return client.get('/restaurants/votes/current/')
+
+    def login(client, client_index, n):  # pylint: disable=unused-argument
+        # Anonymous, and one account per client, as a login replaces the
+        # account's token.
+        return APIClient().post(
+            '/auth/login/',
+            {'email': users[client_index].email, 'password': PASSWORD},
+            format='json')
+
+    return {
+        'menus': menus,
+        'menus-current': menus_current,
+        'votes-current': votes_current,
+        'vote-v1': vote_v1,
+        'vote-v2': vote_v2,
+        'menu': menu,
+        'login': login,
+    }
+
+
+def percentile(ordered, rank):
+    return ordered[max(0, math.ceil(rank / 100 * len(ordered)) - 1)]
+
+
+def run_endpoint(request, clients, requests_per_client):
+    from django.db import connection  # pylint: disable=import-outside-toplevel
+
+    latencies = []
+    queries = []
+    lock = threading.Lock()
+
+    def worker(client_index, request_index):
+        count = [0]
+
+        def counter(execute, sql, params, many, context):
+            count[0] += 1
+            return execute(sql, params, many, context)
+
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(counter):
+                response = request(
+                    clients[client_index], client_index,
+                    client_index * requests_per_client + request_index)
+            ok = response.status_code < 400
+        except Exception:  # pylint: disable=broad-except
+            # e.g. SQLite lock timeouts under concurrent writes.
+            ok = False
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            queries.append(count[0])
+        return ok
+
+    elapsed, errors = common.run_clients(len(clients), requests_per_client, worker)
+    latencies.sort()
+    total = len(latencies)
+    return {
+        'requests': total,
+        'errors': errors,
+        'elapsed_s': round(elapsed, 4),
+        'throughput_rps': round(total / elapsed, 2),
+        'latency_ms': {
+            'p50': round(percentile(latencies, 50) * 1000, 3),
+            'p95': round(percentile(latencies, 95) * 1000, 3),
+            'p99': round(percentile(latencies, 99) * 1000, 3),
+            'mean': round(sum(latencies) / total * 1000, 3),
+            'max': round(latencies[-1] * 1000, 3),
+        },
+        'queries': {
+            'mean': round(sum(queries) / total, 2),
+            'max': max(queries),
+        },
+    }
+
+
+def metadata(args):
+    import django  # pylint: disable=import-outside-toplevel
+    from django.conf import settings  # pylint: disable=import-outside-toplevel
+
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+            text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database_profile': settings.DATABASE_PROFILE,
+        'arguments': vars(args),
+    }
+
+
+def compare(results, baseline_path):
+    with open(baseline_path, encoding='utf-8') as baseline_file:
+        baseline = json.load(baseline_file)['results']
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        before = baseline[name]
+        print(f'{name:15} p95 {before["latency_ms"]["p95"]:9.2f} -> '
+              f'{result["latency_ms"]["p95"]:9.2f}ms '
+              f'({change(before["latency_ms"]["p95"], result["latency_ms"]["p95"])}), '
+              f'throughput {before["throughput_rps"]:8.1f} -> '
+              f'{result["throughput_rps"]:8.1f} req/s '
+              f'({change(before["throughput_rps"], result["throughput_rps"])})')
+
+
+def change(before, after):
+    if not before:
+        return 'n/a'
+    return f'{(after - before) / before * 100:+.1f}%'
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--restaurants', type=int, default=50)
+    parser.add_argument('--items', type=int, default=10)
+    parser.add_argument('--employees', type=int, default=20)
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=50)
+    parser.add_argument('--endpoints', nargs='+')
+    parser.add_argument('--output')
+    parser.add_argument('--compare')
+    args = parser.parse_args()
+
+    common.setup()
+    from rest_framework.test import APIClient  # pylint: disable=import-outside-toplevel
+
+    users, tokens, restaurant_ids = seed(
+        args.restaurants, args.items, max(args.employees, args.clients))
+    clients = []
+    for index in range(args.clients):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {tokens[index]}')
+        clients.append(client)
+
+    results = {}
+    for name, request in scenarios(restaurant_ids, users, args.items).items():
+        if args.endpoints and name not in args.endpoints:
+            continue
+        results[name] = result = run_endpoint(request, clients, args.requests)
+        print(f'{name:15} {result["throughput_rps"]:8.1f} req/s  '
+              f'p50 {result["latency_ms"]["p50"]:8.2f}ms  '
+              f'p95 {result["latency_ms"]["p95"]:8.2f}ms  '
+              f'p99 {result["latency_ms"]["p99"]:8.2f}ms  '
+              f'{result["queries"]["mean"]:5.1f} queries  '
+              f'{result["errors"]} errors')
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as output:
+            json.dump({'meta': metadata(args), 'results': results}, output, indent=2)
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
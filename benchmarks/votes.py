@@ -0,0 +1,67 @@
+"""
+Concurrent-client benchmark for `RestaurantViewSet.vote`.
+
+    python -m benchmarks.votes --clients 8 --requests 200 [--increment] [--buffered]
+
+With `--buffered` votes go through the write-behind buffer, which is
+flushed before the totals are reported.
+"""
+import argparse
+
+from benchmarks import common
+
+
+def seed(restaurants):
+    from django.contrib.auth import get_user_model  # pylint: disable=import-outside-toplevel
+    from exercise.quickstart.models import Restaurant, Menu  # pylint: disable=import-outside-toplevel
+
+    user = get_user_model().objects.create_user(
+        email='bench@example.com', username='bench', password='bench')
+    for index in range(restaurants):
+        restaurant = Restaurant.objects.create(
+            restaurantName=f'Restaurant {index}', address='Akropolis',
+            city='Klaipėda')
+        Menu.objects.bulk_create(
+            [Menu(name=f'Menu {day}', day=day, restaurant=restaurant)
+             for day in range(1, 8)])
+    return user, list(Restaurant.objects.values_list('id', flat=True))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--restaurants', type=int, default=5)
+    parser.add_argument('--increment', action='store_true')
+    parser.add_argument('--buffered', action='store_true')
+    args = parser.parse_args()
+
+    common.setup()
+    if args.buffered:
+        from django.conf import settings  # pylint: disable=import-outside-toplevel
+        settings.VOTE_BUFFER = {**settings.VOTE_BUFFER, 'ENABLED': True}
+    user, restaurant_ids = seed(args.restaurants)
+    clients = [common.authenticated_client(user)
+               for _ in range(args.clients)]
+
+    def worker(client_index, request_index):
+        day = request_index % 7 + 1
+        response = clients[client_index].post(
+            f'/restaurants/{restaurant_ids[request_index % len(restaurant_ids)]}/vote/',
+            {'menuName': f'Menu {day}', 'day': day, 'votes': 1,
+             'increment': args.increment},
+            format='json', HTTP_ACCEPT='application/json; version=v1.0')
+        return response.status_code in (200, 202)
+
+    elapsed, errors = common.run_clients(args.clients, args.requests, worker)
+    common.report('vote', args.clients * args.requests, elapsed, errors)
+    if args.buffered:
+        from exercise.quickstart.votebuffer import get_buffer  # pylint: disable=import-outside-toplevel
+        get_buffer().flush()
+        stats = get_buffer().stats
+        print(f"buffer: {stats['flushes']} flushes, "
+              f"max flush lag {stats['max_flush_lag_ms']:.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
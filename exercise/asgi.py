@@ -12,5 +12,10 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'exercise.settings')
+os.environ.setdefault('EXERCISE_ASYNC_VIEWS', '1')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from exercise.quickstart.events import with_vote_stream  # noqa: E402 pylint: disable=wrong-import-position
+
+application = with_vote_stream(django_application)
@@ -0,0 +1,424 @@
+"""
+Vote history rollups.
+
+The history (active `Vote` tallies summed per week and menu, plus the
+archived `WeeklyVoteSummary` rows) is loaded column-wise with
+`values_list` and aggregated with vectorized group-bys: NumPy arrays
+when NumPy is installed, plain lists otherwise. Both give the same
+results. Weekdays are the menus' days.
+
+The aggregates of the weeks before the current one are cached in the
+`ANALYTICS_CACHE` backend until a write to a past week (an import,
+ballot compaction or archiving) calls `invalidate_history`; each rollup
+only reads the current week's tallies.
+"""
+import datetime
+import math
+import uuid
+from django.db import connections
+from django.db.models import Sum
+from exercise.quickstart.models import Menu, MenuItem, RefMenu, Restaurant, Vote, \
+    WeeklyVoteSummary, current_week
+from . import responsecache
+from .menus import chunked
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+DAYS = range(1, 8)
+CHUNK_SIZE = 10000
+HISTORY_KEY = 'quickstart:analytics-history'
+
+_backend = None
+
+
+def get_backend():
+    global _backend  # pylint: disable=global-statement
+    if _backend is None:
+        _backend = responsecache.create_backend(
+            'ANALYTICS_CACHE', {'TIMEOUT': 600, 'OPTIONS': {'max_entries': 256}})
+    return _backend
+
+
+def cached_history(name, compute, since=None):
+    """
+    Returns `compute(since, before)` over the weeks before the current
+    one, cached until `invalidate_history`.
+    """
+    week = current_week()
+    generation = get_backend().get(HISTORY_KEY)
+    if generation is None:
+        generation = uuid.uuid4().hex
+        get_backend().set(HISTORY_KEY, generation)
+    key = f'{HISTORY_KEY}:{generation}:{name}:{week.isoformat()}:{since}'
+    value = get_backend().get(key)
+    if value is None:
+        value = compute(since, week)
+        get_backend().set(key, value)
+    return value
+
+
+def invalidate_history():
+    get_backend().set(HISTORY_KEY, uuid.uuid4().hex)
+    responsecache.invalidate('analytics')
+
+
+def invalidate_week(week):
+    """
+    Drops the cached rollups holding the votes of `week`.
+    """
+    if week < current_week():
+        invalidate_history()
+    else:
+        responsecache.invalidate('analytics')
+
+
+def merge_counts(*counts):
+    merged = {}
+    for count in counts:
+        for key, value in count.items():
+            merged[key] = merged.get(key, 0) + value
+    return merged
+
+
+def read_columns(queryset, width, converters=None):
+    """
+    Returns the `width` integer columns of a `values_list` queryset. Rows
+    are read from the cursor in chunks, without model field conversion;
+    `converters` maps column positions to functions applied once per
+    distinct value of a chunk.
+    """
+    converters = converters or {}
+    parts = [[] for _ in range(width)]
+    sql, params = queryset.query.sql_with_params()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(CHUNK_SIZE)
+            if not rows:
+                break
+            for index, column in enumerate(zip(*rows)):
+                if index in converters:
+                    cache = {value: converters[index](value) for value in set(column)}
+                    column = list(map(cache.__getitem__, column))
+                if np is not None:
+                    parts[index].append(np.array(column, dtype=np.int64))
+                else:
+                    parts[index].extend(column)
+    if np is not None:
+        return tuple(np.concatenate(part) if part else np.zeros(0, dtype=np.int64)
+                     for part in parts)
+    return tuple(parts)
+
+
+def lookup(mapping, keys):
+    """
+    Maps each of `keys` through `mapping`, which must hold all of them.
+    """
+    if np is not None:
+        table = np.zeros(max(mapping, default=0) + 1, dtype=np.int64)
+        table[np.fromiter(mapping.keys(), dtype=np.int64, count=len(mapping))] = \
+            np.fromiter(mapping.values(), dtype=np.int64, count=len(mapping))
+        return table[keys]
+    return [mapping[key] for key in keys]
+
+
+def pack(keys):
+    """
+    Packs NumPy key columns into one int64 column ordered like the key
+    rows. Returns it and a function unpacking codes into key columns.
+    """
+    lows = [int(key.min()) for key in keys]
+    spans = [int(key.max()) - low + 1 for key, low in zip(keys, lows)]
+    if math.prod(spans) >= 2 ** 62:
+        groups, inverse = np.unique(np.stack(keys, axis=1), axis=0, return_inverse=True)
+        return inverse.ravel(), lambda codes: [groups[codes, index]
+                                               for index in range(len(keys))]
+    codes = np.zeros(len(keys[0]), dtype=np.int64)
+    for key, low, span in zip(keys, lows, spans):
+        codes = codes * span + (key - low)
+
+    def unpack(codes):
+        columns = []
+        for low, span in zip(reversed(lows), reversed(spans)):
+            codes, column = np.divmod(codes, span)
+            columns.append(column + low)
+        return columns[::-1]
+    return codes, unpack
+
+
+def group_starts(codes):
+    return np.flatnonzero(np.concatenate(([True], codes[1:] != codes[:-1])))
+
+
+def group_sum(keys, values):
+    """
+    Sums `values` per distinct row of the `keys` columns. Returns the key
+    columns of the groups, in ascending order, and their sums.
+    """
+    if np is not None:
+        if not len(values):
+            return [np.zeros(0, dtype=np.int64) for _ in keys], np.zeros(0, dtype=np.int64)
+        codes, unpack = pack(keys)
+        order = np.argsort(codes, kind='stable')
+        codes = codes[order]
+        starts = group_starts(codes)
+        return unpack(codes[starts]), np.add.reduceat(np.asarray(values)[order], starts)
+    totals = {}
+    for key, value in zip(zip(*keys), values):
+        totals[key] = totals.get(key, 0) + value
+    ordered = sorted(totals)
+    return ([list(column) for column in zip(*ordered)] or [[] for _ in keys],
+            [totals[key] for key in ordered])
+
+
+def group_argmax(keys, candidates, values):
+    """
+    Picks, per distinct row of the `keys` columns, the candidate with the
+    highest value, the lowest candidate on ties. Returns the key columns
+    of the groups, in ascending order, and their candidates.
+    """
+    if np is not None:
+        if not len(values):
+            return [np.zeros(0, dtype=np.int64) for _ in keys], np.zeros(0, dtype=np.int64)
+        codes, unpack = pack(keys)
+        order = np.lexsort((candidates, -values, codes))
+        codes = codes[order]
+        starts = group_starts(codes)
+        return unpack(codes[starts]), candidates[order][starts]
+    best = {}
+    for key, candidate, value in zip(zip(*keys), candidates, values):
+        if key not in best or (-value, candidate) < (-best[key][1], best[key][0]):
+            best[key] = (candidate, value)
+    ordered = sorted(best)
+    return ([list(column) for column in zip(*ordered)] or [[] for _ in keys],
+            [best[key][0] for key in ordered])
+
+
+def join(keys, right_keys, right_values):
+    """
+    Inner join of `keys` with the `(right_keys, right_values)` pairs.
+    Returns the index into `keys` and the matched value of each result.
+    """
+    if np is not None:
+        order = np.argsort(right_keys, kind='stable')
+        right_keys, right_values = right_keys[order], right_values[order]
+        starts = np.searchsorted(right_keys, keys, side='left')
+        lengths = np.searchsorted(right_keys, keys, side='right') - starts
+        index = np.repeat(np.arange(len(keys)), lengths)
+        positions = np.arange(lengths.sum()) + np.repeat(
+            starts - (np.cumsum(lengths) - lengths), lengths)
+        return index, right_values[positions]
+    matches = {}
+    for key, value in zip(right_keys, right_values):
+        matches.setdefault(key, []).append(value)
+    index, values = [], []
+    for position, key in enumerate(keys):
+        for value in matches.get(key, ()):
+            index.append(position)
+            values.append(value)
+    return index, values
+
+
+def ones(count):
+    if np is not None:
+        return np.ones(count, dtype=np.int64)
+    return [1] * count
+
+
+def concatenate(*columns):
+    if np is not None:
+        return np.concatenate(columns)
+    return [value for column in columns for value in column]
+
+
+def take(column, index):
+    if np is not None:
+        return column[index]
+    return [column[position] for position in index]
+
+
+def moving_average(series, window):
+    """
+    Trailing mean of each row of `series` over up to `window` points.
+    """
+    if np is not None:
+        series = np.asarray(series, dtype=np.int64).reshape(len(series), -1)
+        sums = np.cumsum(series, axis=1)
+        sums[:, window:] = sums[:, window:] - sums[:, :-window]
+        return sums / np.minimum(np.arange(1, series.shape[1] + 1), window)
+    return [[sum(row[max(0, index - window + 1):index + 1]) / min(index + 1, window)
+             for index in range(len(row))] for row in series]
+
+
+def week_ordinal(value):
+    # SQLite returns dates as ISO strings.
+    if isinstance(value, str):
+        value = datetime.date.fromisoformat(value)
+    return value.toordinal()
+
+
+def weeks_since(weeks):
+    """
+    Returns the first of the last `weeks` weeks, or None for all of them.
+    """
+    if weeks is None:
+        return None
+    return current_week() - datetime.timedelta(weeks=weeks - 1)
+
+
+def load_votes(since=None, before=None):
+    """
+    Returns the `(weeks, menu_ids, counts)` columns of the vote history,
+    weeks as ordinals of their Monday, from `since` on and before
+    `before`.
+    """
+    active = Vote.objects.order_by().values('week', 'menu_id').annotate(
+        total=Sum('count')).values_list('week', 'menu_id', 'total')
+    archived = WeeklyVoteSummary.objects.values_list('week', 'menu_id', 'count')
+    if since is not None:
+        active = active.filter(week__gte=since)
+        archived = archived.filter(week__gte=since)
+    if before is not None:
+        active = active.filter(week__lt=before)
+        archived = archived.filter(week__lt=before)
+    parts = [read_columns(queryset, 3, {0: week_ordinal})
+             for queryset in (active, archived)]
+    return tuple(concatenate(*columns) for columns in zip(*parts))
+
+
+def weekly_wins(since=None, before=None):
+    """
+    Returns `(votes, wins)`: `{(restaurant_id, day): votes}` and
+    `{(restaurant_id, day): weeks won}`, a restaurant winning a weekday of
+    a week when its menus got the most votes that day.
+    """
+    weeks, menu_ids, counts = load_votes(since, before)
+    menus = Menu.objects.values_list('id', 'restaurant_id', 'day')
+    restaurants = lookup({menu_id: restaurant_id for menu_id, restaurant_id, _ in menus},
+                         menu_ids)
+    days = lookup({menu_id: day for menu_id, _, day in menus}, menu_ids)
+
+    (restaurant_keys, day_keys), totals = group_sum([restaurants, days], counts)
+    votes = dict(zip(zip(map(int, restaurant_keys), map(int, day_keys)), map(int, totals)))
+
+    (week_keys, day_keys, restaurant_keys), totals = group_sum(
+        [weeks, days, restaurants], counts)
+    (_, win_days), winners = group_argmax([week_keys, day_keys], restaurant_keys, totals)
+    (restaurant_keys, day_keys), won = group_sum(
+        [winners, win_days], ones(len(winners)))
+    wins = dict(zip(zip(map(int, restaurant_keys), map(int, day_keys)), map(int, won)))
+    return votes, wins
+
+
+def restaurant_wins(since=None):
+    """
+    Returns the `weekly_wins` of the weeks from `since` on.
+    """
+    history_votes, history_wins = cached_history('wins', weekly_wins, since)
+    votes, wins = weekly_wins(current_week())
+    return merge_counts(history_votes, votes), merge_counts(history_wins, wins)
+
+
+def restaurant_names(ids):
+    names = {}
+    for chunk in chunked(ids):
+        names.update(Restaurant.objects.filter(id__in=chunk).values_list(
+            'id', 'restaurantName'))
+    return names
+
+
+def restaurant_rollup(since=None):
+    """
+    Returns per restaurant its votes and weekday wins, overall and per
+    weekday, most voted first.
+    """
+    votes, wins = restaurant_wins(since)
+    ids = {restaurant_id for restaurant_id, _ in votes}
+    names = restaurant_names(ids)
+    rollup = [{
+        'restaurantId': restaurant_id,
+        'restaurantName': names.get(restaurant_id),
+        'votes': sum(votes.get((restaurant_id, day), 0) for day in DAYS),
+        'wins': sum(wins.get((restaurant_id, day), 0) for day in DAYS),
+        'votesByDay': [votes.get((restaurant_id, day), 0) for day in DAYS],
+        'winsByDay': [wins.get((restaurant_id, day), 0) for day in DAYS],
+    } for restaurant_id in ids]
+    rollup.sort(key=lambda entry: (-entry['votes'], entry['restaurantId']))
+    return rollup
+
+
+def weekday_rollup(since=None, limit=10):
+    """
+    Returns per weekday its votes and the restaurants that won it most
+    often.
+    """
+    votes, wins = restaurant_wins(since)
+    names = restaurant_names({restaurant_id for restaurant_id, _ in wins})
+    rollup = []
+    for day in DAYS:
+        winners = sorted(
+            ((restaurant_id, count) for (restaurant_id, win_day), count in wins.items()
+             if win_day == day), key=lambda winner: (-winner[1], winner[0]))
+        rollup.append({
+            'day': day,
+            'votes': sum(count for (_, vote_day), count in votes.items() if vote_day == day),
+            'winners': [{'restaurantId': restaurant_id,
+                         'restaurantName': names.get(restaurant_id),
+                         'wins': count}
+                        for restaurant_id, count in winners[:limit]],
+        })
+    return rollup
+
+
+def item_weeks(since=None, before=None):
+    """
+    Returns `{(item_id, week): votes}`, weeks as ordinals of their Monday.
+    """
+    vote_weeks, menu_ids, counts = load_votes(since, before)
+    ref_menus, ref_items = read_columns(
+        RefMenu.objects.values_list('menuID_id', 'menuItemID_id'), 2)
+    index, items = join(menu_ids, ref_menus, ref_items)
+    (item_keys, week_keys), totals = group_sum(
+        [items, take(vote_weeks, index)], take(counts, index))
+    return dict(zip(zip(map(int, item_keys), map(int, week_keys)), map(int, totals)))
+
+
+def item_trends(weeks=13, window=4, limit=20):
+    """
+    Returns the weekly votes of the `limit` most voted menu items over the
+    last `weeks` weeks, with their trailing `window`-week average. A vote
+    for a menu counts for each of its items.
+    """
+    end = current_week()
+    start = end - datetime.timedelta(weeks=weeks - 1)
+    totals = merge_counts(cached_history('items', item_weeks, start), item_weeks(end))
+    item_totals = {}
+    for (item_id, _), total in totals.items():
+        item_totals[item_id] = item_totals.get(item_id, 0) + total
+
+    top = sorted(((total, item_id) for item_id, total in item_totals.items()),
+                 key=lambda item: (-item[0], item[1]))[:limit]
+    rows = {item_id: row for row, (_, item_id) in enumerate(top)}
+    series = [[0] * weeks for _ in top]
+    for (item_id, week), total in totals.items():
+        if item_id in rows:
+            series[rows[item_id]][(week - start.toordinal()) // 7] = total
+    averages = moving_average(series, window) if series else []
+
+    details = {item_id: (name, price, currency) for item_id, name, price, currency
+               in MenuItem.objects.filter(id__in=rows).values_list(
+                   'id', 'name', 'price', 'currency')}
+    return [{
+        'menuItemId': item_id,
+        'name': details[item_id][0],
+        'price': str(details[item_id][1]),
+        'currency': details[item_id][2],
+        'votes': total,
+        'weeks': [{'week': (start + datetime.timedelta(weeks=offset)).isoformat(),
+                   'votes': series[row][offset],
+                   'movingAverage': round(float(averages[row][offset]), 2)}
+                  for offset in range(weeks)],
+    } for row, (total, item_id) in enumerate(top)]
@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class QuickstartConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'exercise.quickstart'
+
+    def ready(self):
+        from . import signals  # noqa: F401 pylint: disable=import-outside-toplevel,unused-import
+        from . import votebuffer  # pylint: disable=import-outside-toplevel
+
+        # Queues the votes journalled by processes that exited unflushed.
+        votebuffer.get_buffer()
@@ -0,0 +1,76 @@
+"""
+Archival of past weeks' votes.
+
+`Vote` keeps the tallies of the last `ACTIVE_WEEKS` ISO weeks, the
+current one included, so current-day reads stay on a small table.
+`archive_votes` folds each older week into one `WeeklyVoteSummary` row
+per menu, adding to rows of earlier runs, and deletes the week's
+tallies, one transaction per week.
+"""
+import datetime
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.utils import timezone
+from exercise.quickstart.models import Vote, WeeklyVoteSummary, week_of
+from . import analytics
+
+DEFAULT_SETTINGS = {
+    'ACTIVE_WEEKS': 2,
+}
+
+
+def archive_settings():
+    return {**DEFAULT_SETTINGS, **getattr(settings, 'VOTE_ARCHIVE', {})}
+
+
+def active_since(date=None, active_weeks=None):
+    """
+    Returns the first week whose tallies are kept in `Vote`.
+    """
+    active_weeks = active_weeks or archive_settings()['ACTIVE_WEEKS']
+    return week_of(date or timezone.localdate()) - datetime.timedelta(
+        weeks=active_weeks - 1)
+
+
+def archive_week(week):
+    """
+    Moves the tallies of `week` into its summaries. Returns the number of
+    summaries written.
+    """
+    totals = dict(
+        Vote.objects.filter(week=week).order_by().values('menu_id').annotate(
+            total=Sum('count')).values_list('menu_id', 'total'))
+    for menu_id, count in WeeklyVoteSummary.objects.filter(
+            week=week, menu_id__in=list(totals)).values_list('menu_id', 'count'):
+        totals[menu_id] += count
+    WeeklyVoteSummary.objects.bulk_create(
+        [WeeklyVoteSummary(week=week, menu_id=menu_id, count=count)
+         for menu_id, count in totals.items()],
+        update_conflicts=True,
+        unique_fields=['week', 'menu_id'],
+        update_fields=['count'])
+    # A plain DELETE: archived weeks have no cached rankings or streams
+    # for the Vote signals to update.
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {connection.ops.quote_name(Vote._meta.db_table)} '
+            f'WHERE {connection.ops.quote_name("week")} = %s',
+            [connection.ops.adapt_datefield_value(week)])
+    return len(totals)
+
+
+def archive_votes(date=None, active_weeks=None):
+    """
+    Archives every week before the active ones. Returns `{week: summaries
+    written}`.
+    """
+    cutoff = active_since(date, active_weeks)
+    weeks = Vote.objects.filter(week__lt=cutoff).order_by('week').values_list(
+        'week', flat=True).distinct()
+    archived = {}
+    for week in list(weeks):
+        with transaction.atomic():
+            archived[week] = archive_week(week)
+            transaction.on_commit(analytics.invalidate_history)
+    return archived
@@ -0,0 +1,210 @@
+"""
+Async implementations of the hot restaurant endpoints for ASGI servers.
+
+They serve the same routes, payloads and AcceptHeader versions as the
+matching `RestaurantViewSet` actions, but run on the event loop and use
+the async ORM instead of going through the sync adapter's thread pool.
+They answer token-authenticated requests that send and accept JSON;
+any other request (session authentication, form bodies, the browsable
+API, streamed lists) is handed to the `RestaurantViewSet` action. The
+routes are installed in front of the router when `ASYNC_VIEWS` is
+enabled.
+"""
+from functools import wraps
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.urls import path
+from django.utils import timezone
+from rest_framework import exceptions, status
+from rest_framework.authentication import get_authorization_header
+from rest_framework.settings import api_settings
+from rest_framework.utils.mediatypes import _MediaType
+from exercise.quickstart.models import Menu, Vote, current_week
+from exercise.quickstart.serializers import VotingManyRequestSerializer, \
+    VotingSingleRequestSerializer
+from .authentication import CachedTokenAuthentication
+from .ballots import DuplicateBallot
+from .readserializers import aserialize_menus, aserialize_votes
+from .renderers import FastJSONRenderer, loads
+from .responsecache import cached_entry, finalize, get_backend, make_entry, \
+    response_key
+from .streaming import TRUE_VALUES
+from .views import RestaurantViewSet
+from .votes import aresolve_menu_ids, ballot_results, write_ballot
+
+JSON_MEDIA_TYPES = ('application/json', 'application/*', '*/*')
+
+renderer = FastJSONRenderer()
+authenticator = CachedTokenAuthentication()
+
+
+def json_response(data, status_code=status.HTTP_200_OK):
+    return HttpResponse(
+        renderer.render(data), status=status_code,
+        content_type=renderer.media_type)
+
+
+def request_version(request):
+    """
+    Reads the `version` parameter of the Accept header the way
+    AcceptHeaderVersioning does.
+    """
+    for media_type in request.META.get('HTTP_ACCEPT', '').split(','):
+        version = _MediaType(media_type.strip()).params.get(
+            api_settings.VERSION_PARAM)
+        if version is not None:
+            break
+    else:
+        version = api_settings.DEFAULT_VERSION
+    if version not in api_settings.ALLOWED_VERSIONS:
+        raise exceptions.NotAcceptable("Invalid version in 'Accept' header.")
+    return version
+
+
+def request_data(request):
+    if request.content_type == 'application/json':
+        try:
+            return loads(request.body or b'null')
+        except ValueError as error:
+            raise exceptions.ParseError(f'JSON parse error - {error}') from error
+    return request.POST.dict()
+
+
+def viewset_action(name):
+    """
+    Returns the `RestaurantViewSet` action view the router serves `name`
+    by, rendering its response.
+    """
+    action = getattr(RestaurantViewSet, name)
+    view = RestaurantViewSet.as_view(
+        dict(action.mapping), basename='restaurant', detail=action.detail, **action.kwargs)
+
+    def rendered(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        return response.render() if hasattr(response, 'render') else response
+    return rendered
+
+
+def is_async_request(request, methods):
+    """
+    Tells whether the async view can answer `request`: a token-authenticated
+    request of one of `methods` with a JSON body, if any, that accepts a
+    plain JSON response.
+    """
+    auth = get_authorization_header(request).split()
+    if request.method not in methods or not auth or \
+            auth[0].lower() != authenticator.keyword.lower().encode():
+        return False
+    if request.method == 'POST' and request.content_type != 'application/json':
+        return False
+    if request.GET.get('stream', '').lower() in TRUE_VALUES:
+        return False
+    accept = request.META.get('HTTP_ACCEPT', '')
+    for media_type in filter(None, map(str.strip, accept.split(','))):
+        media_type = _MediaType(media_type)
+        if f'{media_type.main_type}/{media_type.sub_type}' not in JSON_MEDIA_TYPES:
+            return False
+    return True
+
+
+def api_view(methods, action):
+    """
+    Applies versioning, token authentication and the IsAuthenticated
+    permission to an async view, rendering API errors the way DRF does.
+    Requests the view does not handle go to the `RestaurantViewSet` action.
+    """
+    def decorator(view):
+        fallback = viewset_action(action)
+
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if not is_async_request(request, methods):
+                return await sync_to_async(fallback)(request, *args, **kwargs)
+            try:
+                request.version = request_version(request)
+                credentials = await authenticator.aauthenticate(request)
+                if credentials is None:
+                    raise exceptions.NotAuthenticated()
+                request.user, request.auth = credentials
+                return await view(request, *args, **kwargs)
+            except exceptions.APIException as exc:
+                response = json_response({'detail': exc.detail}, exc.status_code)
+                if isinstance(exc, (exceptions.NotAuthenticated,
+                                    exceptions.AuthenticationFailed)):
+                    response.status_code = status.HTTP_401_UNAUTHORIZED
+                    response['WWW-Authenticate'] = authenticator.authenticate_header(
+                        request)
+                return response
+        wrapper.csrf_exempt = True
+        return wrapper
+    return decorator
+
+
+@api_view(['POST'], 'vote')
+async def vote(request, pk):
+    data = request_data(request)
+    if request.version == 'v2.0':
+        serializer = VotingManyRequestSerializer(data=data)
+        if not serializer.is_valid():
+            return json_response(None, status.HTTP_400_BAD_REQUEST)
+        entries = serializer.data['data']
+        if len(entries) > 3 or len(entries) < 1:
+            return json_response(
+                {'error': 'Only top three menu items are accepted for voting'},
+                status.HTTP_400_BAD_REQUEST)
+    else:
+        serializer = VotingSingleRequestSerializer(data=data)
+        if not serializer.is_valid():
+            return json_response(None, status.HTTP_400_BAD_REQUEST)
+        entries = [serializer.data]
+
+    menu_ids = await aresolve_menu_ids(
+        pk, [(item['menuName'], item['day']) for item in entries])
+    results = ballot_results(entries, menu_ids)
+    if any(result['status'] != 'ok' for result in results):
+        if request.version == 'v2.0':
+            return json_response({'data': results}, status.HTTP_400_BAD_REQUEST)
+        return json_response(
+            {'error': 'Menu with provided name and day have not been found'},
+            status.HTTP_400_BAD_REQUEST)
+
+    try:
+        buffered = await sync_to_async(write_ballot)(
+            entries, menu_ids, user=request.user)
+    except DuplicateBallot as error:
+        return json_response(
+            {'error': 'A ballot has already been cast for this day',
+             'days': error.days},
+            status.HTTP_409_CONFLICT)
+    status_code = status.HTTP_202_ACCEPTED if buffered else status.HTTP_200_OK
+    if request.version == 'v2.0':
+        return json_response({'data': results}, status_code)
+    return json_response(None, status_code)
+
+
+@api_view(['GET', 'HEAD'], 'menus_current_day')
+async def menus_current_day(request, pk):
+    key = response_key(
+        'menus_current', [f'restaurant:{pk}', 'menus'], request,
+        current_day=True)
+    entry = cached_entry(request, key)
+    if entry is None:
+        day = timezone.now().weekday() + 1
+        entry = make_entry(await aserialize_menus(
+            Menu.objects.filter(restaurant_id=pk, day=day)))
+        get_backend().set(key, entry)
+    return finalize(request, entry, response_class=json_response)
+
+
+@api_view(['GET', 'HEAD'], 'current_day_votes')
+async def current_day_votes(request):
+    day = timezone.now().weekday() + 1
+    return json_response(await aserialize_votes(
+        Vote.objects.filter(week=current_week(), day=day), request))
+
+
+urlpatterns = [
+    path('restaurants/<int:pk>/vote/', vote),
+    path('restaurants/<int:pk>/menus/current/', menus_current_day),
+    path('restaurants/votes/current/', current_day_votes),
+]
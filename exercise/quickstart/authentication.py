@@ -0,0 +1,99 @@
+import copy
+import uuid
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication, \
+    get_authorization_header
+from .responsecache import create_backend
+
+_backend = None
+
+
+def get_backend():
+    global _backend  # pylint: disable=global-statement
+    if _backend is None:
+        _backend = create_backend(
+            'TOKEN_CACHE', {'OPTIONS': {'max_entries': 10000}})
+    return _backend
+
+
+def invalidate_token(key):
+    get_backend().delete(f'quickstart:token:{key}')
+
+
+def invalidate_user(user_id):
+    get_backend().delete(f'quickstart:token-user:{user_id}')
+
+
+def cached_credentials(key):
+    """
+    Returns the cached `(user, token)` of token `key`, or None. An entry
+    holds the generation of its user, so it is only valid while the
+    user's generation entry, dropped by `invalidate_user` or evicted on
+    its own, still matches.
+    """
+    cached = get_backend().get(f'quickstart:token:{key}')
+    if cached is None:
+        return None
+    user, token, user_generation = cached
+    if get_backend().get(f'quickstart:token-user:{user.pk}') != user_generation:
+        return None
+    return user, token
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Token authentication that keeps recently seen tokens and their users in
+    a bounded TTL cache, so repeated requests skip the token and user join.
+
+    Entries are dropped when a token is deleted (login, logout) and go
+    stale when their user is saved (password change, deactivation).
+    """
+
+    def authenticate_credentials(self, key):
+        cached = cached_credentials(key)
+        if cached is None:
+            cached = super().authenticate_credentials(key)
+            self.remember(key, *cached)
+        user, token = cached
+        return (copy.copy(user), token)
+
+    async def aauthenticate(self, request):
+        """
+        Async counterpart of `authenticate` used by the ASGI views.
+        """
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed(
+                _('Invalid token header. No credentials provided.'))
+        try:
+            key = auth[1].decode()
+        except UnicodeError as error:
+            raise exceptions.AuthenticationFailed(
+                _('Invalid token header. Token string should not contain '
+                  'invalid characters.')) from error
+        return await self.aauthenticate_credentials(key)
+
+    async def aauthenticate_credentials(self, key):
+        cached = cached_credentials(key)
+        if cached is None:
+            model = self.get_model()
+            try:
+                token = await model.objects.select_related('user').aget(key=key)
+            except model.DoesNotExist as error:
+                raise exceptions.AuthenticationFailed(_('Invalid token.')) from error
+            if not token.user.is_active:
+                raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+            cached = (token.user, token)
+            self.remember(key, *cached)
+        user, token = cached
+        return (copy.copy(user), token)
+
+    @staticmethod
+    def remember(key, user, token):
+        generation_key = f'quickstart:token-user:{user.pk}'
+        user_generation = get_backend().get(generation_key) or uuid.uuid4().hex
+        get_backend().set(generation_key, user_generation)
+        get_backend().set(f'quickstart:token:{key}', (user, token, user_generation))
@@ -0,0 +1,139 @@
+"""
+Per-employee ballot ledger.
+
+With the ledger enabled a ballot is appended as one `Ballot` row per
+employee and day, holding the menu ids ranked by the entries' `votes`,
+instead of being added to the shared `Vote` rows, so voters never
+contend on a tally row. A second ballot for the same day of the same
+week is rejected.
+
+`compact_ballots` folds pending ballots into the `Vote` tallies of their
+week in bulk, the n-th ranked menu scoring `WEIGHTS[n]`. `rebuild_tallies`
+recomputes the tallies of every balloted menu of the active weeks from
+the ledger.
+"""
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from exercise.quickstart.models import Ballot, Menu, week_of
+from .menus import chunked
+
+DEFAULT_SETTINGS = {
+    'ENABLED': False,
+    'WEIGHTS': (3, 2, 1),
+    'COMPACT_BATCH_SIZE': 5000,
+}
+
+
+class DuplicateBallot(Exception):
+
+    def __init__(self, days):
+        super().__init__(f'A ballot has already been cast for days {days}')
+        self.days = days
+
+
+def ledger_settings():
+    return {**DEFAULT_SETTINGS, **getattr(settings, 'VOTE_LEDGER', {})}
+
+
+def ledger_enabled():
+    return ledger_settings()['ENABLED']
+
+
+def rank_ballots(entries, menu_ids):
+    """
+    Returns `{day: [menu_id, ...]}`, each day's menus ordered by the votes
+    they were given, then by their position in the ballot.
+    """
+    ranked = {}
+    for item in sorted(entries, key=lambda item: -item['votes']):
+        menus = ranked.setdefault(item['day'], [])
+        menu_id = menu_ids[(item['menuName'], item['day'])]
+        if menu_id not in menus:
+            menus.append(menu_id)
+    return ranked
+
+
+def cast_ballots(user, entries, menu_ids, date=None):
+    """
+    Appends the ballots of `user` for the week of `date` (today by
+    default). Raises DuplicateBallot, writing nothing, when one of the
+    days already has a ballot.
+    """
+    week = week_of(date or timezone.localdate())
+    ranked = rank_ballots(entries, menu_ids)
+    try:
+        with transaction.atomic():
+            Ballot.objects.bulk_create(
+                [Ballot(user=user, week=week, day=day, menus=menus)
+                 for day, menus in ranked.items()])
+    except IntegrityError as error:
+        raise DuplicateBallot(sorted(ranked)) from error
+
+
+def tally(ballots, weights):
+    """
+    Sums `(week, day, menus)` ballots into `{week: [(menu_id, day, count)]}`
+    tallies of menus that still exist.
+    """
+    counts = {}
+    for week, day, menus in ballots:
+        for menu_id, weight in zip(menus, weights):
+            key = (week, menu_id, day)
+            counts[key] = counts.get(key, 0) + weight
+    existing = set()
+    for menu_ids in chunked({menu_id for _, menu_id, _ in counts}):
+        existing.update(
+            Menu.objects.filter(id__in=menu_ids).values_list('id', flat=True))
+    tallies = {}
+    for (week, menu_id, day), count in counts.items():
+        if menu_id in existing:
+            tallies.setdefault(week, []).append((menu_id, day, count))
+    return tallies
+
+
+def compact_ballots(batch_size=None):
+    """
+    Folds pending ballots into the `Vote` tallies of their weeks,
+    `batch_size` ballots per transaction. Returns the number of ballots
+    compacted.
+    """
+    from .votes import upsert_votes  # pylint: disable=import-outside-toplevel
+
+    options = ledger_settings()
+    batch_size = batch_size or options['COMPACT_BATCH_SIZE']
+    total = 0
+    while True:
+        with transaction.atomic():
+            pending = list(
+                Ballot.objects.filter(compacted=False).select_for_update(
+                    skip_locked=True).order_by('id').values_list(
+                        'id', 'week', 'day', 'menus')[:batch_size])
+            if not pending:
+                return total
+            tallies = tally([ballot[1:] for ballot in pending], options['WEIGHTS'])
+            for week, votes in tallies.items():
+                upsert_votes(votes, increment=True, week=week)
+            Ballot.objects.filter(
+                id__in=[ballot[0] for ballot in pending]).update(compacted=True)
+        total += len(pending)
+
+
+def rebuild_tallies():
+    """
+    Overwrites the `Vote` tally of every menu and day with ballots in the
+    active weeks with the sum of their ballots, and marks the ballots
+    compacted. Returns the number of tallies written.
+    """
+    from .archive import active_since  # pylint: disable=import-outside-toplevel
+    from .votes import upsert_votes  # pylint: disable=import-outside-toplevel
+
+    with transaction.atomic():
+        ballots = list(Ballot.objects.filter(week__gte=active_since()).values_list(
+            'id', 'week', 'day', 'menus'))
+        tallies = tally([ballot[1:] for ballot in ballots], ledger_settings()['WEIGHTS'])
+        for week, votes in tallies.items():
+            upsert_votes(votes, week=week)
+        for ballot_ids in chunked(ballot[0] for ballot in ballots):
+            Ballot.objects.filter(id__in=ballot_ids).update(compacted=True)
+    return sum(len(votes) for votes in tallies.values())
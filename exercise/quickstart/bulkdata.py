@@ -0,0 +1,228 @@
+import csv
+import datetime
+import json
+from decimal import Decimal
+from django.db import transaction
+from exercise.quickstart.models import MenuItem, RefMenu, Restaurant, Menu, Vote, week_of
+from .menus import refresh_prices
+from .votes import upsert_votes
+
+DEFAULT_CHUNK_SIZE = 2000
+
+# Columns written and read for each model. Foreign keys are expressed
+# through natural keys, so files can be loaded into a database with
+# different ids.
+COLUMNS = {
+    'restaurant': ('restaurantName', 'address', 'city'),
+    'menuitem': ('name', 'price', 'currency'),
+    'menu': ('name', 'day', 'restaurantName', 'city'),
+    'refmenu': ('menuName', 'menuDay', 'restaurantName', 'city',
+                'itemName', 'price', 'currency'),
+    'vote': ('count', 'week', 'day', 'menuName', 'menuDay', 'restaurantName',
+             'city'),
+}
+
+EXPORT_QUERIES = {
+    'restaurant': (Restaurant, ('restaurantName', 'address', 'city')),
+    'menuitem': (MenuItem, ('name', 'price', 'currency')),
+    'menu': (Menu, ('name', 'day', 'restaurant__restaurantName',
+                    'restaurant__city')),
+    'refmenu': (RefMenu, ('menuID__name', 'menuID__day',
+                          'menuID__restaurant__restaurantName',
+                          'menuID__restaurant__city', 'menuItemID__name',
+                          'menuItemID__price', 'menuItemID__currency')),
+    'vote': (Vote, ('count', 'week', 'day', 'menu__name', 'menu__day',
+                    'menu__restaurant__restaurantName',
+                    'menu__restaurant__city')),
+}
+
+INTEGER_COLUMNS = {'day', 'menuDay', 'count'}
+DECIMAL_COLUMNS = {'price'}
+# ISO dates, normalized to the Monday that identifies their week.
+WEEK_COLUMNS = {'week'}
+
+
+def detect_format(path, default='ndjson'):
+    if path.endswith('.csv'):
+        return 'csv'
+    if path.endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    return default
+
+
+def chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def export_rows(model_name, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yields rows of `model_name` as dicts keyed by `COLUMNS`, streaming them
+    from the database `chunk_size` rows at a time.
+    """
+    model, lookups = EXPORT_QUERIES[model_name]
+    columns = COLUMNS[model_name]
+    queryset = model.objects.order_by('id').values_list(*lookups)
+    for values in queryset.iterator(chunk_size=chunk_size):
+        yield dict(zip(columns, values))
+
+
+def write_rows(rows, stream, file_format, model_name):
+    columns = COLUMNS[model_name]
+    if file_format == 'csv':
+        writer = csv.writer(stream)
+        writer.writerow(columns)
+        for row in rows:
+            writer.writerow([row[column] for column in columns])
+            yield row
+        return
+    for row in rows:
+        stream.write(json.dumps(row, default=str, ensure_ascii=False))
+        stream.write('\n')
+        yield row
+
+
+def read_rows(stream, file_format):
+    """
+    Yields typed row dicts from an NDJSON or CSV stream, one line at a time.
+    """
+    if file_format == 'csv':
+        rows = csv.DictReader(stream)
+    else:
+        rows = (json.loads(line) for line in stream if line.strip())
+    for row in rows:
+        for column in INTEGER_COLUMNS.intersection(row):
+            row[column] = int(row[column])
+        for column in DECIMAL_COLUMNS.intersection(row):
+            row[column] = Decimal(str(row[column])).quantize(Decimal('0.01'))
+        for column in WEEK_COLUMNS.intersection(row):
+            row[column] = week_of(datetime.date.fromisoformat(row[column])) \
+                if row[column] else None
+        yield row
+
+
+class BulkImporter:
+    """
+    Writes chunks of imported rows, resolving natural keys through lookup
+    tables that are loaded once and extended as rows are created.
+
+    The lookup tables hold restaurants, menus and menu items only, so
+    memory does not depend on the number of votes or ref rows imported.
+    """
+
+    def __init__(self):
+        self._restaurants = None
+        self._menus = None
+        self._menu_items = None
+
+    @property
+    def restaurants(self):
+        if self._restaurants is None:
+            self._restaurants = {
+                (name, city): restaurant_id
+                for restaurant_id, name, city in Restaurant.objects.order_by(
+                    '-id').values_list('id', 'restaurantName', 'city')}
+        return self._restaurants
+
+    @property
+    def menus(self):
+        if self._menus is None:
+            self._menus = {
+                (name, day, restaurant_id): menu_id
+                for menu_id, name, day, restaurant_id in Menu.objects.values_list(
+                    'id', 'name', 'day', 'restaurant_id')}
+        return self._menus
+
+    @property
+    def menu_items(self):
+        if self._menu_items is None:
+            self._menu_items = {
+                (name, price, currency): item_id
+                for item_id, name, price, currency in MenuItem.objects.values_list(
+                    'id', 'name', 'price', 'currency')}
+        return self._menu_items
+
+    def menu_id(self, row, name_column='menuName', day_column='menuDay'):
+        restaurant_id = self.restaurants.get(
+            (row['restaurantName'], row['city']))
+        return self.menus.get((row[name_column], row[day_column], restaurant_id))
+
+    def write(self, model_name, rows):
+        """
+        Writes a chunk of rows in one transaction and returns the number
+        of rows skipped because a referenced row does not exist.
+        """
+        with transaction.atomic():
+            return getattr(self, f'write_{model_name}')(rows)
+
+    def write_restaurant(self, rows):
+        created = {}
+        for row in rows:
+            key = (row['restaurantName'], row['city'])
+            if key not in self.restaurants and key not in created:
+                created[key] = Restaurant(**{
+                    column: row[column] for column in COLUMNS['restaurant']})
+        for key, restaurant in zip(created, Restaurant.objects.bulk_create(
+                created.values())):
+            self.restaurants[key] = restaurant.id
+        return 0
+
+    def write_menuitem(self, rows):
+        created = {}
+        for row in rows:
+            key = (row['name'], row['price'], row['currency'])
+            if key not in self.menu_items and key not in created:
+                created[key] = MenuItem(
+                    name=row['name'], price=row['price'], currency=row['currency'])
+        for key, item in zip(created, MenuItem.objects.bulk_create(
+                created.values())):
+            self.menu_items[key] = item.id
+        return 0
+
+    def write_menu(self, rows):
+        created = {}
+        skipped = 0
+        for row in rows:
+            restaurant_id = self.restaurants.get(
+                (row['restaurantName'], row['city']))
+            if restaurant_id is None:
+                skipped += 1
+                continue
+            key = (row['name'], row['day'], restaurant_id)
+            if key not in self.menus and key not in created:
+                created[key] = Menu(
+                    name=row['name'], day=row['day'], restaurant_id=restaurant_id)
+        for key, menu in zip(created, Menu.objects.bulk_create(created.values())):
+            self.menus[key] = menu.id
+        return skipped
+
+    def write_refmenu(self, rows):
+        refs = []
+        for row in rows:
+            menu_id = self.menu_id(row)
+            item_id = self.menu_items.get(
+                (row['itemName'], row['price'], row['currency']))
+            if menu_id is not None and item_id is not None:
+                refs.append(RefMenu(menuID_id=menu_id, menuItemID_id=item_id))
+        RefMenu.objects.bulk_create(refs, ignore_conflicts=True)
+        refresh_prices({ref.menuID_id for ref in refs})
+        return len(rows) - len(refs)
+
+    def write_vote(self, rows):
+        # Files without a week column load into the current week. Imported
+        # tallies are not live votes, so they are not streamed.
+        weeks = {}
+        for row in rows:
+            menu_id = self.menu_id(row)
+            if menu_id is not None:
+                weeks.setdefault(row.get('week'), []).append(
+                    (menu_id, row['day'], row['count']))
+        for week, votes in weeks.items():
+            upsert_votes(votes, week=week, publish=False)
+        return len(rows) - sum(len(votes) for votes in weeks.values())
@@ -0,0 +1,94 @@
+"""
+Response compression negotiated from the request's Accept-Encoding.
+
+Brotli is preferred when the `brotli` package is installed and the
+client accepts it, gzip otherwise. Coding preferences (`q` values) are
+honoured, responses below `MIN_SIZE` bytes are sent as they are, and
+streaming responses are compressed with gzip as they are sent.
+"""
+from django.conf import settings
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+DEFAULT_SETTINGS = {
+    'MIN_SIZE': 200,
+    'BROTLI_QUALITY': 4,
+}
+
+
+def compression_settings():
+    return {**DEFAULT_SETTINGS, **getattr(settings, 'RESPONSE_COMPRESSION', {})}
+
+
+def accepted_encodings(header):
+    """
+    Returns `{coding: q}` for the codings listed in an Accept-Encoding
+    header.
+    """
+    encodings = {}
+    for part in header.split(','):
+        coding, *params = part.strip().lower().split(';')
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.strip().partition('=')
+            if name == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        encodings[coding.strip()] = quality
+    return encodings
+
+
+def negotiate(header, streaming=False):
+    """
+    Returns the coding to compress a response with, or None.
+    """
+    encodings = accepted_encodings(header)
+    wildcard = encodings.get('*', 0.0)
+    available = ['gzip'] if brotli is None or streaming else ['br', 'gzip']
+    best = None
+    for coding in available:
+        quality = encodings.get(coding, wildcard)
+        if quality > 0 and (best is None or quality > best[1]):
+            best = (coding, quality)
+    return best and best[0]
+
+
+class CompressionMiddleware(GZipMiddleware):
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        options = compression_settings()
+        self.min_size = options['MIN_SIZE']
+        self.brotli_quality = options['BROTLI_QUALITY']
+
+    def process_response(self, request, response):
+        if response.has_header('Content-Encoding') or (
+                not response.streaming and len(response.content) < self.min_size):
+            return response
+        coding = negotiate(
+            request.META.get('HTTP_ACCEPT_ENCODING', ''), response.streaming)
+        if coding == 'gzip':
+            return super().process_response(request, response)
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if coding != 'br':
+            return response
+        compressed_content = brotli.compress(
+            response.content, quality=self.brotli_quality)
+        if len(compressed_content) >= len(response.content):
+            return response
+        response.content = compressed_content
+        response.headers['Content-Length'] = str(len(response.content))
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = 'br'
+        return response
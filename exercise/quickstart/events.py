@@ -0,0 +1,192 @@
+"""
+Server-Sent Events stream of vote tallies.
+
+Subscribers of `STREAM_PATH` first receive a `snapshot` event with the
+tallies of a day, then a `delta` event for every committed vote write.
+Events are fanned out by the broadcaster named in `VOTE_BROADCASTER`.
+"""
+import asyncio
+import json
+from threading import Lock
+from urllib.parse import parse_qs
+from django.conf import settings
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from rest_framework import exceptions
+from exercise.quickstart.models import Vote, current_week
+from .authentication import CachedTokenAuthentication
+
+STREAM_PATH = '/restaurants/votes/stream/'
+KEEPALIVE_SECONDS = 15
+RESYNC = object()
+
+
+class LocalBroadcaster:
+    """
+    In-process fan-out to subscriber queues. `publish` may be called from
+    any thread; subscribers consume on their event loop.
+
+    A subscriber that falls `max_queue` events behind has its queue
+    replaced by a resync marker, upon which it is sent a new snapshot.
+    """
+
+    def __init__(self, max_queue=1000):
+        self.max_queue = max_queue
+        self._subscribers = set()
+        self._lock = Lock()
+
+    def subscribe(self):
+        subscriber = (asyncio.get_running_loop(), asyncio.Queue())
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def publish(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._offer, queue, event)
+            except RuntimeError:
+                self.unsubscribe((loop, queue))
+
+    def _offer(self, queue, event):
+        if queue.qsize() >= self.max_queue:
+            while not queue.empty():
+                queue.get_nowait()
+            event = RESYNC
+        queue.put_nowait(event)
+
+
+_broadcaster = None
+
+
+def get_broadcaster():
+    global _broadcaster  # pylint: disable=global-statement
+    if _broadcaster is None:
+        _broadcaster = import_string(getattr(
+            settings, 'VOTE_BROADCASTER',
+            'exercise.quickstart.events.LocalBroadcaster'))()
+    return _broadcaster
+
+
+def publish_votes(votes, increment=False):
+    """
+    Publishes written `(menu_id, day, count)` votes as tally deltas.
+    Overwrites carry the new `count`, increments the added `increment`.
+    """
+    for menu_id, day, count in votes:
+        event = {'day': day, 'menuId': menu_id}
+        event['increment' if increment else 'count'] = count
+        get_broadcaster().publish(event)
+
+
+async def snapshot(day):
+    return {
+        'day': day,
+        'tallies': {
+            str(menu_id): count
+            async for menu_id, count in Vote.objects.filter(
+                week=current_week(), day=day).values_list('menu_id', 'count')},
+    }
+
+
+def encode_event(name, data):
+    return f'event: {name}\ndata: {json.dumps(data)}\n\n'.encode()
+
+
+async def send_error(send, status_code, detail):
+    await send({
+        'type': 'http.response.start',
+        'status': status_code,
+        'headers': [(b'content-type', b'application/json')],
+    })
+    await send({
+        'type': 'http.response.body',
+        'body': json.dumps({'detail': str(detail)}).encode(),
+    })
+
+
+async def stream_application(scope, receive, send):
+    """
+    ASGI application serving the tally stream. EventSource clients cannot
+    set headers, so the token may also be passed as `?token=`.
+    """
+    query = parse_qs(scope.get('query_string', b'').decode())
+    headers = dict(scope.get('headers', []))
+    key = query.get('token', [None])[0]
+    authorization = headers.get(b'authorization', b'').split()
+    if key is None and len(authorization) == 2 and authorization[0].lower() == b'token':
+        key = authorization[1].decode()
+    if key is None:
+        await send_error(send, 401, exceptions.NotAuthenticated.default_detail)
+        return
+    try:
+        await CachedTokenAuthentication().aauthenticate_credentials(key)
+    except exceptions.AuthenticationFailed as exc:
+        await send_error(send, 401, exc.detail)
+        return
+    try:
+        day = int(query.get('day', [timezone.now().weekday() + 1])[0])
+    except ValueError:
+        await send_error(send, 400, 'day must be a number from 1 to 7')
+        return
+
+    broadcaster = get_broadcaster()
+    subscriber = broadcaster.subscribe()
+    disconnect = asyncio.ensure_future(receive_disconnect(receive))
+    try:
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [(b'content-type', b'text/event-stream'),
+                        (b'cache-control', b'no-cache')],
+        })
+        await send_body(send, encode_event('snapshot', await snapshot(day)))
+        _, queue = subscriber
+        while not disconnect.done():
+            event = asyncio.ensure_future(queue.get())
+            await asyncio.wait(
+                {event, disconnect}, timeout=KEEPALIVE_SECONDS,
+                return_when=asyncio.FIRST_COMPLETED)
+            if not event.done():
+                event.cancel()
+                if not disconnect.done():
+                    await send_body(send, b': keepalive\n\n')
+                continue
+            event = event.result()
+            if event is RESYNC:
+                await send_body(send, encode_event('snapshot', await snapshot(day)))
+            elif event['day'] == day:
+                await send_body(send, encode_event('delta', event))
+    finally:
+        broadcaster.unsubscribe(subscriber)
+        disconnect.cancel()
+
+
+async def send_body(send, body):
+    await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+
+
+async def receive_disconnect(receive):
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return
+
+
+def with_vote_stream(application):
+    """
+    Wraps the Django ASGI application so `STREAM_PATH` is served by the
+    tally stream.
+    """
+    async def router(scope, receive, send):
+        if scope['type'] == 'http' and scope['path'] == STREAM_PATH:
+            await stream_application(scope, receive, send)
+        else:
+            await application(scope, receive, send)
+    return router
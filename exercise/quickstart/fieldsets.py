@@ -0,0 +1,50 @@
+def query_list(request, name):
+    """
+    Returns the comma separated values of query parameter `name`, or None
+    when the parameter is absent.
+    """
+    if request is None or name not in request.GET:
+        return None
+    return {value.strip() for value in request.GET[name].split(',')
+            if value.strip()}
+
+
+def is_expanded(request, name):
+    """
+    Relations are expanded unless an `expand` parameter is given that does
+    not name them.
+    """
+    expand = query_list(request, 'expand')
+    return expand is None or name in expand
+
+
+class SparseFieldsetMixin:
+    """
+    Serializer mixin keeping only the fields named in the `fields` query
+    parameter of the request in the serializer context.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        requested = query_list(self.context.get('request'), 'fields')
+        if requested:
+            for name in set(self.fields) - requested:
+                self.fields.pop(name)
+
+
+class SparseQuerysetMixin:
+    """
+    View mixin narrowing the SQL SELECT of list and retrieve to the model
+    columns named in the `fields` query parameter.
+    """
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        requested = query_list(self.request, 'fields')
+        if not requested or self.action not in ('list', 'retrieve'):
+            return queryset
+        opts = queryset.model._meta
+        columns = {field.name for field in opts.concrete_fields}
+        ordering = {name.lstrip('-') for name in getattr(self, 'cursor_ordering', ())}
+        return queryset.only(opts.pk.name, *(requested | ordering) & columns)
+
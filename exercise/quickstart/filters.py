@@ -0,0 +1,56 @@
+"""
+Query parameter filtering and ordering of list endpoints.
+
+A view's `filter_serializer_class` validates the filter parameters;
+each field's `source` is the ORM lookup it applies, so a filter is
+declared once with its type and bounds. `ordering_fields` maps the
+names accepted by `?ordering=` (optionally prefixed with `-`) to
+unique column orderings, which keyset pagination and streamed lists
+follow. Every filter and ordering is backed by an index.
+"""
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+
+def filter_lookups(serializer_class, request):
+    """
+    Returns the ORM lookups of the filter parameters of `request`,
+    raising `ValidationError` for invalid ones.
+    """
+    serializer = serializer_class(data=request.query_params)
+    serializer.is_valid(raise_exception=True)
+    return serializer.validated_data
+
+
+def list_ordering(request, view, default=()):
+    """
+    Returns the column ordering requested with `?ordering=`, otherwise the
+    view's `cursor_ordering` or `default`.
+    """
+    name = request.query_params.get('ordering')
+    ordering_fields = getattr(view, 'ordering_fields', {})
+    if not name or not ordering_fields:
+        ordering = getattr(view, 'cursor_ordering', default)
+        return (ordering,) if isinstance(ordering, str) else tuple(ordering)
+    descending = name.startswith('-')
+    columns = ordering_fields.get(name.lstrip('-'))
+    if columns is None:
+        raise ValidationError({'ordering': [
+            f'Choose one of {", ".join(sorted(ordering_fields))}, optionally prefixed with -.']})
+    if descending:
+        return tuple(column[1:] if column.startswith('-') else f'-{column}'
+                     for column in columns)
+    return tuple(columns)
+
+
+class SerializerFilterBackend(BaseFilterBackend):
+    """
+    Applies the view's `filter_serializer_class` lookups to list
+    querysets.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        serializer_class = getattr(view, 'filter_serializer_class', None)
+        if serializer_class is None or getattr(view, 'action', None) != 'list':
+            return queryset
+        return queryset.filter(**filter_lookups(serializer_class, request))
@@ -0,0 +1,62 @@
+"""
+Daily vote rankings of the current week, read top first from the
+`(week, day, -count, menu)` index and cached per day generation, which
+votes drop after they commit.
+"""
+from uuid import uuid4
+from django.conf import settings
+from django.core.cache import cache
+from exercise.quickstart.models import Vote, current_week
+
+CACHE_KEY = 'quickstart:leaderboard:{week}:{day}:{generation}:{limit}'
+GENERATION_KEY = 'quickstart:leaderboard-generation:{week}:{day}'
+DAYS = range(1, 8)
+
+
+def cache_timeout():
+    return getattr(settings, 'LEADERBOARD_CACHE_TIMEOUT', 300)
+
+
+def generation_key(day):
+    return GENERATION_KEY.format(week=current_week().isoformat(), day=day)
+
+
+def generation(day):
+    return cache.get_or_set(generation_key(day), lambda: uuid4().hex, cache_timeout())
+
+
+def cache_key(day, day_generation, limit):
+    return CACHE_KEY.format(
+        week=current_week().isoformat(), day=day, generation=day_generation, limit=limit)
+
+
+def build(day, day_generation, limit):
+    """
+    Ranks the `limit` menus voted most for on `day` of the current week
+    and stores the ranking in the cache under `day_generation`.
+    """
+    board = [
+        {'menuId': menu_id,
+         'menuName': menu_name,
+         'restaurantId': restaurant_id,
+         'restaurantName': restaurant_name,
+         'count': count}
+        for menu_id, menu_name, restaurant_id, restaurant_name, count
+        in Vote.objects.filter(week=current_week(), day=day).order_by(
+            '-count', 'menu_id').values_list(
+            'menu_id', 'menu__name', 'menu__restaurant_id',
+            'menu__restaurant__restaurantName', 'count')[:limit]]
+    cache.set(cache_key(day, day_generation, limit), board, cache_timeout())
+    return board
+
+
+def ranked_menus(day, limit=10):
+    day_generation = generation(day)
+    board = cache.get(cache_key(day, day_generation, limit))
+    if board is None:
+        board = build(day, day_generation, limit)
+    return [{'rank': rank, **entry} for rank, entry in enumerate(board, start=1)]
+
+
+def invalidate(days=DAYS):
+    cache.delete_many([generation_key(day) for day in days])
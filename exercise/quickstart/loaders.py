@@ -0,0 +1,32 @@
+from django.db.models import Prefetch
+from exercise.quickstart.models import RefMenu
+
+
+def menu_items_prefetch(lookup='refmenu_set'):
+    """
+    Prefetch of `RefMenu` rows joined with their `MenuItem`, stored on
+    each menu as `prefetched_refs`.
+    """
+    return Prefetch(
+        lookup,
+        queryset=RefMenu.objects.select_related(
+            'menuItemID').order_by('menuItemID_id'),
+        to_attr='prefetched_refs')
+
+
+def load_menus(queryset):
+    """
+    Loads restaurants, ref rows and menu items of a `Menu` queryset in a
+    constant number of queries.
+    """
+    return queryset.select_related('restaurant').prefetch_related(
+        menu_items_prefetch())
+
+
+def load_votes(queryset):
+    """
+    Loads the nested menu graph of a `Vote` queryset in a constant number
+    of queries.
+    """
+    return queryset.select_related('menu__restaurant').prefetch_related(
+        menu_items_prefetch('menu__refmenu_set'))
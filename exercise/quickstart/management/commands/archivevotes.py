@@ -0,0 +1,23 @@
+import time
+from django.core.management.base import BaseCommand
+from exercise.quickstart.archive import active_since, archive_votes
+
+
+class Command(BaseCommand):
+    help = ('Folds the vote tallies of weeks before the active ones into '
+            'weekly summaries.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--active-weeks', type=int,
+            help='Weeks kept in the vote table, the current one included.')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        archived = archive_votes(active_weeks=options['active_weeks'])
+        for week, summaries in archived.items():
+            self.stdout.write(f'Week of {week}: {summaries} menu summaries')
+        self.stdout.write(
+            f'Archived {len(archived)} weeks before '
+            f'{active_since(active_weeks=options["active_weeks"])} in '
+            f'{time.perf_counter() - start:.2f}s')
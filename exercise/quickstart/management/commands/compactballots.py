@@ -0,0 +1,24 @@
+import time
+from django.core.management.base import BaseCommand
+from exercise.quickstart.ballots import compact_ballots, rebuild_tallies
+
+
+class Command(BaseCommand):
+    help = ('Folds pending ledger ballots into the vote tallies, or rebuilds '
+            'the tallies from the whole ledger.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild', action='store_true',
+            help='Recompute the tallies of every balloted menu from all ballots.')
+        parser.add_argument('--batch-size', type=int)
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        if options['rebuild']:
+            total = rebuild_tallies()
+            message = f'Rebuilt {total} tallies'
+        else:
+            total = compact_ballots(options['batch_size'])
+            message = f'Compacted {total} ballots'
+        self.stdout.write(f'{message} in {time.perf_counter() - start:.2f}s')
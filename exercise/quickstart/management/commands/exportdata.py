@@ -0,0 +1,43 @@
+import time
+from django.core.management.base import BaseCommand
+from exercise.quickstart.bulkdata import COLUMNS, DEFAULT_CHUNK_SIZE, \
+    detect_format, export_rows, write_rows
+
+
+class Command(BaseCommand):
+    help = 'Streams restaurants, menus, menu items, refs or votes to NDJSON or CSV.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', choices=sorted(COLUMNS))
+        parser.add_argument(
+            '--output', '-o', default='-',
+            help='File to write, "-" for stdout.')
+        parser.add_argument('--format', choices=['ndjson', 'csv'])
+        parser.add_argument(
+            '--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        model_name = options['model']
+        path = options['output']
+        file_format = options['format'] or detect_format(path)
+
+        start = time.perf_counter()
+        if path == '-':
+            # Rows carry their own line endings.
+            self.stdout.ending = ''
+            total = self.export(self.stdout, file_format, model_name, options)
+        else:
+            with open(path, 'w', encoding='utf-8', newline='') as stream:
+                total = self.export(stream, file_format, model_name, options)
+        elapsed = time.perf_counter() - start
+
+        self.stderr.write(
+            f'Exported {total} {model_name} rows in {elapsed:.2f}s '
+            f'({total / elapsed if elapsed else 0:.0f} rows/s)')
+
+    def export(self, stream, file_format, model_name, options):
+        total = 0
+        rows = export_rows(model_name, chunk_size=options['chunk_size'])
+        for _ in write_rows(rows, stream, file_format, model_name):
+            total += 1
+        return total
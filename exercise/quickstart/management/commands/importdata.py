@@ -0,0 +1,46 @@
+import sys
+import time
+from django.core.management.base import BaseCommand
+from exercise.quickstart.bulkdata import COLUMNS, DEFAULT_CHUNK_SIZE, \
+    BulkImporter, chunks, detect_format, read_rows
+
+
+class Command(BaseCommand):
+    help = ('Streams restaurants, menus, menu items, refs or votes from NDJSON '
+            'or CSV, writing them in chunks.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', choices=sorted(COLUMNS))
+        parser.add_argument('input', help='File to read, "-" for stdin.')
+        parser.add_argument('--format', choices=['ndjson', 'csv'])
+        parser.add_argument(
+            '--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        model_name = options['model']
+        path = options['input']
+        file_format = options['format'] or detect_format(path)
+
+        start = time.perf_counter()
+        if path == '-':
+            total, skipped = self.load(sys.stdin, file_format, model_name, options)
+        else:
+            with open(path, encoding='utf-8', newline='') as stream:
+                total, skipped = self.load(
+                    stream, file_format, model_name, options)
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(
+            f'Imported {total - skipped} {model_name} rows in {elapsed:.2f}s '
+            f'({total / elapsed if elapsed else 0:.0f} rows/s), '
+            f'skipped {skipped} with unknown references')
+
+    def load(self, stream, file_format, model_name, options):
+        importer = BulkImporter()
+        total = skipped = 0
+        for chunk in chunks(read_rows(stream, file_format), options['chunk_size']):
+            skipped += importer.write(model_name, chunk)
+            total += len(chunk)
+            if options['verbosity'] > 1:
+                self.stdout.write(f'{total} rows')
+        return total, skipped
@@ -0,0 +1,118 @@
+from django.db import transaction
+from django.db.models import Avg, Max, Min, OuterRef, Subquery
+from django.utils import timezone
+from exercise.quickstart.models import MenuItem, RefMenu, Menu
+from . import leaderboard, responsecache, search
+
+LOOKUP_CHUNK_SIZE = 500
+
+
+def chunked(values, size=LOOKUP_CHUNK_SIZE):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def item_key(item):
+    return (item['name'], item['price'], item['currency'])
+
+
+def resolve_menus(entries):
+    """
+    Returns `Menu` objects keyed by `(restaurant_id, day)`, renaming existing
+    menus and creating missing ones in bulk.
+    """
+    names = {(entry['restaurant'], entry['day']): entry['menuName']
+             for entry in entries}
+    menus = {}
+    for restaurant_ids in chunked({restaurant_id for restaurant_id, _ in names}):
+        for menu in Menu.objects.filter(
+                restaurant_id__in=restaurant_ids,
+                day__in={day for _, day in names}).order_by('id'):
+            key = (menu.restaurant_id, menu.day)
+            if key in names:
+                menus.setdefault(key, menu)
+
+    now = timezone.now()
+    renamed = []
+    for key, menu in menus.items():
+        if menu.name != names[key]:
+            menu.name = names[key]
+            menu.updated = now
+            renamed.append(menu)
+    Menu.objects.bulk_update(
+        renamed, ['name', 'updated'], batch_size=LOOKUP_CHUNK_SIZE)
+    if renamed:
+        transaction.on_commit(leaderboard.invalidate)
+
+    created = Menu.objects.bulk_create(
+        [Menu(name=name, day=day, restaurant_id=restaurant_id)
+         for (restaurant_id, day), name in names.items()
+         if (restaurant_id, day) not in menus],
+        batch_size=LOOKUP_CHUNK_SIZE)
+    for menu in created:
+        menus[(menu.restaurant_id, menu.day)] = menu
+    return menus
+
+
+def resolve_menu_items(keys):
+    """
+    Returns `MenuItem` ids keyed by `(name, price, currency)`, inserting
+    missing items in bulk.
+    """
+    keys = set(keys)
+
+    def lookup(names):
+        found = {}
+        for chunk in chunked(names):
+            for item_id, name, price, currency in MenuItem.objects.filter(
+                    name__in=chunk).values_list('id', 'name', 'price', 'currency'):
+                if (name, price, currency) in keys:
+                    found[(name, price, currency)] = item_id
+        return found
+
+    item_ids = lookup({name for name, _, _ in keys})
+    missing = keys.difference(item_ids)
+    if missing:
+        MenuItem.objects.bulk_create(
+            [MenuItem(name=name, price=price, currency=currency)
+             for name, price, currency in missing],
+            batch_size=LOOKUP_CHUNK_SIZE, ignore_conflicts=True)
+        item_ids.update(lookup({name for name, _, _ in missing}))
+    return item_ids
+
+
+def refresh_prices(menu_ids):
+    """
+    Recomputes the denormalized item price range and average of the menus
+    in `menu_ids`, with one UPDATE per chunk.
+    """
+    prices = RefMenu.objects.filter(menuID=OuterRef('pk')).order_by().values('menuID')
+    for chunk in chunked(menu_ids):
+        Menu.objects.filter(id__in=chunk).update(**{
+            field: Subquery(prices.annotate(
+                value=aggregate('menuItemID__price')).values('value'))
+            for field, aggregate in (
+                ('min_price', Min), ('max_price', Max), ('avg_price', Avg))})
+
+
+def ingest_menus(entries):
+    """
+    Stores validated menus, each a dict with `restaurant`, `menuName`, `day`
+    and `menuItems`, in a single atomic block with a constant number of
+    queries per chunk.
+    """
+    with transaction.atomic():
+        menus = resolve_menus(entries)
+        item_ids = resolve_menu_items(
+            item_key(item) for entry in entries for item in entry['menuItems'])
+        RefMenu.objects.bulk_create(
+            [RefMenu(menuID_id=menus[(entry['restaurant'], entry['day'])].id,
+                     menuItemID_id=item_ids[item_key(item)])
+             for entry in entries for item in entry['menuItems']],
+            batch_size=LOOKUP_CHUNK_SIZE, ignore_conflicts=True)
+        refresh_prices(menu.id for menu in menus.values())
+        transaction.on_commit(lambda: responsecache.invalidate(*{
+            f'restaurant:{restaurant_id}' for restaurant_id, _ in menus}))
+        transaction.on_commit(search.invalidate)
+    return menus, item_ids
@@ -0,0 +1,281 @@
+"""
+Request instrumentation.
+
+`InstrumentationMiddleware` samples `SAMPLE_RATE` of the requests and
+records, per view action and API version, the wall time, database time,
+query count, serialization (response rendering) time and response size
+into in-process histograms. `metrics_view` exposes them in the
+Prometheus text format. Sampled requests slower than `SLOW_REQUEST_MS`
+are logged with their SQL.
+
+With a `SAMPLE_RATE` of 0 the middleware removes itself from the stack.
+Histograms are kept per process.
+"""
+import asyncio
+import logging
+import random
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from threading import Lock
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import HttpResponse
+from rest_framework import permissions
+from rest_framework.decorators import api_view, permission_classes
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SETTINGS = {
+    'SAMPLE_RATE': 0.0,
+    'SLOW_REQUEST_MS': None,
+    'MAX_LOGGED_QUERIES': 50,
+}
+
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                    1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+METRICS = {
+    'request_duration_seconds': ('Wall time of the request.', DURATION_BUCKETS),
+    'db_duration_seconds': ('Time spent executing SQL.', DURATION_BUCKETS),
+    'db_queries': ('SQL queries executed.', QUERY_BUCKETS),
+    'serialization_duration_seconds': (
+        'Time spent rendering the response body.', DURATION_BUCKETS),
+    'response_size_bytes': ('Size of the response body.', SIZE_BUCKETS),
+}
+
+current_sample = ContextVar('current_sample', default=None)
+
+
+def metrics_settings():
+    return {**DEFAULT_SETTINGS, **getattr(settings, 'METRICS', {})}
+
+
+class Histogram:
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    """
+    Histograms keyed by metric name and `(view, version)` labels.
+    """
+
+    def __init__(self):
+        self._histograms = {}
+        self._lock = Lock()
+
+    def observe(self, name, labels, value):
+        with self._lock:
+            histogram = self._histograms.get((name, labels))
+            if histogram is None:
+                histogram = self._histograms[(name, labels)] = Histogram(
+                    METRICS[name][1])
+            histogram.observe(value)
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def exposition(self):
+        lines = []
+        with self._lock:
+            for name, (description, _) in METRICS.items():
+                lines.append(f'# HELP quickstart_{name} {description}')
+                lines.append(f'# TYPE quickstart_{name} histogram')
+                for (metric, (view, version)), histogram in sorted(
+                        self._histograms.items()):
+                    if metric != name:
+                        continue
+                    labels = f'view="{escape(view)}",version="{escape(version)}"'
+                    cumulative = 0
+                    for bound, count in zip(
+                            (*histogram.buckets, '+Inf'), histogram.counts):
+                        cumulative += count
+                        lines.append(
+                            f'quickstart_{name}_bucket{{{labels},le="{bound}"}} '
+                            f'{cumulative}')
+                    lines.append(f'quickstart_{name}_sum{{{labels}}} {histogram.sum}')
+                    lines.append(f'quickstart_{name}_count{{{labels}}} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Sample:  # pylint: disable=too-few-public-methods
+    __slots__ = ('start', 'view', 'db_time', 'queries', 'sql', 'render_start',
+                 'render_time')
+
+    def __init__(self, capture_sql):
+        self.start = time.perf_counter()
+        self.view = 'unresolved'
+        self.db_time = 0.0
+        self.queries = 0
+        self.sql = [] if capture_sql else None
+        self.render_start = None
+        self.render_time = 0.0
+
+
+def query_timer(execute, sql, params, many, context):
+    sample = current_sample.get()
+    if sample is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - start
+        sample.db_time += duration
+        sample.queries += 1
+        if sample.sql is not None:
+            sample.sql.append((duration, sql))
+
+
+def install_query_timer():
+    for connection in connections.all():
+        if query_timer not in connection.execute_wrappers:
+            connection.execute_wrappers.append(query_timer)
+
+
+def view_label(view_func, method):
+    """
+    Names a DRF viewset view after its action, e.g.
+    `RestaurantViewSet.vote`, and other views after their function.
+    """
+    view_class = getattr(view_func, 'cls', None)
+    if view_class is None:
+        return f'{view_func.__module__}.{view_func.__name__}'
+    action = getattr(view_func, 'actions', {}).get(method.lower(), method.lower())
+    return f'{view_class.__name__}.{action}'
+
+
+def response_version(request, response):
+    drf_request = getattr(response, 'renderer_context', {}).get('request')
+    version = getattr(drf_request, 'version', None) or getattr(
+        request, 'version', None)
+    return str(version or '')
+
+
+class InstrumentationMiddleware:
+    """
+    Runs in the handler's mode, so async views and streams stay async
+    under ASGI.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        options = metrics_settings()
+        if not options['SAMPLE_RATE']:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.sample_rate = options['SAMPLE_RATE']
+        self.slow_request_ms = options['SLOW_REQUEST_MS']
+        self.max_logged_queries = options['MAX_LOGGED_QUERIES']
+        if asyncio.iscoroutinefunction(get_response):
+            # Marks the instance as a coroutine function, as Django's
+            # MiddlewareMixin does; asgiref 3.5 has no markcoroutinefunction.
+            self._is_coroutine = asyncio.coroutines._is_coroutine  # pylint: disable=protected-access
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self):
+            return self.__acall__(request)
+        sample = self.start(request)
+        if sample is None:
+            return self.get_response(request)
+        token = current_sample.set(sample)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_sample.reset(token)
+        self.record(request, response, sample)
+        return response
+
+    async def __acall__(self, request):
+        sample = self.start(request)
+        if sample is None:
+            return await self.get_response(request)
+        token = current_sample.set(sample)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_sample.reset(token)
+        self.record(request, response, sample)
+        return response
+
+    def start(self, request):
+        """
+        Returns the sample of `request`, or None when it is not sampled.
+        """
+        if random.random() >= self.sample_rate:
+            return None
+        install_query_timer()
+        sample = request.metrics_sample = Sample(
+            capture_sql=self.slow_request_ms is not None)
+        return sample
+
+    def process_view(self, request, view_func, view_args, view_kwargs):  # pylint: disable=unused-argument
+        sample = getattr(request, 'metrics_sample', None)
+        if sample is not None:
+            # Scrapes of the metrics themselves are not recorded.
+            sample.view = None if view_func is metrics_view else view_label(
+                view_func, request.method)
+
+    def process_template_response(self, request, response):
+        sample = getattr(request, 'metrics_sample', None)
+        if sample is not None:
+            sample.render_start = time.perf_counter()
+            response.add_post_render_callback(
+                lambda rendered: self.rendered(sample))
+        return response
+
+    @staticmethod
+    def rendered(sample):
+        sample.render_time = time.perf_counter() - sample.render_start
+
+    def record(self, request, response, sample):
+        if sample.view is None:
+            return
+        duration = time.perf_counter() - sample.start
+        labels = (sample.view, response_version(request, response))
+        registry.observe('request_duration_seconds', labels, duration)
+        registry.observe('db_duration_seconds', labels, sample.db_time)
+        registry.observe('db_queries', labels, sample.queries)
+        registry.observe('serialization_duration_seconds', labels, sample.render_time)
+        if not response.streaming:
+            registry.observe('response_size_bytes', labels, len(response.content))
+        if self.slow_request_ms is not None and duration * 1000 >= self.slow_request_ms:
+            logger.warning(
+                'Slow request %s %s (%s, version %s): %.1fms, %d queries, '
+                '%.1fms SQL\n%s',
+                request.method, request.path, labels[0], labels[1] or '-',
+                duration * 1000, sample.queries, sample.db_time * 1000,
+                '\n'.join(f'  {sql_duration * 1000:.1f}ms {sql}'
+                          for sql_duration, sql
+                          in sample.sql[:self.max_logged_queries]))
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def metrics_view(request):  # pylint: disable=unused-argument
+    return HttpResponse(
+        registry.exposition(),
+        content_type='text/plain; version=0.0.4; charset=utf-8')
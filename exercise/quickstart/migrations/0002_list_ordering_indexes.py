@@ -0,0 +1,21 @@
+# Generated by Django 4.1.3 on 2026-10-18 19:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quickstart', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['-date_joined', '-id'], name='quickstart__date_jo_bce66f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='employee',
+            index=models.Index(fields=['-username', '-id'], name='quickstart__usernam_760598_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.1.3 on 2026-10-18 19:41
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quickstart', '0002_list_ordering_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='menu',
+            name='restaurant',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='quickstart.restaurant'),
+        ),
+        migrations.AddIndex(
+            model_name='menu',
+            index=models.Index(fields=['restaurant', 'day', 'name'], name='quickstart__restaur_a50b76_idx'),
+        ),
+    ]
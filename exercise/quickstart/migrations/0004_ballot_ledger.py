@@ -0,0 +1,35 @@
+# Generated by Django 4.1.3 on 2026-10-18 20:00
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quickstart', '0003_menu_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Ballot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('week', models.DateField()),
+                ('day', models.IntegerField()),
+                ('menus', models.JSONField()),
+                ('compacted', models.BooleanField(default=False)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='ballot',
+            index=models.Index(condition=models.Q(('compacted', False)), fields=['id'], name='quickstart_ballot_pending'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='ballot',
+            unique_together={('user', 'week', 'day')},
+        ),
+    ]
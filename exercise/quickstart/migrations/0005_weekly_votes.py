@@ -0,0 +1,57 @@
+# Generated by Django 4.1.3 on 2026-10-18 20:02
+
+import datetime
+from django.db import migrations, models
+from django.db.models.functions import TruncDate
+import django.db.models.deletion
+import exercise.quickstart.models
+
+
+def set_vote_weeks(apps, schema_editor):
+    # Existing tallies are assigned to the week they were last written in,
+    # with one UPDATE per week.
+    Vote = apps.get_model('quickstart', 'Vote')
+    dates = Vote.objects.annotate(
+        date=TruncDate('updated', tzinfo=datetime.timezone.utc),
+    ).order_by().values_list('date', flat=True).distinct()
+    for week in sorted({exercise.quickstart.models.week_of(date) for date in dates}):
+        start = datetime.datetime.combine(week, datetime.time(), datetime.timezone.utc)
+        Vote.objects.filter(
+            updated__gte=start, updated__lt=start + datetime.timedelta(days=7),
+        ).update(week=week)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quickstart', '0004_ballot_ledger'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='vote',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='vote',
+            name='week',
+            field=models.DateField(default=exercise.quickstart.models.current_week),
+        ),
+        migrations.RunPython(set_vote_weeks, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='vote',
+            unique_together={('week', 'day', 'menu')},
+        ),
+        migrations.CreateModel(
+            name='WeeklyVoteSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('week', models.DateField()),
+                ('count', models.IntegerField()),
+                ('menu', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='quickstart.menu')),
+            ],
+            options={
+                'unique_together': {('week', 'menu')},
+            },
+        ),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 4.1.3 on 2026-10-18 21:10
+
+from django.db import migrations
+
+# One FTS5 row per menu item, menu and restaurant name, its rowid being
+# the object's id * 4 + its kind (1 item, 2 menu, 3 restaurant), kept in
+# sync by triggers so bulk writes are indexed too.
+SQLITE_SOURCES = (
+    (1, 'quickstart_menuitem', 'name'),
+    (2, 'quickstart_menu', 'name'),
+    (3, 'quickstart_restaurant', '"restaurantName"'),
+)
+
+POSTGRESQL_INDEXES = (
+    ('quickstart_menuitem_name_trgm', 'quickstart_menuitem', 'name'),
+    ('quickstart_menu_name_trgm', 'quickstart_menu', 'name'),
+    ('quickstart_restaurant_name_trgm', 'quickstart_restaurant', '"restaurantName"'),
+)
+
+
+def sqlite_statements():
+    yield (
+        "CREATE VIRTUAL TABLE quickstart_search USING fts5("
+        "name, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')")
+    for kind, table, column in SQLITE_SOURCES:
+        yield (
+            f'INSERT INTO quickstart_search (rowid, name) '
+            f'SELECT id * 4 + {kind}, {column} FROM {table}')
+        yield (
+            f'CREATE TRIGGER {table}_search_insert AFTER INSERT ON {table} BEGIN '
+            f'INSERT INTO quickstart_search (rowid, name) VALUES (new.id * 4 + {kind}, new.{column}); '
+            f'END')
+        yield (
+            f'CREATE TRIGGER {table}_search_update AFTER UPDATE OF {column} ON {table} BEGIN '
+            f'UPDATE quickstart_search SET name = new.{column} WHERE rowid = old.id * 4 + {kind}; '
+            f'END')
+        yield (
+            f'CREATE TRIGGER {table}_search_delete AFTER DELETE ON {table} BEGIN '
+            f'DELETE FROM quickstart_search WHERE rowid = old.id * 4 + {kind}; '
+            f'END')
+
+
+def fts5_available(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        return bool(cursor.fetchone()[0])
+
+
+def create_search_index(apps, schema_editor):  # pylint: disable=unused-argument
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite' and fts5_available(connection):
+        for statement in sqlite_statements():
+            schema_editor.execute(statement)
+    elif connection.vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for name, table, column in POSTGRESQL_INDEXES:
+            schema_editor.execute(
+                f'CREATE INDEX {name} ON {table} USING gin ({column} gin_trgm_ops)')
+
+
+def drop_search_index(apps, schema_editor):  # pylint: disable=unused-argument
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite':
+        for _, table, _ in SQLITE_SOURCES:
+            for event in ('insert', 'update', 'delete'):
+                schema_editor.execute(f'DROP TRIGGER IF EXISTS {table}_search_{event}')
+        schema_editor.execute('DROP TABLE IF EXISTS quickstart_search')
+    elif connection.vendor == 'postgresql':
+        for name, _, _ in POSTGRESQL_INDEXES:
+            schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quickstart', '0005_weekly_votes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
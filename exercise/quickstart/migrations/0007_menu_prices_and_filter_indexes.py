@@ -0,0 +1,55 @@
+# Generated by Django 4.1.3 on 2026-10-18 21:24
+
+from django.db import migrations, models
+from django.db.models import Avg, Max, Min, OuterRef, Subquery
+
+
+def set_menu_prices(apps, schema_editor):  # pylint: disable=unused-argument
+    Menu = apps.get_model('quickstart', 'Menu')
+    RefMenu = apps.get_model('quickstart', 'RefMenu')
+    prices = RefMenu.objects.filter(menuID=OuterRef('pk')).order_by().values('menuID')
+    Menu.objects.update(**{
+        field: Subquery(prices.annotate(value=aggregate('menuItemID__price')).values('value'))
+        for field, aggregate in (('min_price', Min), ('max_price', Max), ('avg_price', Avg))})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quickstart', '0006_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='menu',
+            name='avg_price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=6, null=True),
+        ),
+        migrations.AddField(
+            model_name='menu',
+            name='max_price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=6, null=True),
+        ),
+        migrations.AddField(
+            model_name='menu',
+            name='min_price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=6, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='menuitem',
+            index=models.Index(fields=['currency', 'price', 'id'], name='quickstart__currenc_7cafef_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='menuitem',
+            index=models.Index(fields=['price', 'id'], name='quickstart__price_45ca7c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='restaurant',
+            index=models.Index(fields=['city', 'id'], name='quickstart__city_47d36e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='restaurant',
+            index=models.Index(fields=['restaurantName', 'id'], name='quickstart__restaur_438abf_idx'),
+        ),
+        migrations.RunPython(set_menu_prices, migrations.RunPython.noop),
+    ]
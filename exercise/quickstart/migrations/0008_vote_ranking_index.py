@@ -0,0 +1,17 @@
+# Generated by Django 4.1.3 on 2026-10-18 21:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quickstart', '0007_menu_prices_and_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='vote',
+            index=models.Index(fields=['week', 'day', '-count', 'menu'], name='quickstart__week_4dd713_idx'),
+        ),
+    ]
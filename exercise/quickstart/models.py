@@ -1,5 +1,19 @@
+import datetime
+from django.conf import settings
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.utils import timezone
+
+
+def week_of(date):
+    """
+    Returns the Monday of the ISO week of `date`, which identifies the week.
+    """
+    return date - datetime.timedelta(days=date.weekday())
+
+
+def current_week():
+    return week_of(timezone.localdate())
 
 
 class CustomUser(AbstractUser):
@@ -12,6 +26,9 @@ class CustomUser(AbstractUser):
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username']
 
+    class Meta(AbstractUser.Meta):  # pylint: disable=too-few-public-methods
+        indexes = [models.Index(fields=['-date_joined', '-id'])]
+
     def __str__(self):
         return f"{self.email} - {self.first_name} {self.last_name}"
 
@@ -24,6 +41,9 @@ class Employee(models.Model):
     created = models.DateTimeField(auto_now=True, blank=True)
     updated = models.DateTimeField(auto_now=True, blank=True)
 
+    class Meta:  # pylint: disable=too-few-public-methods
+        indexes = [models.Index(fields=['-username', '-id'])]
+
 
 class Restaurant(models.Model):
     restaurantName = models.CharField(max_length=255)
@@ -32,6 +52,11 @@ class Restaurant(models.Model):
     created = models.DateTimeField(auto_now=True, blank=True)
     updated = models.DateTimeField(auto_now=True, blank=True)
 
+    class Meta:  # pylint: disable=too-few-public-methods
+        # Serve the city filter and the list orderings.
+        indexes = [models.Index(fields=['city', 'id']),
+                   models.Index(fields=['restaurantName', 'id'])]
+
 
 class MenuItem(models.Model):
     name = models.CharField(max_length=255)
@@ -42,17 +67,30 @@ class MenuItem(models.Model):
 
     class Meta:  # pylint: disable=too-few-public-methods
         unique_together = ('name', 'price', 'currency')
+        # Serve the price range filter, with or without a currency.
+        indexes = [models.Index(fields=['currency', 'price', 'id']),
+                   models.Index(fields=['price', 'id'])]
 
 
 class Menu(models.Model):
+    """
+    A restaurant's menu for a weekday. The price range and average of its
+    items are denormalized by `menus.refresh_prices` as items are linked.
+    """
     name = models.CharField(max_length=255)
     day = models.IntegerField()
+    min_price = models.DecimalField(max_digits=6, decimal_places=2, null=True, blank=True)
+    max_price = models.DecimalField(max_digits=6, decimal_places=2, null=True, blank=True)
+    avg_price = models.DecimalField(max_digits=6, decimal_places=2, null=True, blank=True)
     created = models.DateTimeField(auto_now=True, blank=True)
     updated = models.DateTimeField(auto_now=True, blank=True)
-    restaurant = models.ForeignKey(Restaurant, on_delete=models.CASCADE)
+    restaurant = models.ForeignKey(
+        Restaurant, on_delete=models.CASCADE, db_index=False)
 
     class Meta:  # pylint: disable=too-few-public-methods
         unique_together = ('name', 'day', 'restaurant')
+        # Serves restaurant, restaurant/day and restaurant/name/day lookups.
+        indexes = [models.Index(fields=['restaurant', 'day', 'name'])]
 
 
 class RefMenu(models.Model):
@@ -64,12 +102,53 @@ class RefMenu(models.Model):
 
 
 class Vote(models.Model):
+    """
+    Tally of a menu on a day of an ISO week. Only recent weeks are kept
+    here; older ones are folded into `WeeklyVoteSummary` rows.
+    """
     count = models.IntegerField()
+    week = models.DateField(default=current_week)
     day = models.IntegerField()
     menu = models.ForeignKey(Menu, on_delete=models.CASCADE)
     created = models.DateTimeField(auto_now=True, blank=True)
     updated = models.DateTimeField(auto_now=True, blank=True)
 
     class Meta:  # pylint: disable=too-few-public-methods
+        # Leads with week and day for the current-day reads.
         unique_together = (
-            'day', 'menu')  # pylint: disable=too-few-public-methods
+            'week', 'day', 'menu')  # pylint: disable=too-few-public-methods
+        # Daily rankings, read top first.
+        indexes = [models.Index(fields=['week', 'day', '-count', 'menu'])]
+
+
+class WeeklyVoteSummary(models.Model):
+    """
+    Archived votes of a menu over a past ISO week.
+    """
+    week = models.DateField()
+    menu = models.ForeignKey(Menu, on_delete=models.CASCADE)
+    count = models.IntegerField()
+
+    class Meta:  # pylint: disable=too-few-public-methods
+        unique_together = ('week', 'menu')
+
+
+class Ballot(models.Model):
+    """
+    Append-only ledger entry: the menus an employee ranked for one day of
+    an ISO week (`week` is its Monday), best first. `compacted` is set
+    once the ballot has been folded into the `Vote` tallies.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    week = models.DateField()
+    day = models.IntegerField()
+    menus = models.JSONField()
+    compacted = models.BooleanField(default=False)
+    created = models.DateTimeField(auto_now_add=True, blank=True)
+
+    class Meta:  # pylint: disable=too-few-public-methods
+        unique_together = ('user', 'week', 'day')
+        indexes = [models.Index(
+            fields=['id'], condition=models.Q(compacted=False),
+            name='quickstart_ballot_pending')]
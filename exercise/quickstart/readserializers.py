@@ -0,0 +1,223 @@
+"""
+Read-only serialization of menus and votes from `.values_list()` rows.
+
+Field plans are compiled once from `MenuSerializer`, `VoteSerializer`
+and their nested serializers, so the output renders to the same JSON
+while skipping DRF's per-object field machinery. Restaurants and menu
+items shared by several rows are built once per response.
+"""
+from rest_framework import serializers
+from exercise.quickstart.models import RefMenu
+from .fieldsets import is_expanded
+from .serializers import MenuItemSerializer, MenuSerializer, RestaurantSerializer, \
+    VoteSerializer
+from .streaming import batched
+
+PASSTHROUGH_FIELDS = (serializers.IntegerField, serializers.CharField)
+CONVERTED_FIELDS = (serializers.DateTimeField, serializers.DecimalField)
+
+
+class RowPlan:
+    """
+    Field plan of a serializer over a slice of `.values_list()` rows.
+    Columns of passthrough fields are copied, other columns go through
+    the field's `to_representation`. Fields named in `nested` are left
+    as None placeholders, which keep their position in the output, for
+    the caller to fill.
+    """
+
+    def __init__(self, serializer, prefix='', nested=()):
+        self.columns = []
+        self.steps = []
+        for name, field in serializer.fields.items():
+            if name in nested:
+                self.steps.append((name, None, None))
+                continue
+            if isinstance(field, PASSTHROUGH_FIELDS):
+                convert = None
+            elif isinstance(field, CONVERTED_FIELDS):
+                convert = field.to_representation
+            else:
+                raise TypeError(
+                    f'{type(field).__name__} {name!r} has no read plan')
+            self.steps.append((name, len(self.columns), convert))
+            self.columns.append(prefix + field.source.replace('.', '__'))
+
+    def build(self, row, offset=0):
+        data = {}
+        for name, index, convert in self.steps:
+            if index is None:
+                data[name] = None
+                continue
+            value = row[offset + index]
+            data[name] = value if convert is None or value is None else convert(value)
+        return data
+
+
+class MenuReader:
+    """
+    Reads `MenuSerializer` output from menu and restaurant columns,
+    reached through `prefix`, and the menus' `RefMenu` item rows.
+    """
+
+    def __init__(self, prefix=''):
+        self.menu = RowPlan(
+            MenuSerializer(), prefix, nested=('restaurant', 'menuItems'))
+        self.restaurant = RowPlan(RestaurantSerializer(), f'{prefix}restaurant__')
+        self.item = RowPlan(MenuItemSerializer(), 'menuItemID__')
+        self.columns = [*self.menu.columns, *self.restaurant.columns]
+        self.id_index = self.menu.columns.index(f'{prefix}id')
+        self.restaurant_id_index = len(self.menu.columns) + \
+            self.restaurant.columns.index(f'{prefix}restaurant__id')
+
+    def menu_ids(self, rows, offset=0):
+        return {row[offset + self.id_index] for row in rows}
+
+    def item_rows(self, menu_ids):
+        return RefMenu.objects.filter(menuID_id__in=menu_ids).order_by(
+            'menuItemID_id').values_list(
+                'menuID_id', 'menuItemID_id', *self.item.columns)
+
+    def build(self, rows, item_rows, offset=0):
+        """
+        Returns the menus of `rows`, in order, keyed by id.
+        """
+        items = {}
+        menu_items = {}
+        for row in item_rows:
+            item = items.get(row[1])
+            if item is None:
+                item = items[row[1]] = self.item.build(row, 2)
+            menu_items.setdefault(row[0], []).append(item)
+
+        restaurants = {}
+        menus = {}
+        restaurant_offset = offset + len(self.menu.columns)
+        for row in rows:
+            menu_id = row[offset + self.id_index]
+            if menu_id in menus:
+                continue
+            menu = self.menu.build(row, offset)
+            restaurant_id = row[offset + self.restaurant_id_index]
+            restaurant = restaurants.get(restaurant_id)
+            if restaurant is None:
+                restaurant = restaurants[restaurant_id] = self.restaurant.build(
+                    row, restaurant_offset)
+            menu['restaurant'] = restaurant
+            menu['menuItems'] = menu_items.get(menu_id, [])
+            menus[menu_id] = menu
+        return menus
+
+
+class VoteReader:
+    """
+    Reads `VoteSerializer` output, with the menu nested or flattened to
+    its id as the serializer would for the same request.
+    """
+
+    def __init__(self, serializer, expanded):
+        self.expanded = expanded
+        self.vote = RowPlan(serializer, nested=('menu',) if expanded else ())
+        self.menus = MenuReader('menu__') if expanded else None
+        self.columns = [*self.vote.columns, *(self.menus.columns if expanded else ())]
+
+    def build(self, rows, item_rows=()):
+        menus = self.menus.build(
+            rows, item_rows, len(self.vote.columns)) if self.expanded else {}
+        menu_offset = len(self.vote.columns)
+        data = []
+        for row in rows:
+            vote = self.vote.build(row)
+            if self.expanded:
+                vote['menu'] = menus[row[menu_offset + self.menus.id_index]]
+            data.append(vote)
+        return data
+
+
+_readers = {}
+
+
+def menu_reader():
+    if 'menu' not in _readers:
+        _readers['menu'] = MenuReader()
+    return _readers['menu']
+
+
+def vote_reader(request):
+    expanded = is_expanded(request, 'menu')
+    key = ('vote', expanded)
+    if key not in _readers:
+        _readers[key] = VoteReader(
+            VoteSerializer(context={'request': request}), expanded)
+    return _readers[key]
+
+
+def serialize_menus(queryset):
+    """
+    Returns `MenuSerializer(queryset, many=True).data` as plain dicts, in
+    two queries.
+    """
+    reader = menu_reader()
+    rows = list(queryset.values_list(*reader.columns))
+    if not rows:
+        return []
+    menus = reader.build(rows, reader.item_rows(reader.menu_ids(rows)))
+    return list(menus.values())
+
+
+async def aserialize_menus(queryset):
+    reader = menu_reader()
+    rows = [row async for row in queryset.values_list(*reader.columns)]
+    if not rows:
+        return []
+    menus = reader.build(rows, [
+        row async for row in reader.item_rows(reader.menu_ids(rows))])
+    return list(menus.values())
+
+
+def serialize_votes(queryset, request):
+    """
+    Returns `VoteSerializer(queryset, many=True).data` as plain dicts for
+    `request`, in at most two queries.
+    """
+    reader = vote_reader(request)
+    rows = list(queryset.values_list(*reader.columns))
+    item_rows = ()
+    if rows and reader.expanded:
+        item_rows = reader.menus.item_rows(
+            reader.menus.menu_ids(rows, len(reader.vote.columns)))
+    return reader.build(rows, item_rows)
+
+
+async def aserialize_votes(queryset, request):
+    reader = vote_reader(request)
+    rows = [row async for row in queryset.values_list(*reader.columns)]
+    item_rows = []
+    if rows and reader.expanded:
+        item_rows = [row async for row in reader.menus.item_rows(
+            reader.menus.menu_ids(rows, len(reader.vote.columns)))]
+    return reader.build(rows, item_rows)
+
+
+def iter_menus(queryset, size):
+    """
+    Yields `serialize_menus(queryset)` items, reading `size` menus and
+    their items at a time.
+    """
+    reader = menu_reader()
+    for rows in batched(queryset.values_list(*reader.columns).iterator(size), size):
+        yield from reader.build(rows, reader.item_rows(reader.menu_ids(rows))).values()
+
+
+def iter_votes(queryset, request, size):
+    """
+    Yields `serialize_votes(queryset, request)` items, `size` votes at a
+    time.
+    """
+    reader = vote_reader(request)
+    for rows in batched(queryset.values_list(*reader.columns).iterator(size), size):
+        item_rows = ()
+        if reader.expanded:
+            item_rows = reader.menus.item_rows(
+                reader.menus.menu_ids(rows, len(reader.vote.columns)))
+        yield from reader.build(rows, item_rows)
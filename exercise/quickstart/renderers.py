@@ -0,0 +1,109 @@
+"""
+orjson-backed JSON renderer and parser, and an NDJSON renderer.
+
+The output is the same as `JSONRenderer`'s: compact UTF-8, with types
+orjson does not handle natively (Decimal, lazy strings, querysets...)
+converted by DRF's `JSONEncoder`. Indented output, ASCII-only settings
+and payloads orjson rejects fall back to the stdlib implementation, as
+does everything when orjson is not installed.
+
+Unlike `JSONRenderer` with `STRICT_JSON`, NaN and infinite floats are
+rendered as null instead of failing.
+"""
+import codecs
+import json
+from django.conf import settings
+from rest_framework.utils import encoders
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+ORJSON_OPTIONS = (orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+_encoder = encoders.JSONEncoder()
+
+
+def dumps(data):
+    """
+    Encodes `data` the way `JSONRenderer` does, returning bytes.
+    """
+    if orjson is not None:
+        try:
+            return escape(orjson.dumps(
+                data, default=_encoder.default, option=ORJSON_OPTIONS))
+        except orjson.JSONEncodeError:
+            pass
+    return JSONRenderer().render(data)
+
+
+def loads(content):
+    """
+    Decodes UTF-8 JSON `content`, raising ValueError when it is invalid.
+    """
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def escape(content):
+    # JSONRenderer escapes these to keep the output a JavaScript subset.
+    if b'\xe2\x80\xa8' in content or b'\xe2\x80\xa9' in content:
+        content = content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(
+            b'\xe2\x80\xa9', b'\\u2029')
+    return content
+
+
+def iter_json_array(items):
+    """
+    Yields the JSON array of `items` in chunks, one element at a time.
+    """
+    yield b'['
+    for index, item in enumerate(items):
+        yield (b',' if index else b'') + dumps(item)
+    yield b']'
+
+
+class FastJSONRenderer(JSONRenderer):
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if orjson is None or self.ensure_ascii or not self.compact or \
+                self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data)
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Renders lists as newline-delimited JSON, one item per line, and other
+    data as a single line.
+    """
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if not isinstance(data, list):
+            data = [data]
+        return b''.join(dumps(item) + b'\n' for item in data)
+
+
+class FastJSONParser(JSONParser):
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or codecs.lookup(encoding).name != 'utf-8':
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return loads(stream.read())
+        except ValueError as exc:
+            raise ParseError(f'JSON parse error - {exc}') from exc
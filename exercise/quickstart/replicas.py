@@ -0,0 +1,115 @@
+"""
+Routing of read queries to replica databases.
+
+`ReplicaRoutingMiddleware` marks safe-method requests as replica reads,
+and `ReplicaRouter` sends their queries to one of `DATABASE_REPLICAS`.
+A client that wrote through an unsafe method is pinned to the primary
+for `REPLICA_PIN_SECONDS`, so it reads its own writes despite replica
+lag, and skips cached responses that may have been built from replica
+reads. Clients are told apart by their Authorization header, falling
+back to the session cookie and the remote address. Writes of an
+authenticated user, logins included, also pin the user, whose token
+requests are pinned however they were told apart before.
+
+Pins are kept in the `REPLICA_PIN_CACHE` cache alias, which must be
+shared by every process serving the API: with a per-process cache, a
+client's next request can reach a process that never saw the pin and
+reads from a lagging replica.
+"""
+import hashlib
+import random
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.deprecation import MiddlewareMixin
+from rest_framework.authentication import get_authorization_header
+from rest_framework.authtoken.models import Token
+from .authentication import CachedTokenAuthentication, cached_credentials
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+PIN_KEY = 'quickstart:replica-pin:{client}'
+USER_PIN_KEY = 'quickstart:replica-pin:user:{user_id}'
+
+use_replica = ContextVar('use_replica', default=False)
+
+
+def replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+def client_key(request):
+    client = (request.META.get('HTTP_AUTHORIZATION')
+              or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+              or request.META.get('REMOTE_ADDR', ''))
+    return PIN_KEY.format(client=hashlib.sha1(client.encode()).hexdigest())
+
+
+def pin_cache():
+    return caches[getattr(settings, 'REPLICA_PIN_CACHE', 'default')]
+
+
+def pin_keys(request, user_id=None):
+    keys = [client_key(request)]
+    if user_id is not None:
+        keys.append(USER_PIN_KEY.format(user_id=user_id))
+    return keys
+
+
+def token_user_id(request):
+    """
+    Returns the id of the user whose token authenticates `request`, from
+    the token cache when it holds the token.
+    """
+    auth = get_authorization_header(request).split()
+    if len(auth) != 2 or auth[0].lower() != CachedTokenAuthentication.keyword.lower().encode():
+        return None
+    key = auth[1].decode('latin-1')
+    cached = cached_credentials(key)
+    if cached is not None:
+        return cached[0].pk
+    return Token.objects.using('default').filter(key=key).values_list(
+        'user_id', flat=True).first()
+
+
+def pin(request, user_id=None):
+    pin_cache().set_many(dict.fromkeys(pin_keys(request, user_id), True),
+                         getattr(settings, 'REPLICA_PIN_SECONDS', 5))
+
+
+def is_pinned(request):
+    return bool(pin_cache().get_many(pin_keys(request, token_user_id(request))))
+
+
+class ReplicaRoutingMiddleware(MiddlewareMixin):
+
+    def process_request(self, request):
+        request.replica_pinned = bool(replicas()) and is_pinned(request)
+        use_replica.set(
+            bool(replicas()) and request.method in SAFE_METHODS
+            and not request.replica_pinned)
+
+    def process_response(self, request, response):
+        use_replica.set(False)
+        if replicas() and request.method not in SAFE_METHODS \
+                and response.status_code < 400:
+            user = getattr(request, 'user', None)
+            pin(request, user.pk if user is not None and user.is_authenticated else None)
+        return response
+
+
+class ReplicaRouter:
+    """
+    Sends reads of replica-routed requests to a random replica; every
+    other query, and every write, goes to `default`.
+    """
+
+    def db_for_read(self, model, **hints):  # pylint: disable=unused-argument
+        if use_replica.get() and replicas():
+            return random.choice(replicas())
+        return 'default'
+
+    def db_for_write(self, model, **hints):  # pylint: disable=unused-argument
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):  # pylint: disable=unused-argument
+        return True
@@ -0,0 +1,229 @@
+import hashlib
+import json
+import time
+import uuid
+from collections import OrderedDict
+from functools import wraps
+from threading import Lock
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control, \
+    patch_vary_headers
+from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date, quote_etag
+from django.utils.module_loading import import_string
+from rest_framework.response import Response
+from .streaming import stream_format
+
+DEFAULT_SETTINGS = {
+    'BACKEND': 'exercise.quickstart.responsecache.LocalLRUBackend',
+    'TIMEOUT': 60,
+    'OPTIONS': {},
+}
+
+
+class LocalLRUBackend:
+    """
+    Bounded in-process cache. Entries expire after `timeout` seconds, which
+    bounds staleness when another process invalidates a resource.
+    """
+
+    def __init__(self, timeout, max_entries=1024):
+        self.timeout = timeout
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.timeout, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class DjangoCacheBackend:
+    """
+    Shares cached responses between processes through a configured Django
+    cache alias, e.g. a Redis or Memcached cache.
+    """
+
+    def __init__(self, timeout, alias='default'):
+        self.timeout = timeout
+        self.cache = caches[alias]
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    def set(self, key, value):
+        self.cache.set(key, value, self.timeout)
+
+    def delete(self, key):
+        self.cache.delete(key)
+
+    def clear(self):
+        self.cache.clear()
+
+
+_backend = None
+
+
+def create_backend(setting_name, defaults=None):
+    """
+    Builds the cache backend configured by the `setting_name` setting.
+    """
+    options = {**DEFAULT_SETTINGS, **(defaults or {}),
+               **getattr(settings, setting_name, {})}
+    return import_string(options['BACKEND'])(
+        options['TIMEOUT'], **options['OPTIONS'])
+
+
+def get_backend():
+    global _backend  # pylint: disable=global-statement
+    if _backend is None:
+        _backend = create_backend('RESPONSE_CACHE')
+    return _backend
+
+
+def reset_backend():
+    global _backend  # pylint: disable=global-statement
+    _backend = None
+
+
+def generation(scope):
+    """
+    Returns the current token of `scope`. Cache keys embed the tokens of
+    their scopes, so bumping a scope invalidates every response in it.
+    """
+    key = f'quickstart:scope:{scope}'
+    token = get_backend().get(key)
+    if token is None:
+        token = uuid.uuid4().hex
+        get_backend().set(key, token)
+    return token
+
+
+def invalidate(*scopes):
+    for scope in scopes:
+        get_backend().set(f'quickstart:scope:{scope}', uuid.uuid4().hex)
+
+
+def last_modified(data):
+    """
+    Returns the latest `updated` timestamp found in serialized data as a
+    POSIX timestamp.
+    """
+    latest = None
+    stack = [data]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, dict):
+            updated = value.get('updated')
+            if isinstance(updated, str):
+                updated = parse_datetime(updated)
+                if updated is not None and (latest is None or updated > latest):
+                    latest = updated
+            stack.extend(value.values())
+        elif isinstance(value, list):
+            stack.extend(value)
+    return int(latest.timestamp()) if latest is not None else None
+
+
+def response_key(resource, scopes, request, current_day=False):
+    day = timezone.now().weekday() + 1 if current_day else '*'
+    return ':'.join([
+        'quickstart:response', resource, str(day), str(request.version),
+        request.GET.urlencode(),
+        *(generation(scope) for scope in scopes)])
+
+
+def make_entry(data):
+    content = json.dumps(data, sort_keys=True, default=str)
+    return {
+        'data': data,
+        'etag': hashlib.sha1(content.encode()).hexdigest(),
+        'last_modified': last_modified(data),
+    }
+
+
+def finalize(request, entry, response=None, response_class=Response):
+    """
+    Returns a 304/412 response when the request preconditions match the
+    cached entry, otherwise `response` (or a `response_class` holding the
+    cached data), with validators and cache headers set.
+    """
+    conditional = get_conditional_response(
+        request, etag=quote_etag(entry['etag']),
+        last_modified=entry['last_modified'])
+    if conditional is not None:
+        response = conditional
+    elif response is None:
+        response = response_class(entry['data'])
+    response['ETag'] = quote_etag(entry['etag'])
+    if entry['last_modified'] is not None:
+        response['Last-Modified'] = http_date(entry['last_modified'])
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ['Accept'])
+    return response
+
+
+def cached_entry(request, key):
+    """
+    Returns the cached entry for `key`, unless the client is pinned to the
+    primary database and must not see entries built from replica reads.
+    """
+    if getattr(request, 'replica_pinned', False):
+        return None
+    return get_backend().get(key)
+
+
+def cached_response(resource, scopes, current_day=False):
+    """
+    Caches the data of a GET action and answers conditional requests
+    with 304 responses.
+
+    `scopes` are formatted with the view kwargs (e.g. `'restaurant:{pk}'`)
+    and name the invalidation scopes the response belongs to. The cache
+    key also holds the API version, the query string and, with
+    `current_day`, the current weekday. Streamed lists are not cached.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(self, request, *args, **kwargs):
+            if stream_format(request) is not None:
+                return view(self, request, *args, **kwargs)
+            key = response_key(
+                resource, [scope.format(**kwargs) for scope in scopes],
+                request, current_day)
+            entry = cached_entry(request, key)
+            response = None
+            if entry is None:
+                response = view(self, request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+                entry = make_entry(response.data)
+                get_backend().set(key, entry)
+            return finalize(request, entry, response)
+        return wrapper
+    return decorator
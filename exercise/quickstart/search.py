@@ -0,0 +1,259 @@
+"""
+Search over menu item, menu and restaurant names.
+
+Each query term matches names with a word starting with it, so partial
+input autocompletes. Names are indexed by the database where it can:
+an FTS5 table on SQLite and trigram GIN indexes on PostgreSQL, both
+created by the `0006_search_index` migration and kept current by the
+database itself. Other databases, and `SEARCH['BACKEND'] = 'trie'`, use
+an in-process prefix trie, rebuilt after `TRIE_TIMEOUT` seconds or when
+a name changes in this process.
+
+Matches are ranked into menus (by their own and their items' matches)
+and restaurants (by their own and their menus' matches) in one query.
+"""
+import re
+import time
+import unicodedata
+from threading import Lock
+from django.conf import settings
+from django.db import connections, router
+from exercise.quickstart.models import Menu, MenuItem, RefMenu, Restaurant
+
+DEFAULT_SETTINGS = {
+    'BACKEND': 'auto',
+    'MAX_HITS': 1000,
+    'TRIE_TIMEOUT': 60,
+}
+
+ITEM, MENU, RESTAURANT = 1, 2, 3
+KINDS = ((ITEM, MenuItem, 'name'), (MENU, Menu, 'name'),
+         (RESTAURANT, Restaurant, 'restaurantName'))
+TOKEN = re.compile(r'[^\W_]+')
+
+_lock = Lock()
+_backends = {}
+_trie = None
+_built = 0
+
+
+def search_settings():
+    return {**DEFAULT_SETTINGS, **getattr(settings, 'SEARCH', {})}
+
+
+def tokens(text):
+    """
+    Splits `text` into lowercase words without diacritics, as the FTS5
+    `unicode61 remove_diacritics 2` tokenizer does.
+    """
+    text = unicodedata.normalize('NFKD', text.lower())
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return TOKEN.findall(text)
+
+
+def backend(connection):
+    name = search_settings()['BACKEND']
+    if name != 'auto':
+        return name
+    if connection.alias not in _backends:
+        if connection.vendor == 'sqlite' and 'quickstart_search' in \
+                connection.introspection.table_names():
+            _backends[connection.alias] = 'fts5'
+        elif connection.vendor == 'postgresql':
+            _backends[connection.alias] = 'trigram'
+        else:
+            _backends[connection.alias] = 'trie'
+    return _backends[connection.alias]
+
+
+class PrefixTrie:
+    """
+    Maps word prefixes to the `(kind, id)` keys of the names holding a
+    word with that prefix. Every node keeps its keys, so a lookup costs
+    the length of the prefix.
+    """
+
+    class Node:  # pylint: disable=too-few-public-methods
+        __slots__ = ('children', 'keys', 'exact')
+
+        def __init__(self):
+            self.children = {}
+            self.keys = set()
+            self.exact = set()
+
+    def __init__(self):
+        self.root = self.Node()
+
+    def add(self, key, text):
+        for token in tokens(text):
+            node = self.root
+            for char in token:
+                node = node.children.setdefault(char, self.Node())
+                node.keys.add(key)
+            node.exact.add(key)
+
+    def find(self, prefix):
+        node = self.root
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return self.Node()
+        return node
+
+    def search(self, terms):
+        """
+        Returns `{key: score}` for the names matching every term, a whole
+        word scoring 2 and a word prefix 1.
+        """
+        nodes = [self.find(term) for term in terms]
+        if not nodes:
+            return {}
+        keys = set.intersection(*(node.keys for node in nodes))
+        return {key: sum(2 if key in node.exact else 1 for node in nodes)
+                for key in keys}
+
+
+def build_trie(using):
+    trie = PrefixTrie()
+    for kind, model, field in KINDS:
+        for object_id, name in model.objects.using(using).values_list(
+                'id', field).iterator():
+            trie.add((kind, object_id), name)
+    return trie
+
+
+def get_trie(using):
+    global _trie, _built  # pylint: disable=global-statement
+    with _lock:
+        if _trie is None or time.monotonic() - _built > search_settings()['TRIE_TIMEOUT']:
+            _trie, _built = build_trie(using), time.monotonic()
+        return _trie
+
+
+def invalidate():
+    global _trie  # pylint: disable=global-statement
+    with _lock:
+        _trie = None
+
+
+def fts5_hits(terms, max_hits):
+    # Quoted terms keep user input out of the FTS5 query syntax.
+    return (
+        'SELECT rowid %% 4, rowid / 4, -bm25(quickstart_search) FROM quickstart_search '
+        'WHERE quickstart_search MATCH %s ORDER BY rank LIMIT %s',
+        [' '.join(f'"{term}"*' for term in terms), max_hits])
+
+
+def trigram_hits(terms, max_hits, qn):
+    # \m anchors each term at the start of a word, as the other backends
+    # match; terms are word characters only. pg_trgm indexes regexes too.
+    selects, params = [], []
+    for kind, model, field in KINDS:
+        column = qn(model._meta.get_field(field).column)
+        selects.append(
+            f'SELECT {kind}, id, word_similarity(%s, {column}) FROM {qn(model._meta.db_table)} '
+            f'WHERE {" AND ".join([f"{column} ~* %s"] * len(terms))}')
+        params.extend([' '.join(terms), *(rf'\m{term}' for term in terms)])
+    return f'{" UNION ALL ".join(selects)} ORDER BY 3 DESC LIMIT %s', [*params, max_hits]
+
+
+def trie_hits(terms, max_hits, using):
+    scores = get_trie(using).search(terms)
+    ranked = sorted(scores.items(), key=lambda hit: (-hit[1], hit[0]))[:max_hits]
+    if not ranked:
+        return None
+    return (f'VALUES {", ".join(["(%s, %s, %s)"] * len(ranked))}',
+            [value for (kind, object_id), score in ranked
+             for value in (kind, object_id, score)])
+
+
+def hits_query(connection, terms, max_hits):
+    name = backend(connection)
+    if name == 'fts5':
+        return fts5_hits(terms, max_hits)
+    if name == 'trigram':
+        return trigram_hits(terms, max_hits, connection.ops.quote_name)
+    return trie_hits(terms, max_hits, connection.alias)
+
+
+def ranking_query(hits, qn):
+    menu = qn(Menu._meta.db_table)
+    restaurant = qn(Restaurant._meta.db_table)
+    ref = qn(RefMenu._meta.db_table)
+    return f'''
+        WITH hits (kind, object_id, score) AS ({hits}),
+        menu_hits (menu_id, score, items) AS (
+            SELECT ref.{qn('menuID_id')}, hits.score, 1
+            FROM hits JOIN {ref} ref ON ref.{qn('menuItemID_id')} = hits.object_id
+            WHERE hits.kind = {ITEM}
+            UNION ALL
+            SELECT object_id, score, 0 FROM hits WHERE kind = {MENU}
+        ),
+        menus (menu_id, restaurant_id, score, items) AS (
+            SELECT menu_hits.menu_id, menu.restaurant_id, SUM(menu_hits.score),
+                   SUM(menu_hits.items)
+            FROM menu_hits JOIN {menu} menu ON menu.id = menu_hits.menu_id
+            GROUP BY menu_hits.menu_id, menu.restaurant_id
+        ),
+        results (kind, object_id, restaurant_id, score, items) AS (
+            SELECT {MENU}, menu_id, restaurant_id, score, items FROM menus
+            UNION ALL
+            SELECT {RESTAURANT}, restaurant_id, restaurant_id, SUM(score), SUM(items)
+            FROM (
+                SELECT restaurant_id, score, items FROM menus
+                UNION ALL
+                SELECT object_id, score, 0 FROM hits WHERE kind = {RESTAURANT}
+            ) restaurant_hits
+            GROUP BY restaurant_id
+        ),
+        ranked AS (
+            SELECT results.*, ROW_NUMBER() OVER (
+                PARTITION BY kind ORDER BY score DESC, object_id) AS position
+            FROM results
+        )
+        SELECT ranked.kind, ranked.object_id, menu.name, menu.day, restaurant.id,
+               restaurant.{qn('restaurantName')}, restaurant.city, ranked.score,
+               ranked.items
+        FROM ranked
+        JOIN {restaurant} restaurant ON restaurant.id = ranked.restaurant_id
+        LEFT JOIN {menu} menu ON ranked.kind = {MENU} AND menu.id = ranked.object_id
+        WHERE ranked.position <= %s
+        ORDER BY ranked.kind, ranked.position'''
+
+
+def search(query, limit=20):
+    """
+    Returns the `limit` best ranked menus and restaurants matching every
+    word of `query`.
+    """
+    results = {'menus': [], 'restaurants': []}
+    terms = tokens(query)
+    if not terms:
+        return results
+    connection = connections[router.db_for_read(Menu)]
+    hits = hits_query(connection, terms, search_settings()['MAX_HITS'])
+    if hits is None:
+        return results
+    sql, params = hits
+    with connection.cursor() as cursor:
+        cursor.execute(ranking_query(sql, connection.ops.quote_name), [*params, limit])
+        rows = cursor.fetchall()
+    for kind, object_id, menu_name, day, restaurant_id, restaurant_name, city, score, \
+            items in rows:
+        if kind == MENU:
+            results['menus'].append({
+                'menuId': object_id,
+                'menuName': menu_name,
+                'day': day,
+                'restaurantId': restaurant_id,
+                'restaurantName': restaurant_name,
+                'matchedItems': int(items),
+                'score': round(float(score), 4)})
+        else:
+            results['restaurants'].append({
+                'restaurantId': restaurant_id,
+                'restaurantName': restaurant_name,
+                'city': city,
+                'matchedItems': int(items),
+                'score': round(float(score), 4)})
+    return results
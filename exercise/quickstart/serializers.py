@@ -2,8 +2,8 @@ from rest_framework import serializers
 from rest_framework.authtoken.models import Token
 from django.contrib.auth import get_user_model, password_validation
 from django.contrib.auth.models import BaseUserManager
-from django.db.models import Q
-from exercise.quickstart.models import Employee, MenuItem, RefMenu, Restaurant, Menu
+from exercise.quickstart.models import Employee, MenuItem, Restaurant, Menu
+from .fieldsets import SparseFieldsetMixin, is_expanded
 
 
 User = get_user_model()
@@ -79,7 +79,7 @@ class EmptySerializer(serializers.Serializer):  # pylint: disable=abstract-metho
     pass
 
 
-class EmployeeSerializer(serializers.Serializer):
+class EmployeeSerializer(SparseFieldsetMixin, serializers.Serializer):
     id = serializers.IntegerField(read_only=True)
     username = serializers.CharField(required=True, max_length=255)
     email = serializers.EmailField(required=True, max_length=255)
@@ -114,7 +114,7 @@ class EmployeeSerializer(serializers.Serializer):
         return Employee.objects.delete(**instance)
 
 
-class RestaurantSerializer(serializers.Serializer):
+class RestaurantSerializer(SparseFieldsetMixin, serializers.Serializer):
     id = serializers.IntegerField(read_only=True)
     restaurantName = serializers.CharField(
         required=True, allow_blank=False, max_length=255)
@@ -153,7 +153,7 @@ class RestaurantSerializer(serializers.Serializer):
         return Restaurant.objects.delete(**instance)
 
 
-class UserSerializer(serializers.HyperlinkedModelSerializer):
+class UserSerializer(SparseFieldsetMixin, serializers.HyperlinkedModelSerializer):
     class Meta:  # pylint: disable=too-few-public-methods
         model = User
         fields = ['url', 'username', 'email', 'groups']
@@ -182,6 +182,12 @@ class MenuSerializer(serializers.Serializer):  # pylint: disable=abstract-method
         allow_blank=False,
         max_length=255)
     day = serializers.IntegerField(required=True)
+    minPrice = serializers.DecimalField(
+        read_only=True, max_digits=6, decimal_places=2, source='min_price')
+    maxPrice = serializers.DecimalField(
+        read_only=True, max_digits=6, decimal_places=2, source='max_price')
+    avgPrice = serializers.DecimalField(
+        read_only=True, max_digits=6, decimal_places=2, source='avg_price')
     restaurant = RestaurantSerializer(read_only=True)
     created = serializers.DateTimeField(read_only=True)
     updated = serializers.DateTimeField(read_only=True)
@@ -192,19 +198,12 @@ class MenuSerializer(serializers.Serializer):  # pylint: disable=abstract-method
         {})("get_menu_items")
 
     def get_menu_items(self, obj):
-        queryset_ref_menu = RefMenu.objects.filter(menuID=obj.id).values()
-        serializer = RefSerializer(queryset_ref_menu, many=True)
-        my_filter_qs = Q()
-        for creator in serializer.data:
-            my_filter_qs = my_filter_qs | Q(id=creator["menuItemID"])
-
-        if serializer.data.__len__() > 0:
-            queryset_menu_item = MenuItem.objects.filter(my_filter_qs)
-            serializer_menu_item = MenuItemSerializer(
-                queryset_menu_item, many=True)
-            return serializer_menu_item.data
-
-        return []
+        if hasattr(obj, 'prefetched_refs'):
+            menu_items = [ref.menuItemID for ref in obj.prefetched_refs]
+        else:
+            menu_items = MenuItem.objects.filter(
+                refmenu__menuID=obj.id).order_by('id')
+        return MenuItemSerializer(menu_items, many=True).data
 
     class Meta:  # pylint: disable=too-few-public-methods
         model = Menu
@@ -212,6 +211,9 @@ class MenuSerializer(serializers.Serializer):  # pylint: disable=abstract-method
             'id',
             'name',
             'day',
+            'minPrice',
+            'maxPrice',
+            'avgPrice',
             'created',
             'updated',
             'restaurant',
@@ -226,6 +228,12 @@ class VoteSerializer(serializers.Serializer):  # pylint: disable=abstract-method
     created = serializers.DateTimeField(read_only=True)
     updated = serializers.DateTimeField(read_only=True)
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if not is_expanded(self.context.get('request'), 'menu'):
+            self.fields['menu'] = serializers.IntegerField(
+                read_only=True, source='menu_id')
+
 
 class MenuItemRequestSerializer(serializers.Serializer):  # pylint: disable=abstract-method
     name = serializers.CharField(required=True, max_length=255)
@@ -240,11 +248,60 @@ class MenuRequestSerializer(serializers.Serializer):  # pylint: disable=abstract
     menuItems = MenuItemRequestSerializer(required=True, many=True)
 
 
+class MenuBulkEntrySerializer(MenuRequestSerializer):  # pylint: disable=abstract-method
+    restaurant = serializers.IntegerField(required=True)
+
+
+class MenuBulkRequestSerializer(serializers.Serializer):  # pylint: disable=abstract-method
+    data = MenuBulkEntrySerializer(many=True)
+
+
 class VotingSingleRequestSerializer(serializers.Serializer):  # pylint: disable=abstract-method
     menuName = serializers.CharField(required=True, max_length=255)
     day = serializers.IntegerField(required=True)
     votes = serializers.IntegerField(required=True)
+    increment = serializers.BooleanField(required=False, default=False)
 
 
 class VotingManyRequestSerializer(serializers.Serializer):  # pylint: disable=abstract-method
     data = VotingSingleRequestSerializer(many=True)
+
+
+class LeaderboardRequestSerializer(serializers.Serializer):  # pylint: disable=abstract-method
+    day = serializers.IntegerField(required=False, min_value=1, max_value=7)
+    limit = serializers.IntegerField(
+        required=False, default=10, min_value=1, max_value=100)
+
+
+class AnalyticsRequestSerializer(serializers.Serializer):  # pylint: disable=abstract-method
+    weeks = serializers.IntegerField(required=False, min_value=1, max_value=520)
+    window = serializers.IntegerField(
+        required=False, default=4, min_value=1, max_value=52)
+    limit = serializers.IntegerField(
+        required=False, default=20, min_value=1, max_value=100)
+
+
+class SearchRequestSerializer(serializers.Serializer):  # pylint: disable=abstract-method
+    q = serializers.CharField(max_length=200)
+    limit = serializers.IntegerField(
+        required=False, default=20, min_value=1, max_value=100)
+
+
+class RestaurantFilterSerializer(serializers.Serializer):  # pylint: disable=abstract-method
+    city = serializers.CharField(required=False, max_length=255)
+
+
+class MenuFilterSerializer(serializers.Serializer):  # pylint: disable=abstract-method
+    day = serializers.IntegerField(required=False, min_value=1, max_value=7)
+    min_price = serializers.DecimalField(
+        required=False, max_digits=6, decimal_places=2, source='min_price__gte')
+    max_price = serializers.DecimalField(
+        required=False, max_digits=6, decimal_places=2, source='max_price__lte')
+
+
+class MenuItemFilterSerializer(serializers.Serializer):  # pylint: disable=abstract-method
+    currency = serializers.CharField(required=False, max_length=10)
+    min_price = serializers.DecimalField(
+        required=False, max_digits=6, decimal_places=2, source='price__gte')
+    max_price = serializers.DecimalField(
+        required=False, max_digits=6, decimal_places=2, source='price__lte')
@@ -0,0 +1,74 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+from exercise.quickstart.models import MenuItem, RefMenu, Restaurant, Menu, Vote, \
+    current_week
+from . import analytics, authentication, events, leaderboard, responsecache, search
+from .menus import refresh_prices
+
+
+@receiver([post_save, post_delete], sender=Vote)
+def vote_changed(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    transaction.on_commit(lambda: analytics.invalidate_week(instance.week))
+    if instance.week != current_week():
+        return
+    transaction.on_commit(lambda: leaderboard.invalidate([instance.day]))
+    count = 0 if kwargs['signal'] is post_delete else instance.count
+    transaction.on_commit(lambda: events.publish_votes(
+        [(instance.menu_id, instance.day, count)]))
+
+
+@receiver([post_save, post_delete], sender=Menu)
+def menu_changed(sender, instance, created=False, **kwargs):  # pylint: disable=unused-argument
+    responsecache.invalidate(f'restaurant:{instance.restaurant_id}')
+    search.invalidate()
+    if not created:
+        transaction.on_commit(leaderboard.invalidate)
+
+
+@receiver([post_save, post_delete], sender=Restaurant)
+def restaurant_changed(sender, instance, created=False, **kwargs):  # pylint: disable=unused-argument
+    responsecache.invalidate('restaurants', f'restaurant:{instance.id}')
+    search.invalidate()
+    if not created:
+        transaction.on_commit(leaderboard.invalidate)
+
+
+@receiver([post_save, post_delete], sender=MenuItem)
+@receiver([post_save, post_delete], sender=RefMenu)
+def menu_item_changed(sender, instance, created=False, origin=None, **kwargs):  # pylint: disable=unused-argument
+    responsecache.invalidate('menus')
+    if sender is MenuItem:
+        search.invalidate()
+        if not created and kwargs['signal'] is post_save:
+            refresh_prices(RefMenu.objects.filter(menuItemID=instance).values_list(
+                'menuID_id', flat=True))
+    elif not issubclass(getattr(origin, 'model', type(origin)), (Menu, Restaurant)):
+        # Links deleted along with their menu leave nothing to refresh.
+        refresh_prices([instance.menuID_id])
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    authentication.invalidate_token(instance.key)
+
+
+@receiver([post_save, post_delete], sender=get_user_model())
+def user_changed(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    authentication.invalidate_user(instance.pk)
+
+
+@receiver(connection_created)
+def configure_connection(sender, connection, **kwargs):  # pylint: disable=unused-argument
+    """
+    Applies the `PRAGMAS` of a SQLite database's settings to each new
+    connection.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in connection.settings_dict.get('PRAGMAS', {}).items():
+            cursor.execute(f'PRAGMA {name} = {value}')
@@ -0,0 +1,87 @@
+"""
+Streamed list responses.
+
+A list is streamed instead of built in memory when the client accepts
+`application/x-ndjson` (one JSON document per line) or passes
+`stream=true` (a JSON array). Rows are read with `.iterator()` and
+serialized `CHUNK_SIZE` at a time, so worker memory stays flat however
+large the table. Streamed lists are neither paginated nor cached.
+"""
+from itertools import islice
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from .filters import list_ordering
+from .renderers import NDJSONRenderer, dumps, iter_json_array
+
+DEFAULT_SETTINGS = {
+    'CHUNK_SIZE': 2000,
+}
+
+TRUE_VALUES = ('1', 'true', 'yes')
+
+
+def chunk_size():
+    return {**DEFAULT_SETTINGS, **getattr(settings, 'STREAMING', {})}['CHUNK_SIZE']
+
+
+def stream_format(request):
+    """
+    Returns 'ndjson' or 'json' when the request asks for a streamed list,
+    otherwise None.
+    """
+    renderer = getattr(request, 'accepted_renderer', None)
+    if renderer is not None and renderer.format == NDJSONRenderer.format:
+        return 'ndjson'
+    if request.GET.get('stream', '').lower() in TRUE_VALUES:
+        return 'json'
+    return None
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def iter_serialized(queryset, serialize, size):
+    """
+    Yields the items of `serialize(objects)` for `queryset`, read and
+    serialized `size` objects at a time.
+    """
+    for objects in batched(queryset.iterator(chunk_size=size), size):
+        yield from serialize(objects)
+
+
+def iter_ndjson(items):
+    for item in items:
+        yield dumps(item) + b'\n'
+
+
+def streaming_response(items, format_name):
+    if format_name == 'ndjson':
+        return StreamingHttpResponse(
+            iter_ndjson(items), content_type=NDJSONRenderer.media_type)
+    return StreamingHttpResponse(
+        iter_json_array(items), content_type='application/json')
+
+
+class StreamingListMixin:
+    """
+    View mixin streaming `list` when the request asks for it, ordered as
+    its pages would be.
+    """
+
+    def list(self, request, *args, **kwargs):
+        format_name = stream_format(request)
+        if format_name is None:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        ordering = list_ordering(request, self)
+        if ordering:
+            queryset = queryset.order_by(*ordering)
+        return streaming_response(iter_serialized(
+            queryset, lambda objects: self.get_serializer(objects, many=True).data,
+            chunk_size()), format_name)
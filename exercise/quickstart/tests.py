@@ -1,3 +1,1527 @@
-# from django.test import TestCase
+import asyncio
+import datetime
+import glob
+import gzip
+import json
+import uuid
+from decimal import Decimal
+import os
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
+from asgiref.sync import async_to_sync, sync_to_async
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.db import OperationalError, connection, connections
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.http import HttpResponse
+from django.test import AsyncRequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory, APITestCase
+from exercise.quickstart.models import Ballot, Employee, MenuItem, RefMenu, Restaurant, \
+    Menu, Vote, WeeklyVoteSummary, current_week
+from exercise.quickstart import analytics, archive, async_views, authentication, \
+    ballots, compression, events, leaderboard, metrics, replicas, responsecache, search, \
+    votebuffer
+from exercise.quickstart.bulkdata import BulkImporter, read_rows
+from exercise.quickstart.loaders import load_menus, load_votes
+from exercise.quickstart.readserializers import aserialize_votes, serialize_menus, \
+    serialize_votes
+from exercise.quickstart.renderers import FastJSONParser, FastJSONRenderer, \
+    iter_json_array
+from exercise.quickstart.serializers import MenuSerializer, VoteSerializer
+from exercise.quickstart.votes import menu_lookup, upsert_votes
 
-# Create your tests here.
+
+User = get_user_model()
+
+
+def seed_menus(restaurant, count, items_per_menu=3):
+    menus = []
+    for index in range(count):
+        menu = Menu.objects.create(
+            name=f'Menu {restaurant.id}-{index}',
+            day=index % 7 + 1,
+            restaurant=restaurant)
+        for item_index in range(items_per_menu):
+            menu_item, _ = MenuItem.objects.get_or_create(
+                name=f'Item {index}-{item_index}', price=10, currency='EUR')
+            RefMenu.objects.create(menuID=menu, menuItemID=menu_item)
+        menus.append(menu)
+    return menus
+
+
+class AuthenticatedAPITestCase(APITestCase):
+    """
+    Runs every test as the same regular user.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='tester@example.com', username='tester', password='x')
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+
+class MenuGraphQueryTests(AuthenticatedAPITestCase):
+
+    def restaurant(self, name='Grill'):
+        return Restaurant.objects.create(
+            restaurantName=name, address='Akropolis', city='Klaipėda')
+
+    def test_menus_query_count_is_flat(self):
+        small = self.restaurant()
+        large = self.restaurant('Pizza')
+        seed_menus(small, 1)
+        seed_menus(large, 20)
+
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/restaurants/{small.id}/menus/')
+        self.assertEqual(len(response.data), 1)
+
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/restaurants/{large.id}/menus/')
+        self.assertEqual(len(response.data), 20)
+        self.assertEqual(len(response.data[0]['menuItems']), 3)
+
+    def test_current_day_votes_query_count_is_flat(self):
+        day = timezone.now().weekday() + 1
+        for index in range(10):
+            restaurant = self.restaurant(f'Restaurant {index}')
+            menu = seed_menus(restaurant, 7)[day - 1]
+            Vote.objects.create(count=index, day=day, menu=menu)
+
+        with self.assertNumQueries(2):
+            response = self.client.get('/restaurants/votes/current/')
+        self.assertEqual(len(response.data), 10)
+        self.assertEqual(len(response.data[0]['menu']['menuItems']), 3)
+
+
+class VoteUpsertTests(AuthenticatedAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.restaurant = Restaurant.objects.create(
+            restaurantName='Grill', address='Akropolis', city='Klaipėda')
+        self.menu = seed_menus(self.restaurant, 1)[0]
+
+    def vote(self, votes, **extra):
+        return self.client.post(
+            f'/restaurants/{self.restaurant.id}/vote/',
+            {'menuName': self.menu.name, 'day': self.menu.day,
+             'votes': votes, **extra},
+            format='json', HTTP_ACCEPT='application/json; version=v1.0')
+
+    def test_vote_overwrites_count(self):
+        self.assertEqual(self.vote(5).status_code, 200)
+        # Menu lookup and upsert, plus the savepoint pair of the atomic block.
+        with self.assertNumQueries(4):
+            self.assertEqual(self.vote(3).status_code, 200)
+        self.assertEqual(Vote.objects.get(menu=self.menu).count, 3)
+
+    def test_vote_increment_adds_to_count(self):
+        self.vote(5, increment=True)
+        self.vote(2, increment=True)
+        self.assertEqual(Vote.objects.get(menu=self.menu).count, 7)
+
+    def test_vote_unknown_menu(self):
+        response = self.client.post(
+            f'/restaurants/{self.restaurant.id}/vote/',
+            {'menuName': 'Missing', 'day': 1, 'votes': 1},
+            format='json', HTTP_ACCEPT='application/json; version=v1.0')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Vote.objects.exists())
+
+
+class BatchVoteTests(AuthenticatedAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.restaurant = Restaurant.objects.create(
+            restaurantName='Grill', address='Akropolis', city='Klaipėda')
+        self.menus = seed_menus(self.restaurant, 3, items_per_menu=0)
+
+    def vote(self, entries):
+        return self.client.post(
+            f'/restaurants/{self.restaurant.id}/vote/', {'data': entries},
+            format='json', HTTP_ACCEPT='application/json; version=v2.0')
+
+    def test_every_entry_is_written(self):
+        entries = [{'menuName': menu.name, 'day': menu.day, 'votes': 3 - index}
+                   for index, menu in enumerate(self.menus)]
+        response = self.vote(entries)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [result['status'] for result in response.data['data']],
+            ['ok', 'ok', 'ok'])
+        self.assertEqual(
+            list(Vote.objects.order_by('menu_id').values_list('count', flat=True)),
+            [3, 2, 1])
+
+    def test_unknown_menu_rejects_whole_ballot(self):
+        entries = [{'menuName': self.menus[0].name, 'day': self.menus[0].day, 'votes': 3},
+                   {'menuName': 'Missing', 'day': 1, 'votes': 2}]
+        response = self.vote(entries)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            [result['status'] for result in response.data['data']],
+            ['ok', 'error'])
+        self.assertFalse(Vote.objects.exists())
+
+    def test_more_than_three_entries_are_rejected(self):
+        entries = [{'menuName': self.menus[0].name, 'day': self.menus[0].day, 'votes': 1}] * 4
+        self.assertEqual(self.vote(entries).status_code, 400)
+
+
+class MenuIngestionTests(AuthenticatedAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.restaurants = [
+            Restaurant.objects.create(
+                restaurantName=f'Restaurant {index}', address='Akropolis',
+                city='Klaipėda')
+            for index in range(2)]
+
+    def menu_items(self, count):
+        return [{'name': f'Item {index}', 'price': '10.50', 'currency': 'EUR'}
+                for index in range(count)]
+
+    def test_menu_query_count_does_not_grow_with_items(self):
+        MenuItem.objects.create(name='Item 0', price='10.50', currency='EUR')
+        url = f'/restaurants/{self.restaurants[0].id}/menu/'
+        # Menu lookup and insert, item lookup, insert and re-read, ref
+        # insert, menu price update, plus the savepoint pair of the atomic
+        # block.
+        with self.assertNumQueries(9):
+            response = self.client.post(
+                url, {'menuName': 'Monday', 'day': 1,
+                      'menuItems': self.menu_items(30)}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(MenuItem.objects.count(), 30)
+        self.assertEqual(RefMenu.objects.count(), 30)
+
+        response = self.client.post(
+            url, {'menuName': 'Renamed', 'day': 1,
+                  'menuItems': self.menu_items(31)}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            list(Menu.objects.values_list('name', flat=True)), ['Renamed'])
+        self.assertEqual(RefMenu.objects.count(), 31)
+
+    def test_bulk_week_for_several_restaurants(self):
+        entries = [
+            {'restaurant': restaurant.id, 'menuName': f'Day {day}', 'day': day,
+             'menuItems': self.menu_items(5)}
+            for restaurant in self.restaurants for day in range(1, 8)]
+        response = self.client.post(
+            '/restaurants/menus/bulk/', {'data': entries}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data, {'menus': 14, 'menuItems': 5})
+        self.assertEqual(Menu.objects.count(), 14)
+        self.assertEqual(RefMenu.objects.count(), 70)
+
+    def test_bulk_rejects_unknown_restaurant(self):
+        response = self.client.post(
+            '/restaurants/menus/bulk/',
+            {'data': [{'restaurant': 999, 'menuName': 'Monday', 'day': 1,
+                       'menuItems': self.menu_items(1)}]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Menu.objects.exists())
+
+
+class BulkDataCommandTests(TestCase):
+
+    def test_export_import_round_trip(self):
+        restaurant = Restaurant.objects.create(
+            restaurantName='Grill', address='Akropolis', city='Klaipėda')
+        for menu in seed_menus(restaurant, 7):
+            Vote.objects.create(count=menu.day * 2, day=menu.day, menu=menu)
+
+        models = ['restaurant', 'menuitem', 'menu', 'refmenu', 'vote']
+        with tempfile.TemporaryDirectory() as directory:
+            paths = {
+                model_name: os.path.join(
+                    directory,
+                    f'{model_name}.{"csv" if index % 2 else "ndjson"}')
+                for index, model_name in enumerate(models)}
+            for model_name in models:
+                call_command('exportdata', model_name, '-o',
+                             paths[model_name], stderr=StringIO())
+
+            Restaurant.objects.all().delete()
+            MenuItem.objects.all().delete()
+
+            for model_name in models:
+                call_command('importdata', model_name, paths[model_name],
+                             '--chunk-size', '4', stdout=StringIO())
+            call_command('importdata', 'vote', paths['vote'],
+                         stdout=StringIO())
+
+        self.assertEqual(Restaurant.objects.count(), 1)
+        self.assertEqual(Menu.objects.count(), 7)
+        self.assertEqual(MenuItem.objects.count(), 21)
+        self.assertEqual(RefMenu.objects.count(), 21)
+        self.assertEqual(
+            list(Vote.objects.order_by('day').values_list('day', 'count')),
+            [(day, day * 2) for day in range(1, 8)])
+
+    def test_imported_votes_are_not_streamed(self):
+        restaurant = Restaurant.objects.create(
+            restaurantName='Grill', address='Akropolis', city='Klaipėda')
+        menu = seed_menus(restaurant, 1, items_per_menu=0)[0]
+        rows = [{'count': 3, 'day': 1, 'menuName': menu.name, 'menuDay': menu.day,
+                 'restaurantName': 'Grill', 'city': 'Klaipėda'}]
+        with mock.patch.object(events, 'publish_votes') as publish_votes, \
+                self.captureOnCommitCallbacks(execute=True):
+            BulkImporter().write('vote', rows)
+        publish_votes.assert_not_called()
+        self.assertEqual(Vote.objects.get().count, 3)
+
+    def test_export_to_captured_stdout(self):
+        Restaurant.objects.create(
+            restaurantName='Grill', address='Akropolis', city='Klaipėda')
+        for file_format in ('ndjson', 'csv'):
+            stdout = StringIO()
+            call_command('exportdata', 'restaurant', '--format', file_format,
+                         stdout=stdout, stderr=StringIO())
+            rows = list(read_rows(StringIO(stdout.getvalue()), file_format))
+            self.assertEqual([row['restaurantName'] for row in rows], ['Grill'])
+
+    def test_imported_weeks_are_normalized_to_mondays(self):
+        rows = read_rows(StringIO('count,week,day\n3,2026-10-15,1\n4,,2\n'), 'csv')
+        self.assertEqual([row['week'] for row in rows],
+                         [datetime.date(2026, 10, 12), None])
+
+
+class LeaderboardTests(AuthenticatedAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.restaurants = [
+            Restaurant.objects.create(
+                restaurantName=f'Restaurant {index}', address='Akropolis',
+                city='Klaipėda')
+            for index in range(3)]
+        self.menus = [seed_menus(restaurant, 1, items_per_menu=0)[0]
+                      for restaurant in self.restaurants]
+
+    def vote(self, menu, votes, increment=False):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                f'/restaurants/{menu.restaurant_id}/vote/',
+                {'menuName': menu.name, 'day': menu.day, 'votes': votes,
+                 'increment': increment},
+                format='json', HTTP_ACCEPT='application/json; version=v1.0')
+
+    def ranking(self, **params):
+        response = self.client.get(
+            '/restaurants/leaderboard/', {'day': 1, **params})
+        return [(entry['rank'], entry['menuId'], entry['count'])
+                for entry in response.data]
+
+    def test_votes_invalidate_ranking(self):
+        for count, menu in enumerate(self.menus, start=1):
+            self.vote(menu, count)
+        self.assertEqual(
+            self.ranking(),
+            [(1, self.menus[2].id, 3), (2, self.menus[1].id, 2),
+             (3, self.menus[0].id, 1)])
+
+        self.vote(self.menus[0], 5, increment=True)
+        with self.assertNumQueries(1):
+            ranking = self.ranking(limit=2)
+        self.assertEqual(
+            ranking, [(1, self.menus[0].id, 6), (2, self.menus[2].id, 3)])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.ranking(limit=2), ranking)
+
+    def test_ranking_built_before_a_vote_is_not_served(self):
+        self.vote(self.menus[0], 1)
+        day_generation = leaderboard.generation(1)
+        self.vote(self.menus[1], 2)
+        leaderboard.build(1, day_generation, 10)
+        self.assertIsNone(cache.get(leaderboard.cache_key(1, leaderboard.generation(1), 10)))
+
+    def test_menu_changes_invalidate_ranking(self):
+        self.vote(self.menus[0], 1)
+        self.ranking()
+        name, self.menus[0].name = self.menus[0].name, 'Renamed'
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.menus[0].save()
+        # Until the rename commits, the cached ranking stays current.
+        response = self.client.get('/restaurants/leaderboard/', {'day': 1})
+        self.assertEqual(response.data[0]['menuName'], name)
+        for callback in callbacks:
+            callback()
+        response = self.client.get('/restaurants/leaderboard/', {'day': 1})
+        self.assertEqual(response.data[0]['menuName'], 'Renamed')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.menus[0].delete()
+        self.assertEqual(self.ranking(), [])
+
+
+class ResponseCacheTests(AuthenticatedAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        responsecache.get_backend().clear()
+        self.restaurant = Restaurant.objects.create(
+            restaurantName='Grill', address='Akropolis', city='Klaipėda')
+        seed_menus(self.restaurant, 2)
+        self.url = f'/restaurants/{self.restaurant.id}/menus/'
+
+    def test_cached_response_and_conditional_get(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Last-Modified', response)
+        etag = response['ETag']
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 2)
+
+        with self.assertNumQueries(2):
+            response = self.client.get(
+                self.url, HTTP_ACCEPT='application/json; version=v1.0')
+        self.assertEqual(response.status_code, 200)
+
+    def test_model_changes_invalidate_responses(self):
+        etag = self.client.get(self.url)['ETag']
+        Menu.objects.create(name='Extra', day=3, restaurant=self.restaurant)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 3)
+
+        etag = response['ETag']
+        MenuItem.objects.filter(name='Item 0-0').update(name='Renamed')
+        MenuItem.objects.get(name='Renamed').save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]['menuItems'][0]['name'], 'Renamed')
+
+        etag = self.client.get('/restaurants/')['ETag']
+        self.restaurant.city = 'Vilnius'
+        self.restaurant.save()
+        response = self.client.get('/restaurants/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.data['results'][0]['city'], 'Vilnius')
+
+
+class PaginationAndFieldsetTests(AuthenticatedAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        responsecache.get_backend().clear()
+
+    def test_employees_are_paginated_by_cursor(self):
+        Employee.objects.bulk_create(
+            [Employee(username=f'user{index:03}', email=f'{index}@example.com',
+                      first_name='First', last_name='Last')
+             for index in range(25)])
+        usernames = []
+        url = '/employee/?page_size=10'
+        while url:
+            response = self.client.get(url)
+            self.assertLessEqual(len(response.data['results']), 10)
+            usernames.extend(row['username'] for row in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(
+            usernames, [f'user{index:03}' for index in reversed(range(25))])
+
+    def test_sparse_fieldset_narrows_select(self):
+        Employee.objects.create(
+            username='user', email='user@example.com', first_name='First',
+            last_name='Last')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/employee/?fields=id,email')
+        self.assertEqual(dict(response.data['results'][0]),
+                         {'id': response.data['results'][0]['id'],
+                          'email': 'user@example.com'})
+        self.assertNotIn('first_name', queries.captured_queries[0]['sql'])
+
+    def test_votes_expand(self):
+        restaurant = Restaurant.objects.create(
+            restaurantName='Grill', address='Akropolis', city='Klaipėda')
+        day = timezone.now().weekday() + 1
+        menu = Menu.objects.create(name='Menu', day=day, restaurant=restaurant)
+        Vote.objects.create(count=1, day=day, menu=menu)
+
+        response = self.client.get('/restaurants/votes/current/')
+        self.assertEqual(response.data[0]['menu']['name'], 'Menu')
+        with self.assertNumQueries(1):
+            response = self.client.get('/restaurants/votes/current/?expand=')
+        self.assertEqual(response.data[0]['menu'], menu.id)
+
+
+class CachedTokenAuthenticationTests(APITestCase):
+
+    def setUp(self):
+        responsecache.get_backend().clear()
+        authentication.get_backend().clear()
+        self.user = User.objects.create_user(
+            email='tester@example.com', username='tester', password='Secret-123')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_token_lookup_is_cached(self):
+        self.assertEqual(self.client.get('/restaurants/').status_code, 200)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/restaurants/').status_code, 200)
+
+    def test_logout_revokes_cached_token(self):
+        self.client.get('/restaurants/')
+        self.assertEqual(self.client.post('/auth/logout/').status_code, 200)
+        self.assertEqual(self.client.get('/restaurants/').status_code, 401)
+
+    def test_login_rotates_cached_token(self):
+        self.client.get('/restaurants/')
+        response = self.client.post(
+            '/auth/login/',
+            {'email': 'tester@example.com', 'password': 'Secret-123'})
+        self.assertEqual(self.client.get('/restaurants/').status_code, 401)
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Token {response.data["auth_token"]}')
+        self.assertEqual(self.client.get('/restaurants/').status_code, 200)
+
+    def test_deactivated_user_is_rejected(self):
+        self.client.get('/restaurants/')
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/restaurants/').status_code, 401)
+
+    def test_deactivation_is_seen_after_generation_eviction(self):
+        self.client.get('/restaurants/')
+        authentication.get_backend().delete(f'quickstart:token-user:{self.user.pk}')
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/restaurants/').status_code, 401)
+
+
+class AsyncViewTests(APITestCase):
+
+    def setUp(self):
+        responsecache.get_backend().clear()
+        authentication.get_backend().clear()
+        self.user = User.objects.create_user(
+            email='tester@example.com', username='tester', password='x')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.factory = AsyncRequestFactory()
+        self.headers = {'authorization': f'Token {self.token.key}'}
+        self.restaurant = Restaurant.objects.create(
+            restaurantName='Grill', address='Akropolis', city='Klaipėda')
+        self.menus = seed_menus(self.restaurant, 7)
+        self.today = self.menus[timezone.now().weekday()]
+
+    async def test_vote_versions(self):
+        request = self.factory.post(
+            f'/restaurants/{self.restaurant.id}/vote/',
+            {'menuName': self.menus[6].name, 'day': 7, 'votes': 4},
+            content_type='application/json',
+            accept='application/json; version=v1.0', **self.headers)
+        response = await async_views.vote(request, pk=self.restaurant.id)
+        self.assertEqual(response.status_code, 200)
+
+        request = self.factory.post(
+            f'/restaurants/{self.restaurant.id}/vote/',
+            {'data': [{'menuName': menu.name, 'day': menu.day, 'votes': 1}
+                      for menu in self.menus[:3]]},
+            content_type='application/json', **self.headers)
+        response = await async_views.vote(request, pk=self.restaurant.id)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(json.loads(response.content)['data']), 3)
+        self.assertEqual(await Vote.objects.acount(), 4)
+
+    async def test_requires_token(self):
+        request = self.factory.get('/restaurants/votes/current/')
+        response = await async_views.current_day_votes(request)
+        self.assertEqual(response.status_code, 401)
+
+    def test_other_requests_fall_back_to_the_viewset(self):
+        Vote.objects.create(count=3, day=self.today.day, menu=self.today)
+        url = f'/restaurants/{self.restaurant.id}/vote/'
+        response = async_to_sync(async_views.vote)(self.factory.post(
+            url, 'menuName=Menu&day=1&votes=2',
+            content_type='application/x-www-form-urlencoded',
+            accept='application/json; version=v1.0', **self.headers),
+            pk=self.restaurant.id)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(json.loads(response.content),
+                         {'error': 'Menu with provided name and day have not been found'})
+
+        url = f'/restaurants/{self.restaurant.id}/menus/current/'
+        request = self.factory.get(url, accept='text/html')
+        request.user, request.resolver_match = self.user, resolve(url)
+        response = async_to_sync(async_views.menus_current_day)(
+            request, pk=self.restaurant.id)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('text/html', response['Content-Type'])
+
+        response = async_to_sync(async_views.current_day_votes)(self.factory.get(
+            '/restaurants/votes/current/', accept='application/x-ndjson', **self.headers))
+        self.assertTrue(response.streaming)
+        self.assertEqual(
+            [json.loads(line)['count'] for line in b''.join(response.streaming_content).splitlines()],
+            [3])
+
+    def test_matches_sync_responses(self):
+        Vote.objects.create(count=3, day=self.today.day, menu=self.today)
+        for url, view, kwargs in (
+                ('/restaurants/votes/current/', async_views.current_day_votes, {}),
+                (f'/restaurants/{self.restaurant.id}/menus/current/',
+                 async_views.menus_current_day, {'pk': self.restaurant.id})):
+            expected = self.client.get(url, HTTP_ACCEPT='application/json')
+            response = async_to_sync(view)(
+                self.factory.get(url, accept='application/json', **self.headers),
+                **kwargs)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.content, expected.content)
+
+
+class VoteStreamTests(APITestCase):
+
+    def setUp(self):
+        authentication.get_backend().clear()
+        self.user = User.objects.create_user(
+            email='tester@example.com', username='tester', password='x')
+        self.token = Token.objects.create(user=self.user)
+        restaurant = Restaurant.objects.create(
+            restaurantName='Grill', address='Akropolis', city='Klaipėda')
+        self.menu = seed_menus(restaurant, 1, items_per_menu=0)[0]
+        Vote.objects.create(count=2, day=1, menu=self.menu)
+
+    def write_vote(self, count):
+        with self.captureOnCommitCallbacks(execute=True):
+            upsert_votes([(self.menu.id, 1, count)], increment=True)
+
+    async def stream(self, query_string, until):
+        sent = []
+        disconnect = asyncio.Event()
+
+        async def receive():
+            await disconnect.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            sent.append(message)
+
+        task = asyncio.ensure_future(events.stream_application(
+            {'type': 'http', 'path': events.STREAM_PATH, 'headers': [],
+             'query_string': query_string.encode()}, receive, send))
+        await until(sent)
+        disconnect.set()
+        await asyncio.wait_for(task, 1)
+        return sent
+
+    async def test_snapshot_then_deltas(self):
+        async def until(sent):
+            while len(sent) < 2:
+                await asyncio.sleep(0.01)
+            await sync_to_async(self.write_vote)(3)
+            while len(sent) < 3:
+                await asyncio.sleep(0.01)
+
+        sent = await self.stream(f'token={self.token.key}&day=1', until)
+        self.assertEqual(sent[0]['status'], 200)
+        self.assertEqual(
+            sent[1]['body'],
+            b'event: snapshot\ndata: {"day": 1, "tallies": {"%d": 2}}\n\n' % self.menu.id)
+        self.assertEqual(
+            json.loads(sent[2]['body'].decode().split('data: ')[1]),
+            {'day': 1, 'menuId': self.menu.id, 'increment': 3})
+
+    async def test_rejects_unknown_token(self):
+        async def until(sent):
+            while len(sent) < 2:
+                await asyncio.sleep(0.01)
+
+        sent = await self.stream('token=unknown', until)
+        self.assertEqual(sent[0]['status'], 401)
+
+
+@override_settings(VOTE_BUFFER={'ENABLED': True})
+class VoteBufferTests(AuthenticatedAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.restaurant = Restaurant.objects.create(
+            restaurantName='Grill', address='Akropolis', city='Klaipėda')
+        self.menus = seed_menus(self.restaurant, 2, items_per_menu=0)
+        self.journal = os.path.join(tempfile.mkdtemp(), 'votes.journal')
+        votebuffer._buffer = votebuffer.VoteBuffer(
+            journal=self.journal, autostart=False)
+
+    def tearDown(self):
+        votebuffer._buffer.close()
+        votebuffer._buffer = None
+
+    def vote(self, menu, votes, **extra):
+        return self.client.post(
+            f'/restaurants/{self.restaurant.id}/vote/',
+            {'menuName': menu.name, 'day': menu.day, 'votes': votes, **extra},
+            format='json', HTTP_ACCEPT='application/json; version=v1.0')
+
+    def test_votes_are_coalesced_until_flush(self):
+        self.assertEqual(self.vote(self.menus[0], 5).status_code, 202)
+        self.vote(self.menus[0], 2, increment=True)
+        self.vote(self.menus[1], 1, increment=True)
+        self.vote(self.menus[1], 1, increment=True)
+        self.assertFalse(Vote.objects.exists())
+        self.assertEqual(votebuffer.get_buffer().pending(), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(votebuffer.get_buffer().flush(), 2)
+        self.assertEqual(
+            list(Vote.objects.order_by('menu_id').values_list('count', flat=True)),
+            [7, 2])
+        self.assertEqual(votebuffer.get_buffer().stats['flushes'], 1)
+
+    def test_journal_is_replayed_on_start(self):
+        self.vote(self.menus[0], 3, increment=True)
+        self.vote(self.menus[0], 4, increment=True)
+        votebuffer.get_buffer().close()
+        votebuffer._buffer = votebuffer.VoteBuffer(journal=self.journal, autostart=False)
+        self.assertFalse(Vote.objects.exists())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(votebuffer.get_buffer().flush(), 1)
+        self.assertEqual(Vote.objects.get(menu=self.menus[0]).count, 7)
+        self.assertEqual(glob.glob(f'{self.journal}.*.flushing'), [])
+
+    def test_buffer_starts_with_the_app(self):
+        votebuffer.get_buffer().close()
+        votebuffer._buffer = None
+        with override_settings(VOTE_BUFFER={'ENABLED': True}), \
+                mock.patch.object(votebuffer, 'VoteBuffer') as buffer_class:
+            apps.get_app_config('quickstart').ready()
+        self.assertIs(votebuffer._buffer, buffer_class.return_value)
+
+    def test_segments_are_replayed_in_numeric_order(self):
+        for segment, count in ((10, 9), (2, 5)):
+            with open(f'{self.journal}.1.{segment}.flushing', 'w', encoding='utf-8') as journal:
+                journal.write(json.dumps({
+                    'votes': [[self.menus[0].id, self.menus[0].day, count]],
+                    'increment': False}) + '\n')
+        votebuffer.get_buffer().close()
+        votebuffer._buffer = votebuffer.VoteBuffer(journal=self.journal, autostart=False)
+        with self.captureOnCommitCallbacks(execute=True):
+            votebuffer.get_buffer().flush()
+        self.assertEqual(Vote.objects.get(menu=self.menus[0]).count, 9)
+
+    def test_live_journals_are_left_to_their_process(self):
+        self.vote(self.menus[0], 3, increment=True)
+        with self.assertRaises(RuntimeError):
+            votebuffer.VoteBuffer(journal=self.journal, autostart=False)
+        with open(f'{self.journal}.1', 'w', encoding='utf-8') as journal:
+            journal.write(json.dumps({
+                'votes': [[self.menus[1].id, self.menus[1].day, 2]],
+                'increment': True}) + '\n')
+        owner = votebuffer.lock(f'{self.journal}.1.lock')
+        votebuffer.get_buffer().close()
+
+        buffer = votebuffer.VoteBuffer(journal=self.journal, autostart=False)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(buffer.flush(), 1)
+        buffer.close()
+        self.assertEqual(Vote.objects.get().count, 3)
+        self.assertTrue(os.path.exists(f'{self.journal}.1'))
+
+        owner.close()
+        buffer = votebuffer.VoteBuffer(journal=self.journal, autostart=False)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(buffer.flush(), 1)
+        buffer.close()
+        self.assertEqual(Vote.objects.get(menu=self.menus[1]).count, 2)
+        self.assertEqual(glob.glob(f'{self.journal}.1*'), [])
+
+    def test_failed_flush_is_retried(self):
+        buffer = votebuffer.get_buffer()
+        write = buffer.write
+        self.vote(self.menus[0], 3, increment=True)
+        with mock.patch.object(buffer, 'write', side_effect=OperationalError(
+                'database is locked')), self.assertRaises(OperationalError):
+            buffer.flush()
+        self.assertEqual(buffer.pending(), 1)
+        self.vote(self.menus[0], 4, increment=True)
+        with mock.patch.object(buffer, 'write', side_effect=write), \
+                self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(buffer.flush(), 1)
+        self.assertEqual(Vote.objects.get(menu=self.menus[0]).count, 7)
+        self.assertEqual(buffer.stats['failed_flushes'], 1)
+        self.assertEqual(glob.glob(f'{self.journal}.*.flushing'), [])
+
+    def test_flush_thread_survives_errors(self):
+        buffer = votebuffer.VoteBuffer(flush_interval_ms=1, autostart=False)
+        with mock.patch.object(buffer, 'flush', side_effect=[
+                OperationalError('database is locked'), KeyboardInterrupt]) as flush, \
+                mock.patch.object(votebuffer, 'close_old_connections'), \
+                self.assertLogs('exercise.quickstart.votebuffer', 'ERROR'), \
+                self.assertRaises(KeyboardInterrupt):
+            buffer._run()  # pylint: disable=protected-access
+        self.assertEqual(flush.call_count, 2)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Reads SQLite query plans')
+class IndexUsageTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        for index in range(20):
+            restaurant = Restaurant.objects.create(
+                restaurantName=f'Restaurant {index}', address='Akropolis',
+                city=f'City {index % 5}')
+            for menu in seed_menus(restaurant, 7, items_per_menu=2):
+                Vote.objects.create(count=index, day=menu.day, menu=menu)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def assertSearches(self, queryset, columns):  # pylint: disable=invalid-name
+        plan = queryset.explain()
+        self.assertNotRegex(plan, r'SCAN quickstart_', plan)
+        self.assertIn(f'({columns})', plan)
+
+    def test_hot_queries_use_indexes(self):
+        menu = Menu.objects.first()
+        self.assertSearches(
+            Menu.objects.filter(restaurant_id=menu.restaurant_id),
+            'restaurant_id=?')
+        self.assertSearches(
+            Menu.objects.filter(restaurant_id=menu.restaurant_id, day=menu.day),
+            'restaurant_id=? AND day=?')
+        self.assertSearches(
+            menu_lookup(menu.restaurant_id, [(menu.name, menu.day), ('Missing', 2)]),
+            'restaurant_id=? AND day=? AND name=?')
+        self.assertSearches(
+            Vote.objects.filter(week=current_week(), day=menu.day), 'week=? AND day=?')
+        self.assertSearches(
+            Vote.objects.filter(week=current_week(), menu_id=menu.id, day=menu.day),
+            'week=? AND day=? AND menu_id=?')
+        ranking = Vote.objects.filter(week=current_week(), day=menu.day).order_by(
+            '-count', 'menu_id')[:10]
+        self.assertSearches(ranking, 'week=? AND day=?')
+        self.assertNotIn('TEMP B-TREE', ranking.explain())
+        self.assertSearches(
+            MenuItem.objects.filter(name='Item 0-0', price=10, currency='EUR'),
+            'name=? AND price=? AND currency=?')
+        self.assertSearches(
+            MenuItem.objects.filter(name__in=['Item 0-0', 'Item 1-1']), 'name=?')
+        self.assertSearches(
+            RefMenu.objects.filter(menuID__in=[menu.id]), 'menuID_id=?')
+
+    def test_list_filters_use_indexes(self):
+        self.assertSearches(
+            Restaurant.objects.filter(city='City 0').order_by('id'), 'city=?')
+        self.assertSearches(
+            MenuItem.objects.filter(currency='EUR', price__gte=5).order_by('price', 'id'),
+            'currency=? AND price>?')
+        self.assertSearches(
+            MenuItem.objects.filter(price__gte=5, price__lte=20).order_by('price', 'id'),
+            'price>? AND price<?')
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Applies SQLite pragmas')
+class DatabaseProfileTests(TestCase):
+
+    def test_sqlite_pragmas_are_applied_to_new_connections(self):
+        wrapper = DatabaseWrapper({
+            **connection.settings_dict,
+            'NAME': os.path.join(tempfile.mkdtemp(), 'profile.sqlite3'),
+            'PRAGMAS': {'journal_mode': 'WAL', 'busy_timeout': 5000,
+                        'synchronous': 'NORMAL'},
+        })
+        try:
+            with wrapper.cursor() as cursor:
+                self.assertEqual(
+                    cursor.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+                self.assertEqual(
+                    cursor.execute('PRAGMA busy_timeout').fetchone()[0], 5000)
+                self.assertEqual(
+                    cursor.execute('PRAGMA synchronous').fetchone()[0], 1)
+        finally:
+            wrapper.close()
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(AuthenticatedAPITestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Registered after the class setup, so the replica connection is a
+        # plain SQLite file outside the test transaction.
+        connections.settings['replica'] = {
+            **connections['default'].settings_dict,
+            'NAME': os.path.join(tempfile.mkdtemp(), 'replica.sqlite3'),
+        }
+        call_command('migrate', database='replica', verbosity=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        connections['replica'].close()
+        del connections['replica']
+        del connections.settings['replica']
+        super().tearDownClass()
+
+    def setUp(self):
+        super().setUp()
+        responsecache.get_backend().clear()
+        cache.clear()
+        self.restaurant = Restaurant.objects.create(
+            restaurantName='Primary', address='Akropolis', city='Klaipėda')
+        self.menu = seed_menus(self.restaurant, 1, items_per_menu=0)[0]
+        Restaurant.objects.using('replica').create(
+            restaurantName='Replica', address='Akropolis', city='Klaipėda')
+
+    def tearDown(self):
+        Restaurant.objects.using('replica').all().delete()
+
+    def restaurant_names(self):
+        response = self.client.get('/restaurants/')
+        return [item['restaurantName'] for item in response.data['results']]
+
+    def test_reads_go_to_replica_until_client_writes(self):
+        self.assertEqual(self.restaurant_names(), ['Replica'])
+        response = self.client.post(
+            f'/restaurants/{self.restaurant.id}/vote/',
+            {'menuName': self.menu.name, 'day': self.menu.day, 'votes': 1},
+            format='json', HTTP_ACCEPT='application/json; version=v1.0')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.restaurant_names(), ['Primary'])
+
+        responsecache.get_backend().clear()
+        response = self.client.get('/restaurants/', REMOTE_ADDR='10.0.0.2')
+        self.assertEqual(
+            [item['restaurantName'] for item in response.data['results']],
+            ['Replica'])
+
+    def test_login_pins_the_token_requests_that_follow(self):
+        self.client.force_authenticate(None)
+        response = self.client.post(
+            '/auth/login/', {'email': 'tester@example.com', 'password': 'x'},
+            format='json', REMOTE_ADDR='10.0.0.4')
+        self.assertEqual(response.status_code, 200)
+
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {response.data['auth_token']}")
+        response = self.client.get('/restaurants/', REMOTE_ADDR='10.0.0.5')
+        self.assertEqual(
+            [item['restaurantName'] for item in response.data['results']],
+            ['Primary'])
+
+    @override_settings(
+        CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+                'pins': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                         'LOCATION': 'pins'}},
+        REPLICA_PIN_CACHE='pins')
+    def test_pins_are_kept_in_the_configured_cache(self):
+        request = APIRequestFactory().post('/', REMOTE_ADDR='10.0.0.3')
+        replicas.pin(request)
+        self.assertTrue(replicas.is_pinned(request))
+        self.assertTrue(caches['pins'].get(replicas.client_key(request)))
+        self.assertIsNone(cache.get(replicas.client_key(request)))
+        caches['pins'].clear()
+
+
+@override_settings(METRICS={'SAMPLE_RATE': 1.0, 'SLOW_REQUEST_MS': 0})
+class InstrumentationTests(APITestCase):
+
+    def setUp(self):
+        metrics.registry.clear()
+        responsecache.get_backend().clear()
+        self.admin = User.objects.create_superuser(
+            email='admin@example.com', username='admin', password='x')
+        self.client.force_authenticate(self.admin)
+        self.restaurant = Restaurant.objects.create(
+            restaurantName='Grill', address='Akropolis', city='Klaipėda')
+        seed_menus(self.restaurant, 2)
+
+    def test_actions_are_recorded_per_version(self):
+        with self.assertLogs('exercise.quickstart.metrics', 'WARNING') as logs:
+            self.client.get(
+                f'/restaurants/{self.restaurant.id}/menus/',
+                HTTP_ACCEPT='application/json; version=v2.0')
+        self.assertIn('RestaurantViewSet.menus', logs.output[0])
+        self.assertIn('quickstart_refmenu', logs.output[0])
+
+        text = self.client.get('/metrics/').content.decode()
+        labels = 'view="RestaurantViewSet.menus",version="v2.0"'
+        self.assertIn(f'quickstart_request_duration_seconds_count{{{labels}}} 1', text)
+        self.assertIn(f'quickstart_db_queries_sum{{{labels}}} 2', text)
+        self.assertIn(f'quickstart_serialization_duration_seconds_count{{{labels}}} 1', text)
+        self.assertIn(f'quickstart_response_size_bytes_count{{{labels}}} 1', text)
+
+    def test_async_requests_stay_async(self):
+        async def restaurants(request):
+            middleware.process_view(request, restaurants, (), {})
+            await sync_to_async(list)(Restaurant.objects.all())
+            return HttpResponse(b'ok')
+
+        middleware = metrics.InstrumentationMiddleware(restaurants)
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+        with self.assertLogs('exercise.quickstart.metrics', 'WARNING'):
+            response = async_to_sync(middleware)(AsyncRequestFactory().get('/'))
+        self.assertEqual(response.content, b'ok')
+        labels = f'view="{__name__}.restaurants",version=""'
+        self.assertIn(f'quickstart_db_queries_sum{{{labels}}} 1',
+                      metrics.registry.exposition())
+
+    def test_metrics_require_admin(self):
+        self.client.force_authenticate(User.objects.create_user(
+            email='tester@example.com', username='tester', password='x'))
+        self.assertEqual(self.client.get('/metrics/').status_code, 403)
+
+    @override_settings(METRICS={'SAMPLE_RATE': 0})
+    def test_disabled_sampling_removes_middleware(self):
+        self.client.get('/restaurants/')
+        self.assertNotIn('quickstart_request_duration_seconds_count{',
+                         metrics.registry.exposition())
+
+
+class ReadSerializerTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        for index in range(3):
+            restaurant = Restaurant.objects.create(
+                restaurantName=f'Restaurant "{index}"', address='Akropolis',
+                city='Klaipėda')
+            for menu in seed_menus(restaurant, 7, items_per_menu=index):
+                Vote.objects.create(count=index, day=menu.day, menu=menu)
+        MenuItem.objects.update(price='10.50')
+
+    def assertSameJson(self, expected, actual):  # pylint: disable=invalid-name
+        renderer = JSONRenderer()
+        self.assertEqual(renderer.render(actual), renderer.render(expected))
+
+    def test_menus_match_menu_serializer(self):
+        queryset = Menu.objects.all()
+        with self.assertNumQueries(2):
+            data = serialize_menus(queryset)
+        self.assertSameJson(
+            MenuSerializer(load_menus(queryset), many=True).data, data)
+        self.assertEqual(serialize_menus(Menu.objects.none()), [])
+
+    def test_votes_match_vote_serializer(self):
+        for query in ({}, {'expand': ''}):
+            request = APIRequestFactory().get('/restaurants/votes/current/', query)
+            queryset = Vote.objects.filter(day=1)
+            expected = VoteSerializer(
+                load_votes(queryset), many=True, context={'request': request}).data
+            self.assertSameJson(expected, serialize_votes(queryset, request))
+            self.assertSameJson(
+                expected, async_to_sync(aserialize_votes)(queryset, request))
+
+
+class RendererTests(AuthenticatedAPITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        restaurant = Restaurant.objects.create(
+            restaurantName='Grill', address='Akropolis', city='Klaipėda')
+        seed_menus(restaurant, 7, items_per_menu=10)
+        MenuItem.objects.update(price='10.50')
+        cls.restaurant = restaurant
+
+    def test_render_matches_json_renderer(self):
+        utc = datetime.datetime(2022, 11, 21, 12, 30, 15, 120, tzinfo=datetime.timezone.utc)
+        payloads = [
+            MenuSerializer(Menu.objects.all(), many=True).data,
+            {'price': Decimal('10.50'), 'big': 2 ** 70, 1: 'integer key'},
+            {'utc': utc, 'naive': utc.replace(tzinfo=None),
+             'offset': utc.astimezone(datetime.timezone(datetime.timedelta(hours=2))),
+             'date': utc.date(), 'time': utc.time(), 'id': uuid.uuid4()},
+            {'text': 'Klaipėda \u2028 \u2029 "quoted" </script>',
+             'lazy': gettext_lazy('Not found.')},
+            [], 0.1, 'string', True,
+        ]
+        for data in payloads:
+            self.assertEqual(
+                FastJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+        self.assertEqual(
+            FastJSONRenderer().render({'a': 1}, 'application/json; indent=2'),
+            JSONRenderer().render({'a': 1}, 'application/json; indent=2'))
+        self.assertEqual(
+            b''.join(iter_json_array(payloads[0])), JSONRenderer().render(payloads[0]))
+
+    def test_parse_matches_json_parser(self):
+        content = '{"menuName": "Pietūs", "day": 1, "votes": [1.5, null, true]}'.encode()
+        self.assertEqual(
+            FastJSONParser().parse(BytesIO(content)),
+            JSONParser().parse(BytesIO(content)))
+        with self.assertRaises(ParseError):
+            FastJSONParser().parse(BytesIO(b'{"day": '))
+
+    def test_responses_are_compressed_as_accepted(self):
+        url = f'/restaurants/{self.restaurant.id}/menus/'
+        plain = self.client.get(url)
+        self.assertNotIn('Content-Encoding', plain)
+        self.assertIn('Accept-Encoding', plain['Vary'])
+
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='br;q=1.0, gzip;q=0.8')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip;q=0, identity')
+        self.assertNotIn('Content-Encoding', response)
+
+    def test_negotiation_prefers_brotli_when_installed(self):
+        self.assertEqual(compression.negotiate('gzip, deflate'), 'gzip')
+        self.assertIsNone(compression.negotiate('deflate, gzip;q=0'))
+        with mock.patch.object(compression, 'brotli', object()):
+            self.assertEqual(compression.negotiate('gzip, br'), 'br')
+            self.assertEqual(compression.negotiate('gzip, br;q=0.5'), 'gzip')
+            self.assertEqual(compression.negotiate('*'), 'br')
+            self.assertEqual(compression.negotiate('br', streaming=True), None)
+
+
+@override_settings(STREAMING={'CHUNK_SIZE': 3})
+class StreamingTests(AuthenticatedAPITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.restaurant = Restaurant.objects.create(
+            restaurantName='Grill', address='Akropolis', city='Klaipėda')
+        day = timezone.now().weekday() + 1
+        for index in range(4):
+            restaurant = Restaurant.objects.create(
+                restaurantName=f'Restaurant {index}', address='Akropolis',
+                city='Klaipėda')
+            menu = seed_menus(restaurant, 7)[day - 1]
+            Vote.objects.create(count=index, day=day, menu=menu)
+        seed_menus(cls.restaurant, 7)
+
+    def setUp(self):
+        super().setUp()
+        responsecache.get_backend().clear()
+
+    def test_menus_stream_as_ndjson(self):
+        url = f'/restaurants/{self.restaurant.id}/menus/'
+        expected = self.client.get(url).json()
+        response = self.client.get(url, HTTP_ACCEPT='application/x-ndjson')
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        # One query for the menus, one per chunk of three for their items.
+        with self.assertNumQueries(4):
+            lines = b''.join(response.streaming_content).splitlines()
+        self.assertEqual([json.loads(line) for line in lines], expected)
+
+    def test_votes_stream_as_json_array(self):
+        for query in ('', '&expand='):
+            expected = self.client.get(f'/restaurants/votes/current/?{query}').json()
+            response = self.client.get(f'/restaurants/votes/current/?stream=true{query}')
+            self.assertTrue(response.streaming)
+            self.assertEqual(
+                json.loads(b''.join(response.streaming_content)), expected)
+
+    def test_lists_stream_unpaginated_and_uncached(self):
+        response = self.client.get('/restaurants/?stream=true&page_size=2')
+        self.assertNotIn('ETag', response)
+        rows = json.loads(b''.join(response.streaming_content))
+        self.assertEqual([row['id'] for row in rows],
+                         list(Restaurant.objects.order_by('id').values_list('id', flat=True)))
+
+        Employee.objects.bulk_create(
+            [Employee(username=f'user{index}', email=f'{index}@example.com')
+             for index in range(5)])
+        response = self.client.get(
+            '/employee/?fields=username', HTTP_ACCEPT='application/x-ndjson')
+        lines = b''.join(response.streaming_content).splitlines()
+        self.assertEqual(json.loads(lines[0]), {'username': 'user4'})
+        self.assertEqual(len(lines), 5)
+
+
+@override_settings(VOTE_LEDGER={'ENABLED': True})
+class BallotLedgerTests(AuthenticatedAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.restaurant = Restaurant.objects.create(
+            restaurantName='Grill', address='Akropolis', city='Klaipėda')
+        self.menus = [Menu.objects.create(name=f'Menu {index}', day=1,
+                                          restaurant=self.restaurant)
+                      for index in range(3)]
+
+    def ballot(self, *ranked):
+        entries = [{'menuName': menu.name, 'day': menu.day, 'votes': votes,
+                    'increment': True} for menu, votes in ranked]
+        return self.client.post(
+            f'/restaurants/{self.restaurant.id}/vote/', {'data': entries},
+            format='json', HTTP_ACCEPT='application/json; version=v2.0')
+
+    def test_one_ballot_per_employee_and_day(self):
+        response = self.ballot((self.menus[0], 1), (self.menus[1], 5), (self.menus[2], 2))
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(Ballot.objects.get().menus,
+                         [self.menus[1].id, self.menus[2].id, self.menus[0].id])
+        self.assertFalse(Vote.objects.exists())
+
+        response = self.ballot((self.menus[0], 1))
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['days'], [1])
+        self.assertEqual(Ballot.objects.count(), 1)
+
+        self.client.force_authenticate(User.objects.create_user(
+            email='other@example.com', username='other', password='x'))
+        response = self.client.post(
+            f'/restaurants/{self.restaurant.id}/vote/',
+            {'menuName': 'Menu 0', 'day': 1, 'votes': 1},
+            format='json', HTTP_ACCEPT='application/json; version=v1.0')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(Ballot.objects.count(), 2)
+
+    def test_compaction_folds_weighted_ballots_into_tallies(self):
+        week = current_week()
+        last_week = week - datetime.timedelta(weeks=1)
+        Ballot.objects.bulk_create([
+            Ballot(user=self.user, week=last_week, day=1,
+                   menus=[menu.id for menu in self.menus]),
+            Ballot(user=self.user, week=week, day=1, menus=[self.menus[2].id, 0])])
+
+        def tallies():
+            return {(week, menu_id): count for week, menu_id, count
+                    in Vote.objects.values_list('week', 'menu_id', 'count')}
+
+        expected = {(last_week, self.menus[0].id): 3, (last_week, self.menus[1].id): 2,
+                    (last_week, self.menus[2].id): 1, (week, self.menus[2].id): 3}
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(ballots.compact_ballots(batch_size=1), 2)
+        self.assertEqual(tallies(), expected)
+        self.assertEqual(ballots.compact_ballots(), 0)
+        self.assertFalse(Ballot.objects.filter(compacted=False).exists())
+
+        Vote.objects.update(count=100)
+        out = StringIO()
+        call_command('compactballots', '--rebuild', stdout=out)
+        self.assertIn('Rebuilt 4 tallies', out.getvalue())
+        self.assertEqual(tallies(), expected)
+
+
+class WeeklyVoteTests(AuthenticatedAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        restaurant = Restaurant.objects.create(
+            restaurantName='Grill', address='Akropolis', city='Klaipėda')
+        self.menus = seed_menus(restaurant, 7, items_per_menu=0)
+        self.week = current_week()
+        cache.clear()
+
+    def test_current_day_reads_only_the_current_week(self):
+        day = timezone.now().weekday() + 1
+        menu = self.menus[day - 1]
+        upsert_votes([(menu.id, day, 5)], week=self.week - datetime.timedelta(weeks=1))
+        upsert_votes([(menu.id, day, 2)], increment=True)
+        upsert_votes([(menu.id, day, 1)], increment=True)
+
+        response = self.client.get('/restaurants/votes/current/')
+        self.assertEqual([vote['count'] for vote in response.data], [3])
+        response = self.client.get('/restaurants/leaderboard/', {'day': day})
+        self.assertEqual(response.data[0]['count'], 3)
+
+    def test_old_weeks_are_archived_into_weekly_summaries(self):
+        weeks = [self.week - datetime.timedelta(weeks=offset) for offset in range(4)]
+        for week in weeks:
+            upsert_votes([(menu.id, menu.day, 2) for menu in self.menus[:2]], week=week)
+        WeeklyVoteSummary.objects.create(week=weeks[3], menu=self.menus[0], count=10)
+
+        out = StringIO()
+        call_command('archivevotes', stdout=out)
+        self.assertIn('Archived 2 weeks', out.getvalue())
+        self.assertEqual(set(Vote.objects.values_list('week', flat=True)), set(weeks[:2]))
+        self.assertEqual(
+            set(WeeklyVoteSummary.objects.values_list('week', 'menu_id', 'count')),
+            {(weeks[2], self.menus[0].id, 2), (weeks[2], self.menus[1].id, 2),
+             (weeks[3], self.menus[0].id, 12), (weeks[3], self.menus[1].id, 2)})
+        self.assertEqual(archive.archive_votes(), {})
+
+
+class AnalyticsTests(AuthenticatedAPITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        first, second = [Restaurant.objects.create(
+            restaurantName=name, address='Akropolis', city='Klaipėda')
+            for name in ('Grill', 'Pizza')]
+        cls.restaurants = (first, second)
+        (first_monday, _), (second_monday, second_tuesday) = [
+            seed_menus(restaurant, 2, items_per_menu=1) for restaurant in cls.restaurants]
+        cls.weeks = [current_week() - datetime.timedelta(weeks=offset) for offset in range(3)]
+        upsert_votes([(first_monday.id, 1, 1), (second_monday.id, 1, 4),
+                      (second_tuesday.id, 2, 2)], week=cls.weeks[0])
+        upsert_votes([(first_monday.id, 1, 5), (second_monday.id, 1, 3)], week=cls.weeks[1])
+        WeeklyVoteSummary.objects.bulk_create([
+            WeeklyVoteSummary(week=cls.weeks[2], menu=first_monday, count=7),
+            WeeklyVoteSummary(week=cls.weeks[2], menu=second_monday, count=2)])
+
+    def setUp(self):
+        super().setUp()
+        responsecache.get_backend().clear()
+        analytics.get_backend().clear()
+
+    def test_restaurant_and_weekday_rollups(self):
+        first, second = (restaurant.id for restaurant in self.restaurants)
+        response = self.client.get('/restaurants/analytics/restaurants/')
+        self.assertEqual(
+            [(row['restaurantId'], row['votes'], row['wins'], row['votesByDay'][:2],
+              row['winsByDay'][:2]) for row in response.data],
+            [(first, 13, 2, [13, 0], [2, 0]), (second, 11, 2, [9, 2], [1, 1])])
+        response = self.client.get('/restaurants/analytics/restaurants/', {'weeks': 2})
+        self.assertEqual([(row['restaurantId'], row['votes'], row['wins'])
+                          for row in response.data], [(second, 9, 2), (first, 6, 1)])
+
+        response = self.client.get('/restaurants/analytics/weekdays/')
+        self.assertEqual(
+            [(row['day'], row['votes'], [(winner['restaurantName'], winner['wins'])
+                                         for winner in row['winners']])
+             for row in response.data[:3]],
+            [(1, 22, [('Grill', 2), ('Pizza', 1)]), (2, 2, [('Pizza', 1)]), (3, 0, [])])
+
+    def test_item_trends(self):
+        response = self.client.get(
+            '/restaurants/analytics/items/', {'weeks': 3, 'window': 2})
+        self.assertEqual(
+            [(row['name'], row['votes'], [week['votes'] for week in row['weeks']],
+              [week['movingAverage'] for week in row['weeks']]) for row in response.data],
+            [('Item 0-0', 22, [9, 8, 5], [9.0, 8.5, 6.5]),
+             ('Item 1-0', 2, [0, 0, 2], [0.0, 0.0, 1.0])])
+        self.assertEqual(response.data[0]['weeks'][0]['week'], self.weeks[2].isoformat())
+        response = self.client.get('/restaurants/analytics/items/', {'window': 0})
+        self.assertEqual(response.status_code, 400)
+
+    def test_vote_writes_and_archives_invalidate_rollups(self):
+        first = self.restaurants[0]
+        url = '/restaurants/analytics/restaurants/'
+        response = self.client.get(url)
+        self.assertEqual(response.data[0]['votes'], 13)
+        menu = Menu.objects.get(restaurant=first, day=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            upsert_votes([(menu.id, 1, 2)], increment=True, week=self.weeks[1])
+        response = self.client.get(url)
+        self.assertEqual(response.data[0]['votes'], 15)
+
+        scope = responsecache.generation('analytics')
+        with self.captureOnCommitCallbacks() as callbacks:
+            Vote.objects.filter(menu=menu, week=self.weeks[1]).get().delete()
+        self.assertEqual(responsecache.generation('analytics'), scope)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(responsecache.generation('analytics'), scope)
+
+        scope = responsecache.generation('analytics')
+        with self.captureOnCommitCallbacks(execute=True):
+            archive.archive_votes(active_weeks=1)
+        self.assertNotEqual(responsecache.generation('analytics'), scope)
+
+    def test_current_week_votes_keep_cached_history(self):
+        menu = Menu.objects.get(restaurant=self.restaurants[0], day=1)
+        self.client.get('/restaurants/analytics/restaurants/')
+        self.client.get('/restaurants/analytics/items/')
+        with self.captureOnCommitCallbacks(execute=True):
+            upsert_votes([(menu.id, 1, 10)], increment=True)
+        with mock.patch.object(analytics, 'load_votes', wraps=analytics.load_votes) as load:
+            response = self.client.get('/restaurants/analytics/restaurants/')
+            self.assertEqual(response.data[0]['votes'], 23)
+            response = self.client.get('/restaurants/analytics/items/')
+            self.assertEqual(response.data[0]['votes'], 32)
+        self.assertEqual([call.args for call in load.call_args_list],
+                         [(current_week(), None)] * 2)
+
+    @skipUnless(analytics.np is not None, 'Compares the NumPy and list group-bys')
+    def test_numpy_and_list_rollups_agree(self):
+        results = [analytics.restaurant_rollup(), analytics.weekday_rollup(),
+                   analytics.item_trends(weeks=5, window=3)]
+        analytics.get_backend().clear()
+        with mock.patch.object(analytics, 'np', None):
+            self.assertEqual([analytics.restaurant_rollup(), analytics.weekday_rollup(),
+                              analytics.item_trends(weeks=5, window=3)], results)
+
+
+class SearchTests(AuthenticatedAPITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.grill = Restaurant.objects.create(
+            restaurantName='Grill', address='Akropolis', city='Klaipėda')
+        cls.salad_bar = Restaurant.objects.create(
+            restaurantName='Salad Bar', address='Akropolis', city='Vilnius')
+        cls.lunch = Menu.objects.create(name='Lunch', day=1, restaurant=cls.grill)
+        cls.greens = Menu.objects.create(name='Greens', day=1, restaurant=cls.salad_bar)
+        for menu, name in ((cls.lunch, 'Caesar salad'), (cls.lunch, 'Steak'),
+                           (cls.greens, 'Salade niçoise')):
+            RefMenu.objects.create(menuID=menu, menuItemID=MenuItem.objects.create(
+                name=name, price=10, currency='EUR'))
+
+    def setUp(self):
+        super().setUp()
+        search.invalidate()
+
+    def ids(self, query):
+        response = self.client.get('/restaurants/search/', {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return ([menu['menuId'] for menu in response.data['menus']],
+                [restaurant['restaurantId'] for restaurant in response.data['restaurants']])
+
+    def test_prefix_terms_rank_menus_and_restaurants(self):
+        for backend in ('auto', 'trie'):
+            with self.subTest(backend=backend), override_settings(SEARCH={'BACKEND': backend}):
+                self.assertEqual(self.ids('sal'), (
+                    [self.lunch.id, self.greens.id], [self.salad_bar.id, self.grill.id]))
+                self.assertEqual(self.ids('SALAD caes'), ([self.lunch.id], [self.grill.id]))
+                self.assertEqual(self.ids('nicoise'), ([self.greens.id], [self.salad_bar.id]))
+                self.assertEqual(self.ids('pizza'), ([], []))
+                self.assertEqual(self.ids('alad'), ([], []))
+
+    def test_trigram_terms_match_word_prefixes(self):
+        sql, params = search.trigram_hits(['alad'], 5, connection.ops.quote_name)
+        self.assertNotIn('LIKE', sql)
+        self.assertEqual(params[:2], ['alad', r'\malad'])
+
+    def test_index_follows_writes(self):
+        for backend in ('auto', 'trie'):
+            with self.subTest(backend=backend), override_settings(SEARCH={'BACKEND': backend}):
+                MenuItem.objects.filter(name='Steak').update(name='Burger')
+                search.invalidate()
+                self.assertEqual(self.ids('steak'), ([], []))
+                MenuItem.objects.filter(name='Burger').update(name='Steak')
+                self.client.post(f'/restaurants/{self.salad_bar.id}/menu/', {
+                    'menuName': 'Dinner', 'day': 2,
+                    'menuItems': [{'name': 'Tofu bowl', 'price': '9.50', 'currency': 'EUR'}]},
+                    format='json')
+                menu_ids, restaurant_ids = self.ids('tofu')
+                self.assertEqual((Menu.objects.get(id=menu_ids[0]).name, restaurant_ids),
+                                 ('Dinner', [self.salad_bar.id]))
+                Menu.objects.filter(name='Dinner').delete()
+
+    @skipUnless(connection.vendor == 'sqlite', 'Checks the SQLite FTS5 index')
+    def test_search_is_one_query(self):
+        search.search('salad')
+        with self.assertNumQueries(1):
+            results = search.search('salad', limit=1)
+        self.assertEqual([menu['menuName'] for menu in results['menus']], ['Lunch'])
+        self.assertEqual(
+            self.client.get('/restaurants/search/', {'q': ''}).status_code, 400)
+
+
+class FilterTests(AuthenticatedAPITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.restaurants = [Restaurant.objects.create(
+            restaurantName=name, address='Akropolis', city=city)
+            for name, city in (('Grill', 'Vilnius'), ('Bistro', 'Kaunas'),
+                               ('Anchor', 'Vilnius'))]
+
+    def setUp(self):
+        super().setUp()
+        responsecache.get_backend().clear()
+
+    def post_menu(self, restaurant, day, prices, currency='EUR'):
+        response = self.client.post(f'/restaurants/{restaurant.id}/menu/', {
+            'menuName': f'Menu {day}', 'day': day,
+            'menuItems': [{'name': f'Item {price}', 'price': price, 'currency': currency}
+                          for price in prices]}, format='json')
+        self.assertEqual(response.status_code, 201)
+
+    def test_restaurants_by_city_and_ordering(self):
+        grill, bistro, anchor = self.restaurants
+        response = self.client.get('/restaurants/', {'city': 'Vilnius'})
+        self.assertEqual([row['id'] for row in response.data['results']],
+                         [grill.id, anchor.id])
+        response = self.client.get('/restaurants/', {'ordering': '-restaurantName'})
+        self.assertEqual([row['id'] for row in response.data['results']],
+                         [grill.id, bistro.id, anchor.id])
+        response = self.client.get(
+            '/restaurants/', {'ordering': 'restaurantName', 'page_size': 1})
+        response = self.client.get(response.data['next'])
+        self.assertEqual([row['id'] for row in response.data['results']], [bistro.id])
+        response = self.client.get('/restaurants/', {'ordering': 'address'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_pages_seek_past_ordering_ties(self):
+        grill, bistro, anchor = self.restaurants
+        Restaurant.objects.bulk_create([Restaurant(
+            restaurantName=f'Cafe {index}', address='Akropolis', city='Kaunas')
+            for index in range(3)])
+        cafes = list(Restaurant.objects.filter(restaurantName__startswith='Cafe'))
+        ids, previous = [], []
+        url = '/restaurants/?ordering=city&page_size=2'
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertFalse([query for query in queries.captured_queries
+                              if 'OFFSET' in query['sql']])
+            ids.extend(row['id'] for row in response.data['results'])
+            previous.append(response.data['previous'])
+            url = response.data['next']
+        self.assertEqual(
+            ids, [bistro.id, *(cafe.id for cafe in cafes), grill.id, anchor.id])
+        response = self.client.get(previous[-1])
+        self.assertEqual([row['id'] for row in response.data['results']],
+                         [cafes[1].id, cafes[2].id])
+        response = self.client.get('/restaurants/', {'cursor': 'cD1ub3Rqc29u'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_menus_by_day_and_price(self):
+        grill = self.restaurants[0]
+        self.post_menu(grill, 1, ['5.00', '7.00'])
+        self.post_menu(grill, 2, ['7.00', '12.00'])
+        self.post_menu(grill, 2, ['4.00'])
+        response = self.client.get(f'/restaurants/{grill.id}/menus/')
+        self.assertEqual(
+            [(menu['day'], menu['minPrice'], menu['maxPrice'], menu['avgPrice'])
+             for menu in response.data],
+            [(1, '5.00', '7.00', '6.00'), (2, '4.00', '12.00', '7.67')])
+        response = self.client.get(f'/restaurants/{grill.id}/menus/', {'day': 2})
+        self.assertEqual([menu['day'] for menu in response.data], [2])
+        response = self.client.get(f'/restaurants/{grill.id}/menus/', {'max_price': '8'})
+        self.assertEqual([menu['day'] for menu in response.data], [1])
+        response = self.client.get(f'/restaurants/{grill.id}/menus/', {'day': 8})
+        self.assertEqual(response.status_code, 400)
+
+    def test_item_changes_refresh_menu_prices(self):
+        grill = self.restaurants[0]
+        self.post_menu(grill, 1, ['5.00', '7.00'])
+        item = MenuItem.objects.get(name='Item 7.00')
+        item.price = '9.00'
+        item.save()
+        menu = Menu.objects.get(restaurant=grill, day=1)
+        self.assertEqual((menu.min_price, menu.max_price, menu.avg_price),
+                         (Decimal('5.00'), Decimal('9.00'), Decimal('7.00')))
+
+        with CaptureQueriesContext(connection) as queries:
+            menu.delete()
+        self.assertFalse([query for query in queries.captured_queries
+                          if query['sql'].startswith('UPDATE')])
+
+    def test_menu_items_by_price_and_currency(self):
+        self.post_menu(self.restaurants[0], 1, ['5.00', '9.00', '15.00'])
+        self.post_menu(self.restaurants[1], 1, ['8.00'], currency='USD')
+        response = self.client.get(
+            '/restaurants/items/', {'min_price': '6', 'max_price': '20'})
+        self.assertEqual([(row['price'], row['currency']) for row in response.data['results']],
+                         [('8.00', 'USD'), ('9.00', 'EUR'), ('15.00', 'EUR')])
+        response = self.client.get(
+            '/restaurants/items/', {'currency': 'EUR', 'ordering': '-price'})
+        self.assertEqual([row['price'] for row in response.data['results']],
+                         ['15.00', '9.00', '5.00'])
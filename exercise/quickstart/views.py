@@ -7,12 +7,27 @@ from django.utils import timezone
 from django.shortcuts import get_object_or_404
 from django.contrib.auth import get_user_model, logout
 from exercise.quickstart.serializers import EmployeeSerializer, MenuSerializer, \
-    MenuRequestSerializer, RestaurantSerializer, EmptySerializer, \
+    MenuBulkRequestSerializer, MenuRequestSerializer, RestaurantSerializer, EmptySerializer, \
     UserLoginSerializer, UserRegisterSerializer, AuthUserSerializer, \
     PasswordChangeSerializer, UserSerializer, VoteSerializer, VotingManyRequestSerializer, \
-    VotingSingleRequestSerializer
-from exercise.quickstart.models import Employee, MenuItem, RefMenu, Restaurant, Menu, Vote
+    VotingSingleRequestSerializer, LeaderboardRequestSerializer, AnalyticsRequestSerializer, \
+    SearchRequestSerializer, RestaurantFilterSerializer, MenuFilterSerializer, \
+    MenuItemFilterSerializer, MenuItemSerializer
+from exercise.quickstart.models import Employee, Restaurant, Menu, MenuItem, Vote, current_week
+from .analytics import item_trends, restaurant_rollup, weekday_rollup, weeks_since
+from .authentication import CachedTokenAuthentication
+from .ballots import DuplicateBallot
+from .fieldsets import SparseQuerysetMixin
+from .filters import SerializerFilterBackend, filter_lookups
+from .leaderboard import ranked_menus
+from .menus import chunked, ingest_menus
+from .readserializers import iter_menus, iter_votes, serialize_menus, serialize_votes
+from .responsecache import cached_response
+from .search import search as search_names
+from .streaming import StreamingListMixin, chunk_size, stream_format, streaming_response
 from .utils import get_and_authenticate_user, create_user_account
+from .votebuffer import get_buffer
+from .votes import ballot_results, resolve_menu_ids, write_ballot
 
 
 User = get_user_model()
@@ -35,6 +50,8 @@ class AuthViewSet(viewsets.GenericViewSet):
 
         if hasattr(user, 'auth_token'):
             user.auth_token.delete()
+        # Pins the user's replica reads, which the new token then carries.
+        request.user = user
         data = AuthUserSerializer(user).data
         return Response(data=data, status=status.HTTP_200_OK)
 
@@ -43,6 +60,7 @@ class AuthViewSet(viewsets.GenericViewSet):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         user = create_user_account(**serializer.validated_data)
+        request.user = user
         data = AuthUserSerializer(user).data
         return Response(data=data, status=status.HTTP_201_CREATED)
 
@@ -74,40 +92,50 @@ class AuthViewSet(viewsets.GenericViewSet):
         return super().get_serializer_class()
 
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(SparseQuerysetMixin, viewsets.ModelViewSet):
     """
     API endpoint that allows users to be viewed or edited.
     """
     queryset = User.objects.all().order_by('-date_joined')
+    cursor_ordering = ('-date_joined', '-id')
     serializer_class = UserSerializer
     authentication_classes = [
-        authentication.TokenAuthentication,
+        CachedTokenAuthentication,
         authentication.SessionAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
 
-class EmployeeViewSet(viewsets.ModelViewSet):
+class EmployeeViewSet(StreamingListMixin, SparseQuerysetMixin, viewsets.ModelViewSet):
     """
     API endpoint that allows employees to be viewed or edited.
     """
     queryset = Employee.objects.all().order_by('-username')
+    cursor_ordering = ('-username', '-id')
     serializer_class = EmployeeSerializer
     authentication_classes = [
-        authentication.TokenAuthentication,
+        CachedTokenAuthentication,
         authentication.SessionAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def retrieve(self, request, pk=None):  # pylint: disable=arguments-differ
-        item = get_object_or_404(self.queryset, pk=pk)
-        serializer = EmployeeSerializer(item)
+        item = get_object_or_404(self.get_queryset(), pk=pk)
+        serializer = self.get_serializer(item)
         return Response(serializer.data)
 
 
-class RestaurantViewSet(viewsets.ModelViewSet):
+class RestaurantViewSet(StreamingListMixin, SparseQuerysetMixin, viewsets.ModelViewSet):
     """
     API endpoint that allows restaurants to be viewed or edited.
     """
     queryset = Restaurant.objects.all()
+    cursor_ordering = ('id',)
+    ordering_fields = {
+        'id': ('id',),
+        'restaurantName': ('restaurantName', 'id'),
+        'city': ('city', 'id'),
+    }
+    filter_backends = [SerializerFilterBackend]
+    filter_serializer_class = RestaurantFilterSerializer
     serializer_class = RestaurantSerializer
     serializer_classes = {
         'vote': {
@@ -116,7 +144,7 @@ class RestaurantViewSet(viewsets.ModelViewSet):
         },
     }
     authentication_classes = [
-        authentication.TokenAuthentication,
+        CachedTokenAuthentication,
         authentication.SessionAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
@@ -142,35 +170,48 @@ class RestaurantViewSet(viewsets.ModelViewSet):
         if not existing_vote_serializer.is_valid():
             return Response(status=status.HTTP_400_BAD_REQUEST)
 
-        menu = Menu.objects.filter(
+        menu_id = Menu.objects.filter(
             restaurant_id=pk,
             name=existing_vote_serializer.data['menuName'],
-            day=existing_vote_serializer.data['day'])
-        if menu.__len__() > 0:
-            obj_menu = Menu.objects.get(
-                restaurant_id=pk,
-                name=existing_vote_serializer.data['menuName'],
-                day=existing_vote_serializer.data['day'])
-            vote_object = Vote.objects.filter(
-                menu_id=obj_menu.id, day=existing_vote_serializer.data['day'])
-            if vote_object.__len__() > 0:
-                obj_vote = Vote.objects.get(
-                    menu_id=obj_menu.id, day=existing_vote_serializer.data['day'])
-                obj_vote.count = existing_vote_serializer.data['votes']
-                obj_vote.save()
-            else:
-                Vote.objects.create(
-                    count=existing_vote_serializer.data['votes'],
-                    day=existing_vote_serializer.data['day'],
-                    menu_id=obj_menu.id
-                )
-        else:
+            day=existing_vote_serializer.data['day']).values_list(
+                'id', flat=True).first()
+        if menu_id is None:
             return Response(
                 status=status.HTTP_400_BAD_REQUEST, data={
                     'error': 'Menu with provided name and day have not been found'})
 
+        vote = existing_vote_serializer.data
+        try:
+            buffered = write_ballot(
+                [vote], {(vote['menuName'], vote['day']): menu_id},
+                user=self.request.user)
+        except DuplicateBallot as error:
+            return Response(
+                status=status.HTTP_409_CONFLICT, data={
+                    'error': 'A ballot has already been cast for this day',
+                    'days': error.days})
+
+        return Response(
+            status=status.HTTP_202_ACCEPTED if buffered else status.HTTP_200_OK)
+
+    def vote_many(self, entries, pk=None):  # pylint: disable=invalid-name
+        menu_ids = resolve_menu_ids(
+            pk, [(item['menuName'], item['day']) for item in entries])
+        results = ballot_results(entries, menu_ids)
+        if any(result['status'] != 'ok' for result in results):
+            return Response(
+                status=status.HTTP_400_BAD_REQUEST, data={'data': results})
+
+        try:
+            buffered = write_ballot(entries, menu_ids, user=self.request.user)
+        except DuplicateBallot as error:
+            return Response(
+                status=status.HTTP_409_CONFLICT, data={
+                    'error': 'A ballot has already been cast for this day',
+                    'days': error.days})
         return Response(
-            status=status.HTTP_200_OK)
+            status=status.HTTP_202_ACCEPTED if buffered else status.HTTP_200_OK,
+            data={'data': results})
 
     @action(methods=['POST', ], detail=True,
             permission_classes=[permissions.IsAuthenticated, ])
@@ -180,17 +221,13 @@ class RestaurantViewSet(viewsets.ModelViewSet):
                 data=request.data)
             if not existing_vote_serializer.is_valid():
                 return Response(status=status.HTTP_400_BAD_REQUEST)
-            if (existing_vote_serializer.data.__len__() >
-                    3 or existing_vote_serializer.data.__len__() < 1):
+            entries = existing_vote_serializer.data['data']
+            if entries.__len__() > 3 or entries.__len__() < 1:
                 return Response(
                     status=status.HTTP_400_BAD_REQUEST, data={
                         'error': 'Only top three menu items are accepted for voting'})
 
-            for item in existing_vote_serializer.data['data']:
-                response = self.vote_singular(item, pk)
-                if request.data is not None:
-                    break
-            return response
+            return self.vote_many(entries, pk)
         elif request.version == 'v1.0':
             return self.vote_singular(request.data, pk)
         else:
@@ -203,12 +240,11 @@ class RestaurantViewSet(viewsets.ModelViewSet):
             permission_classes=[permissions.IsAuthenticated,
                                 ],
             serializer_class=MenuSerializer)
+    @cached_response('menus_current', scopes=['restaurant:{pk}', 'menus'],
+                     current_day=True)
     def menus_current_day(self, request, pk=None):  # pylint: disable=unused-argument disable=invalid-name
         day = timezone.now().weekday() + 1
-        menu = Menu.objects.filter(restaurant_id=pk, day=day)
-        data = []
-        if menu.__len__() > 0:
-            data = MenuSerializer(menu, many=True).data
+        data = serialize_menus(Menu.objects.filter(restaurant_id=pk, day=day))
         return Response(data=data, status=status.HTTP_200_OK,)
 
     @action(methods=['GET',
@@ -220,10 +256,111 @@ class RestaurantViewSet(viewsets.ModelViewSet):
             serializer_class=VoteSerializer)
     def current_day_votes(self, request):  # pylint: disable=unused-argument
         day = timezone.now().weekday() + 1
-        vote_object = Vote.objects.filter(day=day)
-        data = []
-        if vote_object.__len__() > 0:
-            data = VoteSerializer(vote_object, many=True).data
+        votes = Vote.objects.filter(week=current_week(), day=day)
+        format_name = stream_format(request)
+        if format_name is not None:
+            return streaming_response(
+                iter_votes(votes.order_by('id'), request, chunk_size()), format_name)
+        data = serialize_votes(votes, request)
+        return Response(data=data, status=status.HTTP_200_OK,)
+
+    @action(methods=['GET',
+                     ],
+            detail=False,
+            permission_classes=[permissions.IsAuthenticated,
+                                ],
+            serializer_class=LeaderboardRequestSerializer)
+    def leaderboard(self, request):
+        serializer = LeaderboardRequestSerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(
+                status=status.HTTP_400_BAD_REQUEST, data=serializer.errors)
+        day = serializer.validated_data.get(
+            'day', timezone.now().weekday() + 1)
+        data = ranked_menus(
+            day, limit=serializer.validated_data['limit'])
+        return Response(data=data, status=status.HTTP_200_OK,)
+
+    @action(methods=['GET',
+                     ],
+            detail=False,
+            permission_classes=[permissions.IsAuthenticated,
+                                ],
+            serializer_class=SearchRequestSerializer)
+    def search(self, request):
+        serializer = SearchRequestSerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(
+                status=status.HTTP_400_BAD_REQUEST, data=serializer.errors)
+        data = search_names(
+            serializer.validated_data['q'], limit=serializer.validated_data['limit'])
+        return Response(data=data, status=status.HTTP_200_OK,)
+
+    @action(methods=['GET',
+                     ],
+            url_path='analytics/restaurants',
+            detail=False,
+            permission_classes=[permissions.IsAuthenticated,
+                                ],
+            serializer_class=AnalyticsRequestSerializer)
+    @cached_response('analytics_restaurants', scopes=['analytics'], current_day=True)
+    def analytics_restaurants(self, request):
+        serializer = AnalyticsRequestSerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(
+                status=status.HTTP_400_BAD_REQUEST, data=serializer.errors)
+        data = restaurant_rollup(weeks_since(serializer.validated_data.get('weeks')))
+        return Response(data=data, status=status.HTTP_200_OK,)
+
+    @action(methods=['GET',
+                     ],
+            url_path='analytics/weekdays',
+            detail=False,
+            permission_classes=[permissions.IsAuthenticated,
+                                ],
+            serializer_class=AnalyticsRequestSerializer)
+    @cached_response('analytics_weekdays', scopes=['analytics'], current_day=True)
+    def analytics_weekdays(self, request):
+        serializer = AnalyticsRequestSerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(
+                status=status.HTTP_400_BAD_REQUEST, data=serializer.errors)
+        data = weekday_rollup(
+            weeks_since(serializer.validated_data.get('weeks')),
+            limit=serializer.validated_data['limit'])
+        return Response(data=data, status=status.HTTP_200_OK,)
+
+    @action(methods=['GET',
+                     ],
+            url_path='analytics/items',
+            detail=False,
+            permission_classes=[permissions.IsAuthenticated,
+                                ],
+            serializer_class=AnalyticsRequestSerializer)
+    @cached_response('analytics_items', scopes=['analytics'], current_day=True)
+    def analytics_items(self, request):
+        serializer = AnalyticsRequestSerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(
+                status=status.HTTP_400_BAD_REQUEST, data=serializer.errors)
+        data = item_trends(
+            weeks=serializer.validated_data.get('weeks', 13),
+            window=serializer.validated_data['window'],
+            limit=serializer.validated_data['limit'])
+        return Response(data=data, status=status.HTTP_200_OK,)
+
+    @action(methods=['GET',
+                     ],
+            url_path='votes/buffer',
+            detail=False,
+            permission_classes=[permissions.IsAdminUser,
+                                ],
+            serializer_class=EmptySerializer)
+    def vote_buffer(self, request):  # pylint: disable=unused-argument
+        buffer = get_buffer()
+        if buffer is None:
+            return Response(data={'enabled': False}, status=status.HTTP_200_OK,)
+        data = {'enabled': True, 'pending': buffer.pending(), **buffer.stats}
         return Response(data=data, status=status.HTTP_200_OK,)
 
     @action(methods=['GET',
@@ -232,13 +369,31 @@ class RestaurantViewSet(viewsets.ModelViewSet):
             permission_classes=[permissions.IsAuthenticated,
                                 ],
             serializer_class=MenuSerializer)
+    @cached_response('menus', scopes=['restaurant:{pk}', 'menus'])
     def menus(self, request, pk=None):  # pylint: disable=unused-argument disable=invalid-name
-        menu = Menu.objects.filter(restaurant_id=pk)
-        data = []
-        if menu.__len__() > 0:
-            data = MenuSerializer(menu, many=True).data
+        menus = Menu.objects.filter(
+            restaurant_id=pk, **filter_lookups(MenuFilterSerializer, request))
+        format_name = stream_format(request)
+        if format_name is not None:
+            return streaming_response(iter_menus(
+                menus.order_by('id'), chunk_size()), format_name)
+        data = serialize_menus(menus)
         return Response(data=data, status=status.HTTP_200_OK,)
 
+    @action(methods=['GET',
+                     ],
+            url_path='items',
+            detail=False,
+            permission_classes=[permissions.IsAuthenticated,
+                                ],
+            serializer_class=MenuItemSerializer,
+            cursor_ordering=('price', 'id'),
+            ordering_fields={'id': ('id',), 'price': ('price', 'id')})
+    def menu_items(self, request):
+        items = MenuItem.objects.filter(**filter_lookups(MenuItemFilterSerializer, request))
+        page = self.paginate_queryset(items)
+        return self.get_paginated_response(MenuItemSerializer(page, many=True).data)
+
     @action(methods=['POST',
                      ],
             detail=True,
@@ -246,49 +401,61 @@ class RestaurantViewSet(viewsets.ModelViewSet):
                                 ],
             serializer_class=MenuRequestSerializer)
     def menu(self, request, pk=None):  # pylint: disable=invalid-name
-        data = request.data
+        serializer = MenuRequestSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(
+                status=status.HTTP_400_BAD_REQUEST, data=serializer.errors)
+        entry = serializer.validated_data
 
-        if (data['day'] < 1 or data['day'] > 7):
+        if (entry['day'] < 1 or entry['day'] > 7):
             return Response(
                 status=status.HTTP_400_BAD_REQUEST, data={
                     'error': 'Days are from 1 to 7 (from Monday to Sunday)'})
 
-        existing_menu = Menu.objects.filter(
-            day=data['day'], restaurant_id=pk)
-        if existing_menu.__len__() > 0:
-            obj_menu = Menu.objects.get(day=data['day'], restaurant_id=pk)
-            obj_menu.name = data['menuName']
-            obj_menu.save()
-        else:
-            obj_menu = Menu.objects.create(
-                name=data['menuName'],
-                day=data['day'],
-                restaurant_id=pk
-            )
-
-        for item in data['menuItems']:
-            existing_menu_item = MenuItem.objects.filter(
-                name=item['name'], price=item['price'], currency=item['currency'])
-            if existing_menu_item.__len__() == 0:
-                obj_menu_item = MenuItem.objects.create(
-                    name=item['name'],
-                    price=item['price'],
-                    currency=item['currency']
-                )
-            else:
-                obj_menu_item = MenuItem.objects.get(
-                    name=item['name'], price=item['price'], currency=item['currency'])
-            existing_ref_menu = RefMenu.objects.filter(
-                menuID=obj_menu.id, menuItemID=obj_menu_item.id)
-            if existing_ref_menu.__len__() == 0:
-                RefMenu.objects.create(
-                    menuID=obj_menu,
-                    menuItemID=obj_menu_item,
-                )
-
+        ingest_menus([{**entry, 'restaurant': int(pk)}])
         return Response(status=status.HTTP_201_CREATED)
 
+    @action(methods=['POST',
+                     ],
+            url_path='menus/bulk',
+            detail=False,
+            permission_classes=[permissions.IsAuthenticated,
+                                ],
+            serializer_class=MenuBulkRequestSerializer)
+    def menus_bulk(self, request):
+        serializer = MenuBulkRequestSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(
+                status=status.HTTP_400_BAD_REQUEST, data=serializer.errors)
+        entries = serializer.validated_data['data']
+
+        if any(entry['day'] < 1 or entry['day'] > 7 for entry in entries):
+            return Response(
+                status=status.HTTP_400_BAD_REQUEST, data={
+                    'error': 'Days are from 1 to 7 (from Monday to Sunday)'})
+        restaurant_ids = {entry['restaurant'] for entry in entries}
+        existing_ids = set()
+        for chunk in chunked(restaurant_ids):
+            existing_ids.update(Restaurant.objects.filter(
+                id__in=chunk).values_list('id', flat=True))
+        if restaurant_ids != existing_ids:
+            return Response(
+                status=status.HTTP_400_BAD_REQUEST, data={
+                    'error': 'Restaurants have not been found',
+                    'restaurants': sorted(restaurant_ids - existing_ids)})
+
+        menus, item_ids = ingest_menus(entries)
+        return Response(
+            status=status.HTTP_201_CREATED, data={
+                'menus': menus.__len__(),
+                'menuItems': item_ids.__len__()})
+
+    @cached_response('list', scopes=['restaurants'])
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @cached_response('retrieve', scopes=['restaurant:{pk}'])
     def retrieve(self, request, pk=None):  # pylint: disable=arguments-differ
-        item = get_object_or_404(self.queryset, pk=pk)
-        serializer = RestaurantSerializer(item)
+        item = get_object_or_404(self.get_queryset(), pk=pk)
+        serializer = self.get_serializer(item)
         return Response(serializer.data)
@@ -0,0 +1,292 @@
+"""
+Write-behind buffer for vote writes.
+
+Accepted votes are coalesced in memory per `(menu_id, day)` and written
+with one bulk upsert every `FLUSH_INTERVAL_MS` or once `MAX_ENTRIES` keys
+are pending. With a `JOURNAL` path every accepted ballot is appended to
+`JOURNAL.<pid>` first, while the process holds a lock on
+`JOURNAL.<pid>.lock`. When the buffer starts, with the app, it claims the
+journals whose lock is free, left by processes that exited without
+flushing them, and queues their votes for its first flush. A journal is
+deleted only after its flush commits, so increments of a flush
+interrupted between commit and deletion can be applied twice on replay.
+A failed flush puts its votes back in the buffer and keeps its journals,
+and the flush thread retries on its next tick.
+"""
+import glob
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+DEFAULT_SETTINGS = {
+    'ENABLED': False,
+    'FLUSH_INTERVAL_MS': 200,
+    'MAX_ENTRIES': 500,
+    'JOURNAL': None,
+    'FSYNC': False,
+}
+
+JOURNAL_FILE = re.compile(r'\.(\d+)(?:\.(\d+)\.flushing)?')
+
+logger = logging.getLogger(__name__)
+
+
+def journal_files(path):
+    """
+    Returns `{pid: [(segment, name), ...]}` of the journals at `path`:
+    each process's flushing segments in the order they were written, then
+    its live journal as segment infinity.
+    """
+    files = {}
+    for name in glob.glob(f'{glob.escape(path)}.*'):
+        match = JOURNAL_FILE.fullmatch(name[len(path):])
+        if match:
+            segment = int(match[2]) if match[2] else math.inf
+            files.setdefault(int(match[1]), []).append((segment, name))
+    return {pid: sorted(names) for pid, names in sorted(files.items())}
+
+
+def lock(path):
+    """
+    Opens `path` with an exclusive lock on it, or returns None when another
+    open file holds the lock.
+    """
+    handle = open(path, 'a', encoding='utf-8')  # pylint: disable=consider-using-with
+    if fcntl is not None:
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            handle.close()
+            return None
+    return handle
+
+
+class VoteBuffer:
+
+    def __init__(self, flush_interval_ms=200, max_entries=500, journal=None,
+                 fsync=False, autostart=True):
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_entries = max_entries
+        self.journal_path = journal
+        self.journal_file = journal and f'{journal}.{os.getpid()}'
+        self.fsync = fsync
+        self._pending = {}
+        self._oldest = None
+        self._segment = 0
+        self._unflushed = []
+        self._claimed = []
+        self._owner = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._journal = None
+        self.stats = {
+            'accepted': 0,
+            'flushes': 0,
+            'failed_flushes': 0,
+            'flushed_votes': 0,
+            'last_flush_lag_ms': 0.0,
+            'max_flush_lag_ms': 0.0,
+        }
+        if journal:
+            self._owner = lock(f'{self.journal_file}.lock')
+            if self._owner is None:
+                raise RuntimeError(f'The vote journal {self.journal_file} is in use')
+            self.replay()
+            self._journal = open(self.journal_file, 'a', encoding='utf-8')  # pylint: disable=consider-using-with
+        if autostart:
+            threading.Thread(
+                target=self._run, name='vote-buffer', daemon=True).start()
+
+    def pending(self):
+        with self._lock:
+            return len(self._pending)
+
+    def add(self, votes, increment=False):
+        """
+        Accepts `(menu_id, day, count)` votes for a later flush.
+        """
+        votes = list(votes)
+        with self._lock:
+            if self._journal is not None:
+                self._journal.write(json.dumps(
+                    {'votes': votes, 'increment': increment}) + '\n')
+                self._journal.flush()
+                if self.fsync:
+                    os.fsync(self._journal.fileno())
+            self.merge(self._pending, votes, increment)
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            self.stats['accepted'] += len(votes)
+            full = len(self._pending) >= self.max_entries
+        if full:
+            self._wake.set()
+
+    @staticmethod
+    def merge(pending, votes, increment):
+        for menu_id, day, count in votes:
+            key = (menu_id, day)
+            if increment and key in pending:
+                mode, current = pending[key]
+                pending[key] = (mode, current + count)
+            else:
+                pending[key] = ('increment' if increment else 'set', count)
+
+    def flush(self):
+        """
+        Writes every pending vote in one transaction and returns the number
+        of keys written.
+        """
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                oldest, self._oldest = self._oldest, None
+                segment = self._rotate_journal()
+            if pending:
+                try:
+                    self.write(pending)
+                except Exception:
+                    self._restore(pending, oldest, segment)
+                    raise
+                lag = (time.monotonic() - oldest) * 1000
+                self.stats['flushes'] += 1
+                self.stats['flushed_votes'] += len(pending)
+                self.stats['last_flush_lag_ms'] = lag
+                self.stats['max_flush_lag_ms'] = max(
+                    self.stats['max_flush_lag_ms'], lag)
+            for done in [*self._unflushed, *filter(None, [segment])]:
+                os.remove(done)
+            self._unflushed = []
+            for owner in self._claimed:
+                os.remove(owner.name)
+                owner.close()
+            self._claimed = []
+            return len(pending)
+
+    def _restore(self, pending, oldest, segment):
+        """
+        Puts the votes of a failed flush back under the votes accepted since,
+        which apply on top of them.
+        """
+        with self._lock:
+            newer, self._pending = self._pending, pending
+            for (menu_id, day), (mode, count) in newer.items():
+                self.merge(self._pending, [(menu_id, day, count)], mode == 'increment')
+            if self._oldest is None or oldest < self._oldest:
+                self._oldest = oldest
+            self.stats['failed_flushes'] += 1
+        if segment is not None:
+            self._unflushed.append(segment)
+
+    @staticmethod
+    def write(pending):
+        from .votes import upsert_votes  # pylint: disable=import-outside-toplevel
+
+        with transaction.atomic():
+            for mode in ('set', 'increment'):
+                upsert_votes(
+                    [(menu_id, day, count)
+                     for (menu_id, day), (key_mode, count) in pending.items()
+                     if key_mode == mode],
+                    increment=mode == 'increment')
+
+    def _rotate_journal(self):
+        if self._journal is None:
+            return None
+        self._journal.close()
+        segment = self._next_segment()
+        os.replace(self.journal_file, segment)
+        self._journal = open(self.journal_file, 'a', encoding='utf-8')  # pylint: disable=consider-using-with
+        return segment
+
+    def _next_segment(self):
+        self._segment += 1
+        return f'{self.journal_file}.{self._segment}.flushing'
+
+    def replay(self):
+        """
+        Claims the journals of processes that exited without flushing them
+        and queues their votes. The next flush writes them and deletes the
+        journals.
+        """
+        for pid, names in journal_files(self.journal_path).items():
+            if pid != os.getpid():
+                owner = lock(f'{self.journal_path}.{pid}.lock')
+                if owner is None:
+                    continue
+                self._claimed.append(owner)
+            for segment, name in names:
+                if name == self.journal_file:
+                    # Left by an earlier process with the same id.
+                    name = self._next_segment()
+                    os.replace(self.journal_file, name)
+                elif pid == os.getpid():
+                    self._segment = segment
+                with open(name, encoding='utf-8') as journal:
+                    for line in journal:
+                        if not line.endswith('\n'):
+                            break
+                        entry = json.loads(line)
+                        self.merge(self._pending, entry['votes'], entry['increment'])
+                self._unflushed.append(name)
+        if self._pending:
+            self._oldest = time.monotonic()
+
+    def close(self):
+        """
+        Closes the journal and releases the locks without flushing, as a
+        process exit does.
+        """
+        with self._lock:
+            for handle in [self._journal, self._owner, *self._claimed]:
+                if handle is not None:
+                    handle.close()
+            self._journal, self._owner, self._claimed = None, None, []
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:  # pylint: disable=broad-except
+                logger.exception('Vote buffer flush failed; retrying on the next tick')
+            finally:
+                close_old_connections()
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def buffer_settings():
+    return {**DEFAULT_SETTINGS, **getattr(settings, 'VOTE_BUFFER', {})}
+
+
+def get_buffer():
+    """
+    Returns the process-wide buffer, or None when buffering is disabled.
+    """
+    global _buffer  # pylint: disable=global-statement
+    options = buffer_settings()
+    if not options['ENABLED']:
+        return None
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = VoteBuffer(
+                flush_interval_ms=options['FLUSH_INTERVAL_MS'],
+                max_entries=options['MAX_ENTRIES'],
+                journal=options['JOURNAL'],
+                fsync=options['FSYNC'])
+    return _buffer
@@ -0,0 +1,142 @@
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from exercise.quickstart.models import Menu, Vote, current_week
+from . import analytics, ballots, events, leaderboard, votebuffer
+
+
+def menu_lookup(restaurant_id, pairs):
+    lookup = Q()
+    for name, day in pairs:
+        lookup |= Q(name=name, day=day)
+    if not lookup:
+        return Menu.objects.none()
+    return Menu.objects.filter(
+        lookup, restaurant_id=restaurant_id).values_list('id', 'name', 'day')
+
+
+def resolve_menu_ids(restaurant_id, pairs):
+    """
+    Maps `(menu name, day)` pairs of a restaurant to menu ids with one query.
+    Pairs without a menu are left out of the result.
+    """
+    return {
+        (name, day): menu_id
+        for menu_id, name, day in menu_lookup(restaurant_id, pairs)}
+
+
+async def aresolve_menu_ids(restaurant_id, pairs):
+    return {
+        (name, day): menu_id
+        async for menu_id, name, day in menu_lookup(restaurant_id, pairs)}
+
+
+def ballot_results(entries, menu_ids):
+    """
+    Reports for each ballot entry whether its menu was resolved.
+    """
+    results = []
+    for item in entries:
+        result = {
+            'menuName': item['menuName'],
+            'day': item['day'],
+            'votes': item['votes']}
+        if (item['menuName'], item['day']) in menu_ids:
+            result['status'] = 'ok'
+        else:
+            result['status'] = 'error'
+            result['error'] = 'Menu with provided name and day have not been found'
+        results.append(result)
+    return results
+
+
+def write_ballot(entries, menu_ids, user=None):
+    """
+    Writes every entry of a resolved ballot in one transaction, or hands
+    the ballot to the write-behind buffer when it is enabled. With the
+    ballot ledger enabled, the ballot of `user` is appended to the ledger
+    instead, raising `ballots.DuplicateBallot` when a day already has one.
+    Returns whether the tallies are updated later.
+    """
+    if user is not None and ballots.ledger_enabled():
+        ballots.cast_ballots(user, entries, menu_ids)
+        return True
+    groups = {
+        increment: [(menu_ids[(item['menuName'], item['day'])],
+                     item['day'],
+                     item['votes'])
+                    for item in entries if item['increment'] == increment]
+        for increment in (False, True)}
+    buffer = votebuffer.get_buffer()
+    if buffer is not None:
+        for increment, votes in groups.items():
+            if votes:
+                buffer.add(votes, increment=increment)
+        return True
+    with transaction.atomic():
+        for increment, votes in groups.items():
+            upsert_votes(votes, increment=increment)
+    return False
+
+
+def coalesce_votes(votes, increment=False):
+    """
+    Folds repeated `(menu_id, day)` keys into one row, as an upsert may
+    touch each row only once. Increments are summed, otherwise the last
+    count wins.
+    """
+    counts = {}
+    for menu_id, day, count in votes:
+        key = (menu_id, day)
+        counts[key] = counts.get(key, 0) + count if increment else count
+    return [(menu_id, day, count) for (menu_id, day), count in counts.items()]
+
+
+def upsert_votes(votes, increment=False, week=None, publish=True):
+    """
+    Writes `(menu_id, day, count)` tuples to the `Vote` tallies of `week`
+    (the current week by default) in a single upsert. With `increment`
+    the counts are added to the stored tallies instead of overwriting
+    them. Without `publish`, as for imported tallies, the votes are not
+    streamed to vote subscribers.
+    """
+    votes = coalesce_votes(votes, increment)
+    if not votes:
+        return
+    week = week or current_week()
+    transaction.on_commit(lambda: analytics.invalidate_week(week))
+    if week == current_week():
+        # Rankings and vote streams follow the current week only.
+        transaction.on_commit(
+            lambda: leaderboard.invalidate({day for _, day, _ in votes}))
+        if publish:
+            transaction.on_commit(
+                lambda: events.publish_votes(votes, increment=increment))
+    if not increment:
+        Vote.objects.bulk_create(
+            [Vote(menu_id=menu_id, week=week, day=day, count=count)
+             for menu_id, day, count in votes],
+            update_conflicts=True,
+            unique_fields=['week', 'day', 'menu_id'],
+            update_fields=['count', 'updated'])
+        return
+
+    qn = connection.ops.quote_name
+    table = qn(Vote._meta.db_table)
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    week_value = connection.ops.adapt_datefield_value(week)
+    fields = ['count', 'week', 'day', 'menu_id', 'created', 'updated']
+    batch_size = connection.ops.bulk_batch_size(fields, votes)
+    with connection.cursor() as cursor:
+        for start in range(0, len(votes), batch_size):
+            batch = votes[start:start + batch_size]
+            params = []
+            for menu_id, day, count in batch:
+                params.extend([count, week_value, day, menu_id, now, now])
+            values = ', '.join(['(%s, %s, %s, %s, %s, %s)'] * len(batch))
+            cursor.execute(
+                f'INSERT INTO {table} ({", ".join(qn(field) for field in fields)}) '
+                f'VALUES {values} '
+                f'ON CONFLICT ({qn("week")}, {qn("day")}, {qn("menu_id")}) DO UPDATE SET '
+                f'{qn("count")} = {table}.{qn("count")} + EXCLUDED.{qn("count")}, '
+                f'{qn("updated")} = EXCLUDED.{qn("updated")}', params)
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -44,7 +45,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'exercise.quickstart.metrics.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'exercise.quickstart.compression.CompressionMiddleware',
+    'exercise.quickstart.replicas.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -76,11 +80,38 @@ WSGI_APPLICATION = 'exercise.wsgi.application'
 REST_FRAMEWORK = {
     'DEFAULT_VERSIONING_CLASS': 'rest_framework.versioning.AcceptHeaderVersioning',
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'exercise.quickstart.authentication.CachedTokenAuthentication',
     ],
     'VERSION_PARAM': 'version',
     'DEFAULT_VERSION': 'v2.0',
     'ALLOWED_VERSIONS': ['v1.0', 'v2.0'],
+    'DEFAULT_PAGINATION_CLASS': 'exercise.quickstart.pagination.KeysetPagination',
+    'PAGE_SIZE': 100,
+    'DEFAULT_RENDERER_CLASSES': [
+        'exercise.quickstart.renderers.FastJSONRenderer',
+        'exercise.quickstart.renderers.NDJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'exercise.quickstart.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+}
+
+# Responses of at least MIN_SIZE bytes are compressed with brotli (when
+# installed) or gzip, as the client accepts.
+
+RESPONSE_COMPRESSION = {
+    'MIN_SIZE': 200,
+    'BROTLI_QUALITY': 4,
+}
+
+# Lists requested with Accept: application/x-ndjson or ?stream=true are
+# streamed, reading and serializing CHUNK_SIZE rows at a time.
+
+STREAMING = {
+    'CHUNK_SIZE': int(os.environ.get('EXERCISE_STREAMING_CHUNK_SIZE', '2000')),
 }
 
 SWAGGER_SETTINGS = {
@@ -102,13 +133,73 @@ LOGOUT_URL = 'rest_framework:logout'
 # Database
 # https://docs.djangoproject.com/en/4.1/ref/settings/#databases
 
-DATABASES = {
-    'default': {
+# Database profile, selected with EXERCISE_DB_PROFILE:
+#   sqlite      default-configured db.sqlite3
+#   sqlite-wal  db.sqlite3 in WAL mode; the PRAGMAS are applied to every
+#               new connection by exercise.quickstart.signals
+#   postgresql  persistent, health-checked connections configured by the
+#               EXERCISE_DB_* variables (requires psycopg2)
+
+DATABASE_PROFILE = os.environ.get('EXERCISE_DB_PROFILE', 'sqlite')
+
+DATABASE_PROFILES = {
+    'sqlite': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    },
+    'sqlite-wal': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': 600,
+        'PRAGMAS': {
+            'journal_mode': 'WAL',
+            'busy_timeout': 5000,
+            'synchronous': 'NORMAL',
+            'mmap_size': 268435456,
+        },
+    },
+    'postgresql': {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.environ.get('EXERCISE_DB_NAME', 'exercise'),
+        'USER': os.environ.get('EXERCISE_DB_USER', 'exercise'),
+        'PASSWORD': os.environ.get('EXERCISE_DB_PASSWORD', ''),
+        'HOST': os.environ.get('EXERCISE_DB_HOST', 'localhost'),
+        'PORT': os.environ.get('EXERCISE_DB_PORT', '5432'),
+        'CONN_MAX_AGE': int(os.environ.get('EXERCISE_DB_CONN_MAX_AGE', '60')),
+        'CONN_HEALTH_CHECKS': True,
+    },
 }
 
+DATABASES = {
+    'default': DATABASE_PROFILES[DATABASE_PROFILE],
+}
+
+# Read replicas of the primary, as comma-separated EXERCISE_DB_REPLICAS:
+# SQLite file names, or PostgreSQL hosts. Reads of GET/HEAD/OPTIONS
+# requests go to a replica unless the client wrote within the last
+# REPLICA_PIN_SECONDS.
+
+for replica_index, replica in enumerate(
+        filter(None, os.environ.get('EXERCISE_DB_REPLICAS', '').split(',')), 1):
+    DATABASES[f'replica{replica_index}'] = {
+        **DATABASES['default'],
+        'HOST' if DATABASE_PROFILE == 'postgresql' else 'NAME': replica,
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+
+DATABASE_ROUTERS = ['exercise.quickstart.replicas.ReplicaRouter']
+
+REPLICA_PIN_SECONDS = 5
+
+# Cache alias holding the pins. Deployments with several processes must
+# point it at a shared cache (Redis, Memcached or the database); with the
+# default per-process LocMemCache a pinned client can still be served
+# replica reads by another process.
+
+REPLICA_PIN_CACHE = 'default'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
@@ -150,3 +241,102 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/4.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Seconds a daily vote ranking stays cached between vote writes. Votes
+# invalidate the rankings in the default cache, so other processes see
+# them at once only when that cache is shared; with a per-process cache
+# they serve their own ranking for up to this long.
+
+LEADERBOARD_CACHE_TIMEOUT = 300
+
+# Cache of read-heavy restaurant responses. Use
+# 'exercise.quickstart.responsecache.DjangoCacheBackend' with an 'alias'
+# option to share it between processes.
+
+RESPONSE_CACHE = {
+    'BACKEND': 'exercise.quickstart.responsecache.LocalLRUBackend',
+    'TIMEOUT': 60,
+    'OPTIONS': {'max_entries': 1024},
+}
+
+# Cache of authenticated tokens. Revocations reach other processes only
+# through a shared backend, otherwise after TIMEOUT seconds.
+
+TOKEN_CACHE = {
+    'BACKEND': 'exercise.quickstart.responsecache.LocalLRUBackend',
+    'TIMEOUT': 60,
+    'OPTIONS': {'max_entries': 10000},
+}
+
+# Cache of the analytics aggregates of past weeks, which only imports,
+# ballot compaction and archiving change. Those writes reach other
+# processes only through a shared backend, otherwise after TIMEOUT
+# seconds.
+
+ANALYTICS_CACHE = {
+    'BACKEND': 'exercise.quickstart.responsecache.LocalLRUBackend',
+    'TIMEOUT': 600,
+    'OPTIONS': {'max_entries': 256},
+}
+
+# Serve the vote and current-day endpoints from the async views in
+# exercise.quickstart.async_views. Enabled by default under ASGI.
+
+ASYNC_VIEWS = os.environ.get('EXERCISE_ASYNC_VIEWS') == '1'
+
+# Fan-out of vote tally deltas to the SSE stream. Replace with a pub/sub
+# backed class exposing subscribe/unsubscribe/publish to span processes.
+
+VOTE_BROADCASTER = 'exercise.quickstart.events.LocalBroadcaster'
+
+# Write-behind buffering of votes. Enabled votes are acknowledged with 202
+# and written by a background flush every FLUSH_INTERVAL_MS or once
+# MAX_ENTRIES menu/day keys are pending. Set JOURNAL to a path shared by
+# the workers to replay unflushed votes after a crash: each process
+# journals to JOURNAL.<pid> under a lock, and a starting process replays
+# the journals of exited ones.
+
+VOTE_BUFFER = {
+    'ENABLED': os.environ.get('EXERCISE_VOTE_BUFFER') == '1',
+    'FLUSH_INTERVAL_MS': 200,
+    'MAX_ENTRIES': 500,
+    'JOURNAL': os.environ.get('EXERCISE_VOTE_JOURNAL'),
+    'FSYNC': False,
+}
+
+# Ballot ledger. Enabled ballots are appended per employee and day and
+# acknowledged with 202; `manage.py compactballots` folds them into the
+# vote tallies, the n-th ranked menu scoring WEIGHTS[n].
+
+VOTE_LEDGER = {
+    'ENABLED': os.environ.get('EXERCISE_VOTE_LEDGER') == '1',
+    'WEIGHTS': (3, 2, 1),
+    'COMPACT_BATCH_SIZE': 5000,
+}
+
+# Vote tallies are kept per ISO week. `manage.py archivevotes` folds weeks
+# before the last ACTIVE_WEEKS into weekly summaries.
+
+VOTE_ARCHIVE = {
+    'ACTIVE_WEEKS': 2,
+}
+
+# Name search. BACKEND 'auto' uses the database's index (SQLite FTS5 or
+# PostgreSQL trigrams) and an in-process prefix trie, rebuilt every
+# TRIE_TIMEOUT seconds, elsewhere; 'trie' forces the latter.
+
+SEARCH = {
+    'BACKEND': os.environ.get('EXERCISE_SEARCH_BACKEND', 'auto'),
+    'MAX_HITS': 1000,
+    'TRIE_TIMEOUT': 60,
+}
+
+# Request instrumentation: the share of requests sampled into the
+# histograms served at /metrics/ (admin token), and the duration above
+# which a sampled request is logged with its SQL. 0 disables sampling.
+
+METRICS = {
+    'SAMPLE_RATE': float(os.environ.get('EXERCISE_METRICS_SAMPLE_RATE', '0')),
+    'SLOW_REQUEST_MS': 500,
+    'MAX_LOGGED_QUERIES': 50,
+}
@@ -1,7 +1,8 @@
+from django.conf import settings
 from django.contrib import admin
 from django.urls import include, path, re_path
 from rest_framework import routers
-from exercise.quickstart import views
+from exercise.quickstart import async_views, metrics, views
 from drf_yasg import openapi
 from drf_yasg.views import get_schema_view as swagger_get_schema_view
 from rest_framework import permissions
@@ -32,6 +33,9 @@ urlpatterns = [
         '',
         include(
             router.urls)),
+    path(
+        'metrics/',
+        metrics.metrics_view),
     path(
         'documentation/',
         include(
@@ -54,3 +58,6 @@ urlpatterns = [
             'rest_framework.urls',
             namespace='rest_framework')),
 ]
+
+if settings.ASYNC_VIEWS:
+    urlpatterns = async_views.urlpatterns + urlpatterns